@@ -33,7 +33,7 @@ const networkMonitor = {
 
       if (token) {
         try {
-          await apiService.get('/api/gifts/p_01', { 
+          await apiService.get('/api/session/', { 
             cache: false,
             timeout: 5000 
           });
@@ -117,7 +117,7 @@ export const LoginContextProvider: React.FC<LoginContextProviderProps> = ({ chil
         return false;
       }
 
-      const response = await fetch(`${INNOVERSE_API_CONFIG.BASE_URL}/api/gifts/p_01`, {
+      const response = await fetch(`${INNOVERSE_API_CONFIG.BASE_URL}/api/session/`, {
         method: 'GET',
         headers: {
           'Content-Type': 'application/json',
@@ -6,3 +6,4 @@ admin.site.register(Role)
 admin.site.register(Volunteer)
 admin.site.register(EntryStatus)
 admin.site.register(GiftStatus)
+admin.site.register(EmailOutbox)
@@ -0,0 +1,109 @@
+"""
+Per-process cache of the images every email carries.
+
+The ticket template is decoded once and the logo (about 900 KB) is read
+and base64-encoded into its MIMEImage part once per worker process,
+instead of once per email. Each access costs a single stat(): a file
+replaced on disk (new mtime or size) is reloaded on next use. Celery
+workers preload both on worker_process_init, so the first email a child
+process sends does not pay for them either.
+"""
+
+import copy
+import hashlib
+import logging
+import os
+import threading
+from collections import namedtuple
+from email.mime.image import MIMEImage
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+CachedAsset = namedtuple('CachedAsset', ['signature', 'value'])
+
+_assets = {}
+_lock = threading.Lock()
+
+
+def template_path():
+    return os.path.join(settings.MEDIA_ROOT, 'qr_codes', 'qr_ticket_template.jpg')
+
+
+def logo_path():
+    return os.path.join(settings.MEDIA_ROOT, 'logo.png')
+
+
+def _cached(name, path, load):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        _assets.pop(name, None)
+        return None
+
+    signature = (path, stat.st_mtime_ns, stat.st_size)
+    entry = _assets.get(name)
+    if entry is None or entry.signature != signature:
+        with _lock:
+            entry = _assets.get(name)
+            if entry is None or entry.signature != signature:
+                entry = CachedAsset(signature, load(path))
+                _assets[name] = entry
+                logger.info(f"Loaded email asset '{name}' from {path}")
+    return entry.value
+
+
+def _load_template(path):
+    from PIL import Image
+
+    with Image.open(path) as image:
+        return image.convert('RGB')
+
+
+def _load_logo(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    part = MIMEImage(data)
+    part.add_header('Content-ID', '<logo>')
+    part.add_header('Content-Disposition', 'inline', filename='logo.png')
+    return data, part
+
+
+def _digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def template_digest():
+    """SHA-256 of the ticket template file, or None if there is none"""
+    return _cached('ticket_template_digest', template_path(), _digest)
+
+
+def ticket_template():
+    """A fresh copy of the decoded RGB ticket template, or None if there is none"""
+    template = _cached('ticket_template', template_path(), _load_template)
+    return template.copy() if template is not None else None
+
+
+def logo_bytes():
+    logo = _cached('logo', logo_path(), _load_logo)
+    return logo[0] if logo is not None else None
+
+
+def logo_part():
+    """The inline logo MIMEImage (Content-ID <logo>), or None if there is no logo"""
+    logo = _cached('logo', logo_path(), _load_logo)
+    # The base64 payload is a str, so the copy shares it rather than re-encoding
+    return copy.deepcopy(logo[1]) if logo is not None else None
+
+
+def preload():
+    """Load every asset now; missing or unreadable files are logged, not raised"""
+    for name, load in (('ticket template', ticket_template), ('logo', logo_part)):
+        try:
+            if load() is None:
+                logger.warning(f"Email asset '{name}' not found")
+        except Exception as e:
+            logger.error(f"Failed to preload email asset '{name}': {str(e)}")
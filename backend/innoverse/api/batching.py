@@ -0,0 +1,242 @@
+"""
+Micro-batching consumer for the emails queue.
+
+An alternative to running a Celery worker on the emails queue: it reads
+the same task messages, collects up to batch_size of them or whatever
+arrived within window_ms of the first one, renders them and sends them
+all over one pooled SMTP session. Which one consumes the queue is a
+deployment choice; producers do not change.
+
+Task semantics are kept per message:
+- a message is acked only once all of its emails are sent, skipped or
+  republished for retry, so a crash mid-batch redelivers it;
+- a failed email is republished with the task's own backoff
+  (60s * 2**retries) until the task's max_retries, like self.retry();
+- eta (retries in flight) and expires are honoured.
+
+Tasks without a builder in tasks.EMAIL_BUILDERS are run in-process with
+Task.apply().
+"""
+
+import heapq
+import itertools
+import logging
+import signal
+import socket
+import time
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+EMAIL_QUEUE = 'emails'
+RETRY_BACKOFF = 60  # seconds, doubled per retry as in the tasks
+POLL_INTERVAL = 1.0  # longest wait in drain_events, so a stop request is noticed
+
+TaskCall = namedtuple('TaskCall', ['name', 'id', 'args', 'kwargs', 'retries'])
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed.timestamp()
+
+
+def decode_call(message):
+    """TaskCall for a Celery protocol 2 message"""
+    headers = message.headers
+    args, kwargs, _embed = message.decode()
+    return TaskCall(headers['task'], headers['id'], list(args), dict(kwargs), headers.get('retries') or 0)
+
+
+class EmailBatcher:
+
+    def __init__(self, app, batch_size=None, window_ms=None):
+        from . import tasks
+
+        self.app = app
+        self.tasks = tasks
+        self.batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+        self.window = (window_ms if window_ms is not None else settings.EMAIL_BATCH_WINDOW_MS) / 1000
+        self.buffer = []
+        self.first_at = None
+        self.scheduled = []  # heap of (eta, seq, message) not yet due
+        self.seq = itertools.count()
+        self.stopping = False
+        self.stats = {'batches': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+
+    # Receiving
+
+    def receive(self, body, message):
+        eta = _parse_time(message.headers.get('eta'))
+        if eta and eta > time.time():
+            heapq.heappush(self.scheduled, (eta, next(self.seq), message))
+            self._update_prefetch()
+            return
+        self._buffer(message)
+
+    def _buffer(self, message):
+        if not self.buffer:
+            self.first_at = time.monotonic()
+        self.buffer.append(message)
+
+    def _release_due(self):
+        now = time.time()
+        released = False
+        while self.scheduled and self.scheduled[0][0] <= now:
+            self._buffer(heapq.heappop(self.scheduled)[2])
+            released = True
+        if released:
+            self._update_prefetch()
+
+    def _update_prefetch(self):
+        # Held (eta) messages must not use up the prefetch window of the batch
+        self.consumer.qos(prefetch_count=self.batch_size + len(self.scheduled))
+
+    def _timeout(self):
+        deadlines = [POLL_INTERVAL]
+        if self.buffer:
+            deadlines.append(self.first_at + self.window - time.monotonic())
+        if self.scheduled:
+            deadlines.append(self.scheduled[0][0] - time.time())
+        return max(0.0, min(deadlines))
+
+    def _due(self):
+        return self.buffer and (
+            len(self.buffer) >= self.batch_size or
+            time.monotonic() - self.first_at >= self.window or
+            self.stopping
+        )
+
+    # Main loop
+
+    def run(self):
+        queue = self.app.amqp.queues[EMAIL_QUEUE]
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        with self.app.connection_for_read() as connection:
+            with connection.Consumer(
+                [queue], callbacks=[self.receive], accept=['json'], prefetch_count=self.batch_size
+            ) as consumer:
+                self.consumer = consumer
+                logger.info(
+                    f"Email batcher consuming '{EMAIL_QUEUE}' "
+                    f"(up to {self.batch_size} messages / {self.window * 1000:.0f} ms)"
+                )
+                while not self.stopping or self.buffer:
+                    if not self.stopping:
+                        try:
+                            connection.drain_events(timeout=self._timeout())
+                        except socket.timeout:
+                            pass
+                    self._release_due()
+                    if self._due():
+                        batch, self.buffer = self.buffer[:self.batch_size], self.buffer[self.batch_size:]
+                        self.first_at = time.monotonic() if self.buffer else None
+                        self.process(batch)
+
+                # Hand messages held for their eta back to the broker
+                for _eta, _seq, message in self.scheduled:
+                    message.requeue()
+                self.scheduled = []
+        logger.info(f"Email batcher stopped: {self.stats}")
+        return self.stats
+
+    def stop(self, *args):
+        self.stopping = True
+
+    # Processing
+
+    def process(self, messages):
+        """Build, send and settle one batch"""
+        jobs = []  # (message, TaskCall, PreparedEmail)
+        settled = {id(message): True for message in messages}
+
+        for message in messages:
+            try:
+                call = decode_call(message)
+            except Exception as e:
+                logger.error(f"Dropping undecodable email message: {str(e)}")
+                message.ack()
+                settled.pop(id(message))
+                continue
+
+            expires = _parse_time(message.headers.get('expires'))
+            if expires and expires < time.time():
+                logger.warning(f"Email task {call.name}[{call.id}] expired, skipping")
+                continue
+
+            for sub_call in self._expand(call):
+                build = self.tasks.EMAIL_BUILDERS.get(sub_call.name)
+                if build is None:
+                    self._run_in_process(sub_call)
+                    continue
+                try:
+                    jobs.append((message, sub_call, build(*sub_call.args, **sub_call.kwargs)))
+                except Exception as e:
+                    logger.error(f"[ERROR] Building email {sub_call.name}[{sub_call.id}] failed: {str(e)}")
+                    settled[id(message)] &= self._retry(sub_call)
+
+        outcomes = self.tasks.send_prepared_emails([prepared for _, _, prepared in jobs])
+        for (message, call, prepared), error in zip(jobs, outcomes):
+            if error is None:
+                if prepared.message is not None:
+                    self.stats['sent'] += 1
+            else:
+                settled[id(message)] &= self._retry(call)
+
+        for message in messages:
+            if id(message) not in settled:
+                continue
+            if settled[id(message)]:
+                message.ack()
+            else:
+                # A retry could not be published - let the broker redeliver it
+                message.requeue()
+
+        self.stats['batches'] += 1
+        logger.info(f"Email batch: {len(messages)} message(s), {len(jobs)} email(s)")
+
+    def _expand(self, call):
+        # A bulk-verification batch task becomes its single-email tasks
+        if call.name != self.tasks.send_payment_verification_batch_task.name:
+            return [call]
+        participants, teams = (call.args + [[], []])[:2]
+        participants = call.kwargs.get('participants', participants)
+        teams = call.kwargs.get('teams', teams)
+        return (
+            [TaskCall(self.tasks.send_payment_verification_email_task.name, None, list(args), {}, 0)
+             for args in participants] +
+            [TaskCall(self.tasks.send_team_payment_verification_emails_task.name, None, list(args), {}, 0)
+             for args in teams]
+        )
+
+    def _retry(self, call):
+        """Republish a failed email as its task with backoff; False if that failed"""
+        task = self.app.tasks[call.name]
+        if call.retries >= task.max_retries:
+            logger.critical(f"Max retries exceeded for {call.name}[{call.id}]")
+            self.stats['failed'] += 1
+            return True
+        try:
+            self.app.send_task(
+                call.name, args=call.args, kwargs=call.kwargs,
+                task_id=call.id, retries=call.retries + 1,
+                countdown=RETRY_BACKOFF * 2 ** call.retries,
+                queue=EMAIL_QUEUE
+            )
+            self.stats['retried'] += 1
+            return True
+        except Exception as e:
+            logger.error(f"Failed to republish {call.name}[{call.id}] for retry: {str(e)}")
+            return False
+
+    def _run_in_process(self, call):
+        logger.warning(f"No email builder for {call.name}, running it in-process")
+        self.app.tasks[call.name].apply(args=call.args, kwargs=call.kwargs, task_id=call.id)
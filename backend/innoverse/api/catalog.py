@@ -0,0 +1,70 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from event.models import Segment, Competition, TeamCompetition, Gift
+from .versions import get_version
+
+logger = logging.getLogger(__name__)
+
+
+# Used only when Redis is unreachable and the version cannot be checked
+FALLBACK_TTL = 30
+
+Catalog = namedtuple('Catalog', [
+    'segments',           # code -> Segment
+    'competitions',       # code -> Competition
+    'team_competitions',  # code -> TeamCompetition
+    'gifts',              # lowercase gift_name -> Gift
+    'gifts_by_id',        # id -> Gift
+])
+
+
+class CatalogCache:
+    """
+    Process-local maps of the small event tables.
+
+    Each read compares the local copy against the 'catalog' version in
+    Redis (one cache GET, no DB query); model signals bump that version
+    whenever a Segment, Competition, TeamCompetition or Gift changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._catalog = None
+        self._version = None
+        self._loaded_at = 0
+
+    def get(self):
+        try:
+            version = get_version('catalog')
+        except Exception as e:
+            logger.warning(f"Catalog version unavailable: {str(e)}")
+            version = None
+
+        catalog = self._catalog
+        if catalog is not None:
+            if version is not None and version == self._version:
+                return catalog
+            if version is None and time.monotonic() - self._loaded_at < FALLBACK_TTL:
+                return catalog
+
+        with self._lock:
+            if self._catalog is None or version is None or version != self._version:
+                self._catalog = self._load()
+                self._version = version
+                self._loaded_at = time.monotonic()
+            return self._catalog
+
+    def _load(self):
+        gifts = list(Gift.objects.all())
+        return Catalog(
+            segments={seg.code: seg for seg in Segment.objects.all()},
+            competitions={comp.code: comp for comp in Competition.objects.all()},
+            team_competitions={comp.code: comp for comp in TeamCompetition.objects.all()},
+            gifts={gift.gift_name.lower(): gift for gift in gifts},
+            gifts_by_id={gift.id: gift for gift in gifts},
+        )
+
+
+catalog = CatalogCache()
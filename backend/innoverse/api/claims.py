@@ -0,0 +1,99 @@
+"""
+Volunteer claims carried in the JWT.
+
+Login embeds the volunteer id, role name and the volunteer's token_version.
+A request trusts those claims only while token_version still matches the
+cached counter, which is bumped whenever the volunteer or their role
+changes. Stale or claim-less tokens fall back to the database.
+"""
+
+import logging
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from .models import Volunteer
+
+logger = logging.getLogger(__name__)
+
+
+VERSION_TTL = 60 * 60 * 24
+
+CLAIM_VOLUNTEER = 'volunteer_id'
+CLAIM_ROLE = 'role'
+CLAIM_TOKEN_VERSION = 'tv'
+
+
+def _version_key(volunteer_id):
+    return f"volunteer_token_version_{volunteer_id}"
+
+
+def add_volunteer_claims(token, user):
+    volunteer = Volunteer.objects.select_related('role').filter(user=user).first()
+    if volunteer is None:
+        return token
+
+    token[CLAIM_VOLUNTEER] = volunteer.id
+    token[CLAIM_ROLE] = volunteer.role.role_name
+    token[CLAIM_TOKEN_VERSION] = volunteer.token_version
+    return token
+
+
+def get_token_version(volunteer_id):
+    """Current token_version for a volunteer (None if the volunteer is gone)"""
+    key = _version_key(volunteer_id)
+    try:
+        version = cache.get(key)
+        if version is not None:
+            return version
+    except Exception as e:
+        logger.warning(f"Token version cache unavailable: {str(e)}")
+
+    version = Volunteer.objects.filter(id=volunteer_id).values_list('token_version', flat=True).first()
+    if version is not None:
+        try:
+            cache.set(key, version, timeout=VERSION_TTL)
+        except Exception:
+            pass
+    return version
+
+
+def bump_token_version(volunteer_ids):
+    """Invalidate the claims in every token issued to these volunteers"""
+    volunteer_ids = [vid for vid in volunteer_ids if vid]
+    if not volunteer_ids:
+        return
+
+    Volunteer.objects.filter(id__in=volunteer_ids).update(token_version=F('token_version') + 1)
+
+    def clear():
+        try:
+            cache.delete_many([_version_key(vid) for vid in volunteer_ids])
+        except Exception as e:
+            logger.warning(f"Failed to clear token versions: {str(e)}")
+
+    transaction.on_commit(clear)
+
+
+def get_volunteer_claims(request):
+    """
+    {'volunteer_id': ..., 'role': ...} for the requesting user, or None if
+    they are not a volunteer. Memoized on the request.
+    """
+    if hasattr(request, '_volunteer_claims'):
+        return request._volunteer_claims
+
+    claims = None
+    token = request.auth
+
+    if token is not None and token.get(CLAIM_VOLUNTEER) and token.get(CLAIM_TOKEN_VERSION) is not None:
+        if get_token_version(token[CLAIM_VOLUNTEER]) == token[CLAIM_TOKEN_VERSION]:
+            claims = {'volunteer_id': token[CLAIM_VOLUNTEER], 'role': token.get(CLAIM_ROLE)}
+
+    if claims is None and request.user and request.user.is_authenticated:
+        # Token issued before claims existed, or the volunteer changed since
+        volunteer = Volunteer.objects.select_related('role').filter(user=request.user).first()
+        if volunteer is not None:
+            claims = {'volunteer_id': volunteer.id, 'role': volunteer.role.role_name}
+
+    request._volunteer_claims = claims
+    return claims
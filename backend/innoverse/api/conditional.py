@@ -0,0 +1,74 @@
+"""
+Conditional GET for admin list endpoints.
+
+A view names the version counters its responses depend on
+(etag_resources). The ETag is a hash of those versions, the request
+path and a time bucket, so it costs one cache read. A matching
+If-None-Match gets a 304 before the queryset or serializer runs. Model
+signals bump the counters (see signals.py); writes that bypass them
+(QuerySet.update(), bulk paths) are picked up once the bucket turns
+over, so a stale 304 lasts at most etag_max_age seconds.
+"""
+
+import hashlib
+import logging
+import time
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+from .versions import get_versions
+
+logger = logging.getLogger(__name__)
+
+
+ETAG_MAX_AGE = 60  # seconds a write that skipped the version bump can stay hidden
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+
+class ConditionalGetMixin:
+    """Strong ETags for GET/HEAD on ViewSets; list resources in etag_resources"""
+    etag_resources = ()
+    etag_max_age = ETAG_MAX_AGE
+
+    def compute_etag(self, request):
+        versions = get_versions(*self.etag_resources)
+        bucket = int(time.time() // self.etag_max_age)
+        source = f"{request.get_full_path()}|{'|'.join(str(v) for v in versions)}|{bucket}"
+        return quote_etag(hashlib.sha256(source.encode()).hexdigest()[:32])
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+
+        if request.method not in ('GET', 'HEAD') or not self.etag_resources:
+            return
+
+        try:
+            self.etag = self.compute_etag(request)
+        except Exception as e:
+            logger.warning(f"ETag versions unavailable: {str(e)}")
+            return
+
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in etags or self.etag in etags:
+            raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+
+        if getattr(self, 'etag', None) and response.status_code in (200, 304):
+            response['ETag'] = self.etag
+            # Revalidate on every poll; never share between tokens
+            response['Cache-Control'] = 'private, no-cache'
+            patch_vary_headers(response, ['Authorization'])
+        return response
@@ -0,0 +1,103 @@
+import logging
+from django.core.cache import cache
+from django.db.models import F
+from event.models import Coupons
+
+logger = logging.getLogger(__name__)
+
+
+class CouponSoldOut(Exception):
+    """
+    Raised when a coupon has no remaining uses at redemption time.
+
+    settled is True when redeem_coupon() already zeroed the Redis counter,
+    so the caller must not release_coupon() its reservation.
+    """
+
+    def __init__(self, coupon_code, settled=False):
+        self.coupon_code = coupon_code
+        self.settled = settled
+        super().__init__(f"Coupon '{coupon_code}' has no remaining uses")
+
+
+def _counter_key(coupon_id):
+    return f"coupon_remaining_{coupon_id}"
+
+
+def reserve_coupon(coupon):
+    """
+    Fast-path gate in Redis: take one use from the per-coupon counter
+    without touching the database.
+
+    Returns True if a use was reserved (caller must release_coupon() if
+    the registration does not commit), False if Redis is unavailable and
+    the caller should rely on redeem_coupon() alone.
+    Raises CouponSoldOut when the counter is exhausted.
+    """
+    key = _counter_key(coupon.id)
+
+    try:
+        # Seed from the DB value the first time this coupon is seen
+        cache.add(key, coupon.coupon_number or 0, timeout=None)
+        remaining = cache.decr(key)
+    except Exception as e:
+        logger.warning(f"Coupon counter unavailable for {coupon.coupon_code}: {e}")
+        return False
+
+    if remaining < 0:
+        _safe_incr(key)
+        raise CouponSoldOut(coupon.coupon_code)
+
+    return True
+
+
+def release_coupon(coupon):
+    """Give back a use taken by reserve_coupon() (registration rolled back)"""
+    _safe_incr(_counter_key(coupon.id))
+
+
+def redeem_coupon(coupon):
+    """
+    Authoritative redemption: one conditional UPDATE, no read-modify-write.
+
+    The WHERE clause re-checks coupon_number > 0 after any concurrent writer
+    commits, so the count can never go below zero. Call this as the last
+    statement of the registration transaction to keep the row lock short.
+    """
+    updated = Coupons.objects.filter(
+        pk=coupon.pk,
+        coupon_number__gt=0
+    ).update(coupon_number=F('coupon_number') - 1)
+
+    if not updated:
+        # DB says sold out - make sure the fast path agrees; the reservation
+        # is absorbed by the reset, so it must not be released afterwards
+        try:
+            cache.set(_counter_key(coupon.id), 0, timeout=None)
+        except Exception:
+            pass
+        raise CouponSoldOut(coupon.coupon_code, settled=True)
+
+    return True
+
+
+def sync_coupon_counter(coupon):
+    """Reconcile the Redis counter with the database value"""
+    try:
+        cache.set(_counter_key(coupon.id), coupon.coupon_number or 0, timeout=None)
+    except Exception as e:
+        logger.warning(f"Failed to sync coupon counter for {coupon.coupon_code}: {e}")
+
+
+def clear_coupon_counter(coupon_id):
+    try:
+        cache.delete(_counter_key(coupon_id))
+    except Exception:
+        pass
+
+
+def _safe_incr(key):
+    try:
+        cache.incr(key)
+    except Exception:
+        pass
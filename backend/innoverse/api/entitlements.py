@@ -0,0 +1,220 @@
+import logging
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import transaction
+from participant.models import (
+    Participant, Team, TeamParticipant,
+    Registration, CompetitionRegistration, TeamCompetitionRegistration
+)
+from .models import EntryStatus, GiftStatus
+from .catalog import catalog
+
+logger = logging.getLogger(__name__)
+
+
+RECORD_TTL = 60 * 60 * 12  # records are invalidated explicitly; TTL only bounds drift
+
+
+def participant_key(participant_id):
+    return f"entitlement_p_{participant_id}"
+
+
+def team_key(team_id):
+    return f"entitlement_t_{team_id}"
+
+
+def participant_info(participant):
+    return {
+        'id': participant.id,
+        'name': f"{participant.f_name} {participant.l_name}",
+        'email': participant.email,
+        'phone': participant.phone,
+        'institution': participant.institution,
+        'guardian_phone': participant.guardian_phone,
+        'grade': participant.grade,
+        'payment_verified': participant.payment_verified
+    }
+
+
+def team_info(team, members):
+    return {
+        'id': team.id,
+        'name': team.team_name,
+        'member_count': len(members),
+        'payment_verified': team.payment_verified,
+        'members': [
+            {
+                'name': f"{member.f_name} {member.l_name}",
+                'email': member.email,
+                'is_leader': member.is_leader
+            }
+            for member in members
+        ]
+    }
+
+
+def build_participant_records(participant_ids):
+    """Entitlement records for many participants in a fixed number of queries"""
+    gifts_by_id = catalog.get().gifts_by_id
+    records = {}
+
+    for participant in Participant.objects.filter(id__in=participant_ids):
+        records[participant.id] = {
+            'info': participant_info(participant),
+            'team_id': None,
+            'segments': [],
+            'solo': [],
+            'has_entry': False,
+            'gifts': [],
+        }
+
+    if not records:
+        return records
+
+    ids = list(records)
+
+    for pid, code in Registration.objects.filter(
+        participant_id__in=ids
+    ).values_list('participant_id', 'segment__code'):
+        records[pid]['segments'].append(code)
+
+    for pid, code in CompetitionRegistration.objects.filter(
+        participant_id__in=ids
+    ).values_list('participant_id', 'competition__code'):
+        records[pid]['solo'].append(code)
+
+    for pid in EntryStatus.objects.filter(
+        participant_id__in=ids
+    ).values_list('participant_id', flat=True).distinct():
+        records[pid]['has_entry'] = True
+
+    for pid, gift_id in GiftStatus.objects.filter(
+        participant_id__in=ids
+    ).values_list('participant_id', 'gift_id'):
+        records[pid]['gifts'].append(gifts_by_id[gift_id].gift_name.lower())
+
+    # First team wins, as in get_entity_by_id
+    for pid, team_id in TeamParticipant.objects.filter(
+        participant_id__in=ids
+    ).order_by('team_id').values_list('participant_id', 'team_id'):
+        if records[pid]['team_id'] is None:
+            records[pid]['team_id'] = team_id
+
+    return records
+
+
+def build_team_records(team_ids):
+    """Entitlement records for many teams in a fixed number of queries"""
+    gifts_by_id = catalog.get().gifts_by_id
+    teams = list(Team.objects.filter(id__in=team_ids))
+    if not teams:
+        return {}
+
+    ids = [team.id for team in teams]
+
+    members = defaultdict(list)
+    for member in TeamParticipant.objects.filter(team_id__in=ids).order_by('id'):
+        members[member.team_id].append(member)
+
+    records = {
+        team.id: {
+            'info': team_info(team, members[team.id]),
+            'team_competitions': [],
+            'has_entry': False,
+            'gifts': [],
+        }
+        for team in teams
+    }
+
+    for tid, code in TeamCompetitionRegistration.objects.filter(
+        team_id__in=ids
+    ).values_list('team_id', 'competition__code'):
+        records[tid]['team_competitions'].append(code)
+
+    for tid in EntryStatus.objects.filter(
+        team_id__in=ids
+    ).values_list('team_id', flat=True).distinct():
+        records[tid]['has_entry'] = True
+
+    for tid, gift_id in GiftStatus.objects.filter(
+        team_id__in=ids
+    ).values_list('team_id', 'gift_id'):
+        records[tid]['gifts'].append(gifts_by_id[gift_id].gift_name.lower())
+
+    return records
+
+
+def _get_record(key, builder, entity_id):
+    try:
+        record = cache.get(key)
+        if record is not None:
+            return record
+    except Exception as e:
+        logger.warning(f"Entitlement cache unavailable: {str(e)}")
+
+    record = builder([entity_id]).get(entity_id)
+    if record is not None:
+        try:
+            cache.set(key, record, timeout=RECORD_TTL)
+        except Exception:
+            pass
+    return record
+
+
+def get_entitlements(entity_type, entity_id):
+    """
+    Entitlement records for a scanned entity: (participant_record, team_record).
+
+    Steady state is one cache lookup (two for a participant in a team).
+    Raises Participant.DoesNotExist / Team.DoesNotExist like get_entity_by_id.
+    """
+    entity_id = int(entity_id)
+
+    if entity_type == 'participant':
+        participant_record = _get_record(participant_key(entity_id), build_participant_records, entity_id)
+        if participant_record is None:
+            raise Participant.DoesNotExist
+        team_record = None
+        if participant_record['team_id']:
+            team_record = _get_record(team_key(participant_record['team_id']), build_team_records, participant_record['team_id'])
+        return participant_record, team_record
+
+    team_record = _get_record(team_key(entity_id), build_team_records, entity_id)
+    if team_record is None:
+        raise Team.DoesNotExist
+    return None, team_record
+
+
+def invalidate_entitlements(participant_ids=(), team_ids=()):
+    """Drop cached records once the current transaction commits"""
+    keys = [participant_key(pid) for pid in participant_ids if pid]
+    keys += [team_key(tid) for tid in team_ids if tid]
+    if not keys:
+        return
+
+    def delete():
+        try:
+            cache.delete_many(keys)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate entitlements: {str(e)}")
+
+    transaction.on_commit(delete)
+
+
+def warm_entitlements(batch_size=1000):
+    """Prebuild every record (run before gates open). Returns records written."""
+    written = 0
+
+    participant_ids = list(Participant.objects.order_by('id').values_list('id', flat=True))
+    for i in range(0, len(participant_ids), batch_size):
+        records = build_participant_records(participant_ids[i:i + batch_size])
+        cache.set_many({participant_key(pid): r for pid, r in records.items()}, timeout=RECORD_TTL)
+        written += len(records)
+
+    team_ids = list(Team.objects.order_by('id').values_list('id', flat=True))
+    for i in range(0, len(team_ids), batch_size):
+        records = build_team_records(team_ids[i:i + batch_size])
+        cache.set_many({team_key(tid): r for tid, r in records.items()}, timeout=RECORD_TTL)
+        written += len(records)
+
+    return written
@@ -0,0 +1,330 @@
+"""
+CSV / XLSX exports of participants, teams and payments.
+
+Rows are read with values().iterator(chunk_size) and completed one chunk at
+a time with a single bulk lookup per related table, so memory stays flat
+however many rows are exported. CSV is streamed to the client as it is
+produced. XLSX (requires openpyxl) is written in write-only mode to a
+temporary file first, because a zip archive cannot be sent before it is
+complete.
+"""
+
+import csv
+import itertools
+import logging
+import tempfile
+from collections import defaultdict, namedtuple
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from participant.models import (
+    Participant, Team, TeamParticipant, Payment,
+    Registration, CompetitionRegistration, TeamCompetitionRegistration
+)
+from .models import EntryStatus
+from .catalog import catalog
+from .filters import filter_participants, filter_teams, filter_payments
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+
+CHUNK_SIZE = 2000
+CSV_FLUSH_ROWS = 500
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+FILE_TYPES = ('csv', 'xlsx')
+
+# Text starting with these is run as a formula by Excel / Sheets
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class ExportUnavailable(Exception):
+    """The requested file type cannot be produced on this install"""
+
+
+def _chunks(queryset, fields, chunk_size):
+    rows = queryset.order_by('id').values(*fields).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _in_chunk(field, ids):
+    """
+    Lookup for rows related to one chunk. Chunks are id-ordered, so a dense
+    chunk becomes a range scan instead of an IN list with thousands of
+    parameters; extra rows from inside the range are simply never read.
+    """
+    if ids[-1] - ids[0] < 2 * len(ids):
+        return {f'{field}__gte': ids[0], f'{field}__lte': ids[-1]}
+    return {f'{field}__in': ids}
+
+
+def _grouped(pairs):
+    groups = defaultdict(list)
+    for key, value in pairs:
+        groups[key].append(value)
+    return groups
+
+
+def _joined(values):
+    return '; '.join(str(value) for value in values if value)
+
+
+def _cell(value):
+    # Registration input is untrusted: keep it text when opened in a spreadsheet
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def _local(dt):
+    # Naive local time: readable in CSV, and Excel does not store time zones
+    if dt is None:
+        return None
+    return timezone.localtime(dt).replace(tzinfo=None, microsecond=0)
+
+
+def _payment_columns(payments):
+    # payments: [(amount, method, trx_id), ...]
+    return [
+        sum(amount for amount, _, _ in payments) if payments else None,
+        _joined(sorted({method for _, method, _ in payments})),
+        _joined(trx_id for _, _, trx_id in payments),
+    ]
+
+
+PARTICIPANT_HEADER = [
+    'ID', 'First name', 'Last name', 'Email', 'Phone', 'Gender', 'Institution',
+    'Grade', 'Guardian phone', 'T-shirt size', 'Address', 'Segments', 'Competitions',
+    'Teams', 'Payment verified', 'Amount paid', 'Payment methods', 'Transaction IDs',
+    'Entered at',
+]
+
+PARTICIPANT_FIELDS = [
+    'id', 'f_name', 'l_name', 'email', 'phone', 'gender', 'institution',
+    'grade', 'guardian_phone', 't_shirt_size', 'address', 'payment_verified',
+]
+
+
+def participant_rows(queryset, chunk_size=CHUNK_SIZE):
+    event_catalog = catalog.get()
+    segment_names = {seg.id: seg.segment_name for seg in event_catalog.segments.values()}
+    competition_names = {comp.id: comp.competition for comp in event_catalog.competitions.values()}
+
+    for chunk in _chunks(queryset, PARTICIPANT_FIELDS, chunk_size):
+        ids = [row['id'] for row in chunk]
+
+        segments = _grouped(
+            Registration.objects.filter(**_in_chunk('participant_id', ids))
+            .order_by('id').values_list('participant_id', 'segment_id')
+        )
+        competitions = _grouped(
+            CompetitionRegistration.objects.filter(**_in_chunk('participant_id', ids))
+            .order_by('id').values_list('participant_id', 'competition_id')
+        )
+        teams = _grouped(
+            TeamParticipant.objects.filter(**_in_chunk('participant_id', ids))
+            .order_by('id').values_list('participant_id', 'team__team_name')
+        )
+        payments = _grouped(
+            (participant_id, (amount, method, trx_id))
+            for participant_id, amount, method, trx_id in
+            Payment.objects.filter(**_in_chunk('participant_id', ids))
+            .order_by('id').values_list('participant_id', 'amount', 'method', 'trx_id')
+        )
+        entries = dict(
+            EntryStatus.objects.filter(**_in_chunk('participant_id', ids))
+            .values_list('participant_id', 'datetime')
+        )
+
+        for row in chunk:
+            pid = row['id']
+            yield [
+                pid, row['f_name'], row['l_name'], row['email'], row['phone'],
+                row['gender'], row['institution'], row['grade'], row['guardian_phone'],
+                row['t_shirt_size'], row['address'],
+                _joined(segment_names.get(sid) for sid in segments[pid]),
+                _joined(competition_names.get(cid) for cid in competitions[pid]),
+                _joined(teams[pid]),
+                row['payment_verified'],
+                *_payment_columns(payments[pid]),
+                _local(entries.get(pid)),
+            ]
+
+
+TEAM_HEADER = [
+    'ID', 'Team name', 'Payment verified', 'Members', 'Leader', 'Leader email',
+    'Leader phone', 'Member names', 'Member emails', 'Institutions', 'Competitions',
+    'Amount paid', 'Payment methods', 'Transaction IDs', 'Entered at',
+]
+
+
+def team_rows(queryset, chunk_size=CHUNK_SIZE):
+    competition_names = {comp.id: comp.competition for comp in catalog.get().team_competitions.values()}
+
+    for chunk in _chunks(queryset, ['id', 'team_name', 'payment_verified'], chunk_size):
+        ids = [row['id'] for row in chunk]
+
+        members = _grouped(
+            (member['team_id'], member) for member in
+            TeamParticipant.objects.filter(**_in_chunk('team_id', ids))
+            .order_by('-is_leader', 'id')
+            .values('team_id', 'f_name', 'l_name', 'email', 'phone', 'institution', 'is_leader')
+        )
+        competitions = _grouped(
+            TeamCompetitionRegistration.objects.filter(**_in_chunk('team_id', ids))
+            .order_by('id').values_list('team_id', 'competition_id')
+        )
+        payments = _grouped(
+            (team_id, (amount, method, trx_id))
+            for team_id, amount, method, trx_id in
+            Payment.objects.filter(**_in_chunk('team_id', ids))
+            .order_by('id').values_list('team_id', 'amount', 'method', 'trx_id')
+        )
+        entries = dict(
+            EntryStatus.objects.filter(**_in_chunk('team_id', ids))
+            .values_list('team_id', 'datetime')
+        )
+
+        for row in chunk:
+            tid = row['id']
+            team_members = members[tid]
+            leader = next((m for m in team_members if m['is_leader']), None)
+            yield [
+                tid, row['team_name'], row['payment_verified'], len(team_members),
+                f"{leader['f_name']} {leader['l_name']}" if leader else None,
+                leader['email'] if leader else None,
+                leader['phone'] if leader else None,
+                _joined(f"{m['f_name']} {m['l_name']}" for m in team_members),
+                _joined(m['email'] for m in team_members),
+                _joined(sorted({m['institution'] for m in team_members if m['institution']})),
+                _joined(competition_names.get(cid) for cid in competitions[tid]),
+                *_payment_columns(payments[tid]),
+                _local(entries.get(tid)),
+            ]
+
+
+PAYMENT_HEADER = [
+    'ID', 'Transaction ID', 'Phone', 'Amount', 'Method', 'Coupon', 'Paid at',
+    'Payer type', 'Payer ID', 'Payer name', 'Payer email', 'Payment verified',
+]
+
+PAYMENT_FIELDS = [
+    'id', 'trx_id', 'phone', 'amount', 'method', 'coupon__coupon_code', 'datetime',
+    'participant_id', 'team_id',
+]
+
+
+def payment_rows(queryset, chunk_size=CHUNK_SIZE):
+    for chunk in _chunks(queryset, PAYMENT_FIELDS, chunk_size):
+        participant_ids = {row['participant_id'] for row in chunk if row['participant_id']}
+        team_ids = {row['team_id'] for row in chunk if row['team_id']}
+
+        participants = {
+            p['id']: p for p in
+            Participant.objects.filter(id__in=participant_ids)
+            .values('id', 'f_name', 'l_name', 'email', 'payment_verified')
+        }
+        teams = {
+            t['id']: t for t in
+            Team.objects.filter(id__in=team_ids).values('id', 'team_name', 'payment_verified')
+        }
+        leader_emails = dict(
+            TeamParticipant.objects.filter(team_id__in=team_ids, is_leader=True)
+            .values_list('team_id', 'email')
+        )
+
+        for row in chunk:
+            if row['participant_id']:
+                payer = participants.get(row['participant_id'], {})
+                payer_columns = [
+                    'participant', row['participant_id'],
+                    f"{payer['f_name']} {payer['l_name']}" if payer else None,
+                    payer.get('email'), payer.get('payment_verified'),
+                ]
+            else:
+                payer = teams.get(row['team_id'], {})
+                payer_columns = [
+                    'team', row['team_id'], payer.get('team_name'),
+                    leader_emails.get(row['team_id']), payer.get('payment_verified'),
+                ]
+            yield [
+                row['id'], row['trx_id'], row['phone'], row['amount'], row['method'],
+                row['coupon__coupon_code'], _local(row['datetime']),
+                *payer_columns,
+            ]
+
+
+Export = namedtuple('Export', ['model', 'filter', 'header', 'rows'])
+
+EXPORTS = {
+    'participants': Export(Participant, filter_participants, PARTICIPANT_HEADER, participant_rows),
+    'teams': Export(Team, filter_teams, TEAM_HEADER, team_rows),
+    'payments': Export(Payment, filter_payments, PAYMENT_HEADER, payment_rows),
+}
+
+
+def iter_export(dataset, params, chunk_size=CHUNK_SIZE):
+    """Header row, then one row per matching record"""
+    export = EXPORTS[dataset]
+    yield export.header
+    queryset = export.filter(export.model.objects.all(), params)
+    yield from export.rows(queryset, chunk_size)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """CSV text in pieces of CSV_FLUSH_ROWS rows"""
+    writer = csv.writer(_Echo())
+    buffer = ['\ufeff']  # BOM so Excel reads the file as UTF-8
+    for row in rows:
+        buffer.append(writer.writerow(['' if value is None else _cell(value) for value in row]))
+        if len(buffer) >= CSV_FLUSH_ROWS:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def write_xlsx(rows, fileobj, title):
+    if openpyxl is None:
+        raise ExportUnavailable("XLSX export requires openpyxl")
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    for row in rows:
+        sheet.append([_cell(value) for value in row])
+    workbook.save(fileobj)
+
+
+def export_response(dataset, file_type, params, chunk_size=CHUNK_SIZE):
+    filename = f"{dataset}-{timezone.localtime():%Y%m%d-%H%M}.{file_type}"
+    rows = iter_export(dataset, params, chunk_size)
+
+    if file_type == 'csv':
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    if openpyxl is None:
+        raise ExportUnavailable("XLSX export requires openpyxl")
+
+    fileobj = tempfile.TemporaryFile()
+    try:
+        write_xlsx(rows, fileobj, dataset)
+    except Exception:
+        fileobj.close()
+        raise
+    fileobj.seek(0)
+    return FileResponse(fileobj, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
@@ -0,0 +1,57 @@
+from django.db.models import Q
+from .search import participant_search_q
+
+
+def _is_true(value):
+    return value.lower() == 'true'
+
+
+def filter_participants(queryset, params):
+    """Query-string filters shared by the participant listing and exports"""
+    segment_code = params.get('segment')
+    competition_code = params.get('competition')
+    payment_verified = params.get('payment_verified')
+    search = params.get('search')
+
+    if segment_code:
+        queryset = queryset.filter(registrations__segment__code=segment_code).distinct()
+
+    if competition_code:
+        queryset = queryset.filter(competition_registrations__competition__code=competition_code).distinct()
+
+    if payment_verified is not None:
+        queryset = queryset.filter(payment_verified=_is_true(payment_verified))
+
+    if search:
+        queryset = queryset.filter(participant_search_q(search))
+
+    return queryset
+
+
+def filter_teams(queryset, params):
+    """Query-string filters shared by the team listing and exports"""
+    competition_code = params.get('competition')
+    payment_verified = params.get('payment_verified')
+
+    if competition_code:
+        queryset = queryset.filter(
+            team_competition_registrations__competition__code=competition_code
+        ).distinct()
+
+    if payment_verified is not None:
+        queryset = queryset.filter(payment_verified=_is_true(payment_verified))
+
+    return queryset
+
+
+def filter_payments(queryset, params):
+    method = params.get('method')
+    search = params.get('search')
+
+    if method:
+        queryset = queryset.filter(method__iexact=method)
+
+    if search:
+        queryset = queryset.filter(Q(trx_id__icontains=search) | Q(phone__icontains=search))
+
+    return queryset
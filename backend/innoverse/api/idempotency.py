@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import time
+from functools import wraps
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+RESPONSE_TTL = 60 * 60 * 24  # replay window: 24 hours
+LOCK_TTL = 60  # in-flight lock, longer than any single request
+WAIT_TIMEOUT = 10  # how long a concurrent retry waits for the first response
+POLL_INTERVAL = 0.1
+
+
+def idempotent(view_method):
+    """
+    Idempotency-Key support for POST actions.
+
+    The first response for a key is stored in the cache and replayed for
+    retries without running the view (no validation, no DB). Concurrent
+    retries are collapsed behind an in-flight lock and receive the first
+    response once it is ready. Requests without the header are unaffected.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response({
+                "success": False,
+                "error": "Idempotency-Key must be at most 255 characters"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        user_id = request.user.pk if request.user and request.user.is_authenticated else 'anon'
+        scope = f"{user_id}:{request.method}:{request.path}:{key}"
+        digest = hashlib.sha256(scope.encode()).hexdigest()
+        response_key = f"idem_response_{digest}"
+        lock_key = f"idem_lock_{digest}"
+        fingerprint = hashlib.sha256(request._request.body).hexdigest()
+
+        try:
+            stored = cache.get(response_key)
+            if stored is None:
+                acquired = cache.add(lock_key, fingerprint, timeout=LOCK_TTL)
+                if not acquired:
+                    stored = _wait_for_response(response_key)
+                    if stored is None:
+                        return Response({
+                            "success": False,
+                            "error": "A request with this Idempotency-Key is already in progress"
+                        }, status=status.HTTP_409_CONFLICT)
+        except Exception as e:
+            # Cache unavailable - fall back to normal (non-idempotent) handling
+            logger.warning(f"Idempotency cache unavailable: {str(e)}")
+            return view_method(self, request, *args, **kwargs)
+
+        if stored is not None:
+            return _replay(stored, fingerprint)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+
+            # 5xx responses are not stored so the client can retry them
+            if response.status_code < 500:
+                cache.set(response_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                }, timeout=RESPONSE_TTL)
+
+            return response
+        finally:
+            try:
+                cache.delete(lock_key)
+            except Exception:
+                pass
+
+    return wrapper
+
+
+def _wait_for_response(response_key):
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        stored = cache.get(response_key)
+        if stored is not None:
+            return stored
+    return None
+
+
+def _replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return Response({
+            "success": False,
+            "error": "Idempotency-Key was already used with a different request body"
+        }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    response = Response(stored['data'], status=stored['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
@@ -0,0 +1,136 @@
+"""
+Long-lived SMTP session per worker process.
+
+EmailMessage.send() opens a TLS session, authenticates, sends one message
+and disconnects. Here each worker process keeps one connection open and
+reuses it across tasks. A session idle for longer than HEALTHCHECK_IDLE
+is checked with NOOP before use, and one that is older than
+MAX_SESSION_AGE or has carried MAX_SESSION_MESSAGES is replaced, so
+neither server-side idle timeouts nor per-session limits are hit
+mid-send. A message that fails on a dropped connection is retried once
+on a fresh one.
+"""
+
+import logging
+import os
+import smtplib
+import socket
+import threading
+import time
+from celery.exceptions import MaxRetriesExceededError, SoftTimeLimitExceeded
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+HEALTHCHECK_IDLE = 30  # seconds
+MAX_SESSION_AGE = 10 * 60
+MAX_SESSION_MESSAGES = 100
+
+# The session is gone, not the message rejected - worth one retry on a new one
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, socket.timeout)
+
+# Task control flow, not send failures - must stop the batch
+TASK_EXCEPTIONS = (SoftTimeLimitExceeded, MaxRetriesExceededError)
+
+
+class _Session:
+    def __init__(self):
+        self.backend = get_connection(fail_silently=False)
+        self.backend.open()
+        self.pid = os.getpid()
+        self.opened_at = self.used_at = time.monotonic()
+        self.messages = 0
+
+    def healthy(self):
+        now = time.monotonic()
+        if self.pid != os.getpid():
+            return False  # inherited across fork; the socket belongs to the parent
+        if now - self.opened_at > MAX_SESSION_AGE or self.messages >= MAX_SESSION_MESSAGES:
+            return False
+        if now - self.used_at < HEALTHCHECK_IDLE:
+            return True
+
+        smtp = getattr(self.backend, 'connection', None)
+        if smtp is None:
+            return True  # non-SMTP backend (console, locmem, ...)
+        try:
+            return smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def close(self):
+        if self.pid != os.getpid():
+            return
+        try:
+            self.backend.close()
+        except Exception as e:
+            logger.warning(f"Error closing SMTP session: {str(e)}")
+
+
+_local = threading.local()
+
+
+def _session():
+    session = getattr(_local, 'session', None)
+    if session is not None and not session.healthy():
+        session.close()
+        session = None
+    if session is None:
+        session = _Session()
+        _local.session = session
+    return session
+
+
+def close_connection():
+    """Close this thread's session (worker shutdown)"""
+    session = getattr(_local, 'session', None)
+    if session is not None:
+        session.close()
+        _local.session = None
+
+
+def _send_one(message):
+    for attempt in (1, 2):
+        session = _session()
+        try:
+            message.connection = session.backend
+            sent = session.backend.send_messages([message])
+            session.messages += 1
+            session.used_at = time.monotonic()
+            return sent
+        except CONNECTION_ERRORS as e:
+            close_connection()
+            if attempt == 2:
+                raise
+            logger.warning(f"SMTP session dropped ({str(e)}), reconnecting")
+
+
+def send_message(message):
+    """Send one EmailMessage over the pooled session; raises on failure"""
+    return _send_one(message)
+
+
+def send_messages(messages, on_sent=None):
+    """
+    Send several EmailMessages over the pooled session.
+
+    Returns one entry per message: None if it was sent, otherwise the
+    exception, so the caller can retry just the failures. A soft time
+    limit (or MaxRetriesExceededError) is raised, not collected.
+    on_sent(index) is called right after each message goes out, so
+    callers can record progress that survives a crash mid-batch.
+    """
+    outcomes = []
+    for index, message in enumerate(messages):
+        try:
+            _send_one(message)
+            outcomes.append(None)
+            if on_sent is not None:
+                on_sent(index)
+        except TASK_EXCEPTIONS:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to send email to {', '.join(message.to)}: {str(e)}")
+            outcomes.append(e)
+    return outcomes
@@ -0,0 +1,102 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from event.models import Coupons
+from participant.models import Payment
+from api.coupons import CouponSoldOut, reserve_coupon, release_coupon, redeem_coupon
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrency benchmark for coupon redemption: N parallel registrations "
+        "race for a coupon with fewer uses and the run fails on any oversell. "
+        "Run against PostgreSQL - SQLite serializes writers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registrations', type=int, default=500, help='Parallel registration attempts')
+        parser.add_argument('--uses', type=int, default=100, help='Uses available on the benchmark coupon')
+        parser.add_argument('--workers', type=int, default=50, help='Concurrent threads (each has its own DB connection)')
+
+    def handle(self, *args, **options):
+        registrations = options['registrations']
+        uses = options['uses']
+        workers = options['workers']
+
+        run_id = uuid.uuid4().hex[:8]
+        coupon = Coupons.objects.create(
+            coupon_code=f"BENCH-{run_id}",
+            discount=10.0,
+            coupon_number=uses
+        )
+
+        def register(i):
+            # Same sequence as RegisterViewSet.create
+            try:
+                reserved = reserve_coupon(coupon)
+            except CouponSoldOut:
+                return 'sold_out'
+
+            try:
+                with transaction.atomic():
+                    Payment.objects.create(
+                        phone='01700000000',
+                        amount='100.00',
+                        method='bench',
+                        trx_id=f"BENCH-{run_id}-{i}",
+                        coupon=coupon
+                    )
+                    redeem_coupon(coupon)
+                return 'redeemed'
+            except CouponSoldOut as e:
+                if reserved and not e.settled:
+                    release_coupon(coupon)
+                return 'sold_out'
+            except Exception:
+                if reserved:
+                    release_coupon(coupon)
+                return 'error'
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(register, range(registrations)))
+        elapsed = time.perf_counter() - started
+
+        try:
+            coupon.refresh_from_db()
+            redeemed = results.count('redeemed')
+            sold_out = results.count('sold_out')
+            errors = results.count('error')
+            payments = Payment.objects.filter(coupon=coupon).count()
+            oversold = max(0, payments - uses)
+
+            self.stdout.write(f"Attempts:        {registrations} ({workers} workers)")
+            self.stdout.write(f"Coupon uses:     {uses}")
+            self.stdout.write(f"Redeemed:        {redeemed}")
+            self.stdout.write(f"Sold out:        {sold_out}")
+            self.stdout.write(f"Errors:          {errors}")
+            self.stdout.write(f"Payments stored: {payments}")
+            self.stdout.write(f"Remaining (DB):  {coupon.coupon_number}")
+            self.stdout.write(f"Elapsed:         {elapsed:.2f}s ({registrations / elapsed:.0f} attempts/sec)")
+
+            consistent = (
+                oversold == 0
+                and coupon.coupon_number >= 0
+                and payments == redeemed
+                and coupon.coupon_number == uses - redeemed
+            )
+        finally:
+            Payment.objects.filter(trx_id__startswith=f"BENCH-{run_id}-").delete()
+            coupon.delete()
+
+        if errors:
+            raise CommandError(f"{errors} registrations failed unexpectedly")
+
+        if not consistent:
+            raise CommandError(f"Inconsistent redemption: oversold by {oversold}")
+
+        self.stdout.write(self.style.SUCCESS("Zero oversell"))
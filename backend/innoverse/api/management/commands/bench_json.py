@@ -0,0 +1,114 @@
+import io
+import random
+import statistics
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from event.models import Segment, Competition
+from participant.models import Participant, Payment, Registration, CompetitionRegistration
+from api.models import EntryStatus
+from api.serializers import ParticipantListSerializer
+from api.renderers import FastJSONRenderer, FastJSONParser, orjson
+
+FIRST_NAMES = ['Abdullah', 'Sami', 'Nusrat', 'Tanvir', 'Farhana', 'Rakib', 'Mahmud', 'Sadia', 'Arif', 'Tasnim']
+LAST_NAMES = ['Rahman', 'Hossain', 'Islam', 'Ahmed', 'Chowdhury', 'Khan', 'Sarkar', 'Akter', 'Uddin', 'Haque']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's JSONRenderer/JSONParser with the orjson-backed pair on a "
+        "participant list page. Seeds rows inside a transaction that is rolled back, "
+        "and fails if the two renderers disagree on a single byte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help='Participants in the page (500 = max page size)')
+        parser.add_argument('--repeat', type=int, default=50, help='Timed runs per renderer / parser')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed - FastJSONRenderer falls back to the stdlib"))
+
+        with transaction.atomic():
+            payload = self._payload(options['rows'])
+            transaction.set_rollback(True)
+
+        stdlib_body = JSONRenderer().render(payload)
+        fast_body = FastJSONRenderer().render(payload)
+        if stdlib_body != fast_body:
+            raise CommandError("FastJSONRenderer output differs from JSONRenderer")
+        if JSONParser().parse(io.BytesIO(stdlib_body)) != FastJSONParser().parse(io.BytesIO(stdlib_body)):
+            raise CommandError("FastJSONParser result differs from JSONParser")
+
+        self.stdout.write(f"Payload: {options['rows']} participants, {len(stdlib_body) / 1024:.0f} KiB")
+
+        repeat = options['repeat']
+        results = [
+            ('render', 'JSONRenderer', self._time(lambda: JSONRenderer().render(payload), repeat)),
+            ('render', 'FastJSONRenderer', self._time(lambda: FastJSONRenderer().render(payload), repeat)),
+            ('parse', 'JSONParser', self._time(lambda: JSONParser().parse(io.BytesIO(stdlib_body)), repeat)),
+            ('parse', 'FastJSONParser', self._time(lambda: FastJSONParser().parse(io.BytesIO(stdlib_body)), repeat)),
+        ]
+
+        baseline = {}
+        for kind, name, timings in results:
+            p50 = statistics.median(timings)
+            baseline.setdefault(kind, p50)
+            self.stdout.write(
+                f"{name:<18} p50 {p50:7.2f} ms  min {min(timings):7.2f} ms  "
+                f"({baseline[kind] / p50:.1f}x)"
+            )
+
+    def _time(self, fn, repeat):
+        fn()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def _payload(self, rows):
+        """A participant list page shaped like IdCursorPagination's response"""
+        run_id = uuid.uuid4().hex[:8]
+        rng = random.Random(run_id)
+
+        segment = Segment.objects.create(segment_name=f"Bench {run_id}", code=f"bench-{run_id}")
+        competition = Competition.objects.create(competition=f"Bench {run_id}", code=f"bench-{run_id}")
+
+        participants = Participant.objects.bulk_create([
+            Participant(
+                f_name=rng.choice(FIRST_NAMES),
+                l_name=rng.choice(LAST_NAMES),
+                email=f"bench{run_id}.{i}@example.com",
+                phone=f"017{rng.randrange(10**8):08d}",
+                institution="Bench School & College",
+                payment_verified=rng.random() < 0.7,
+            )
+            for i in range(rows)
+        ])
+        Payment.objects.bulk_create([
+            Payment(
+                participant=p, phone=p.phone, amount=rng.choice(['250.00', '300.00', '450.50']),
+                method=rng.choice(['bkash', 'nagad', 'rocket']), trx_id=f"BENCH{run_id}{p.id}"
+            )
+            for p in participants
+        ])
+        Registration.objects.bulk_create([Registration(participant=p, segment=segment) for p in participants])
+        CompetitionRegistration.objects.bulk_create([
+            CompetitionRegistration(participant=p, competition=competition) for p in participants
+        ])
+        EntryStatus.objects.bulk_create([EntryStatus(participant=p) for p in participants[::3]])
+
+        queryset = ParticipantListSerializer.setup_eager_loading(
+            Participant.objects.filter(id__in=[p.id for p in participants])
+        ).order_by('-id')
+        return {
+            'success': True,
+            'next': f"https://example.com/api/participant/?cursor={run_id}",
+            'previous': None,
+            'data': ParticipantListSerializer(queryset, many=True).data,
+        }
@@ -0,0 +1,103 @@
+import random
+import statistics
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from participant.models import Participant, Team, TeamParticipant, Payment
+from api.search import search, participant_search_q
+from api.versions import bump_version
+
+FIRST_NAMES = ['Abdullah', 'Sami', 'Nusrat', 'Tanvir', 'Farhana', 'Rakib', 'Mahmud', 'Sadia', 'Arif', 'Tasnim']
+LAST_NAMES = ['Rahman', 'Hossain', 'Islam', 'Ahmed', 'Chowdhury', 'Khan', 'Sarkar', 'Akter', 'Uddin', 'Haque']
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency benchmark for api.search: seeds synthetic participants, team "
+        "members and payments, runs ranked and listing searches, reports "
+        "percentiles and removes the seeded rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Synthetic participants to seed')
+        parser.add_argument('--queries', type=int, default=200, help='Searches to time')
+        parser.add_argument('--budget-ms', type=float, default=50.0, help='Fail if p95 exceeds this')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        run_id = uuid.uuid4().hex[:8]
+        rng = random.Random(run_id)
+
+        self.stdout.write(f"Seeding {rows} participants on {connection.vendor}...")
+        participants = [
+            Participant(
+                f_name=rng.choice(FIRST_NAMES),
+                l_name=rng.choice(LAST_NAMES),
+                email=f"bench{run_id}.{i}@example.com",
+                phone=f"017{rng.randrange(10**8):08d}",
+            )
+            for i in range(rows)
+        ]
+        Participant.objects.bulk_create(participants, batch_size=2000)
+        created = list(
+            Participant.objects.filter(email__startswith=f"bench{run_id}.").values_list('id', flat=True)
+        )
+        Payment.objects.bulk_create([
+            Payment(participant_id=pid, phone=f"018{i:08d}", amount='100.00',
+                    trx_id=f"BENCH{run_id}{i:07d}", method='bench')
+            for i, pid in enumerate(created)
+        ], batch_size=2000)
+        team = Team.objects.create(team_name=f"BENCH-{run_id}")
+        TeamParticipant.objects.bulk_create([
+            TeamParticipant(team=team, f_name=rng.choice(FIRST_NAMES), l_name=rng.choice(LAST_NAMES),
+                            email=f"member{run_id}.{i}@example.com", phone='019', institution='Bench')
+            for i in range(rows // 10)
+        ], batch_size=2000)
+        bump_version('search')
+
+        try:
+            terms = []
+            for _ in range(options['queries']):
+                kind = rng.randrange(4)
+                if kind == 0:
+                    terms.append(rng.choice(FIRST_NAMES)[:5])
+                elif kind == 1:
+                    terms.append(rng.choice(LAST_NAMES)[:-1] + 'x')  # typo
+                elif kind == 2:
+                    terms.append(f"BENCH{run_id}{rng.randrange(rows):07d}")
+                else:
+                    terms.append(f"bench{run_id}.{rng.randrange(rows)}@")
+
+            # Index build / cache warm-up is not part of the measurement
+            search(terms[0])
+
+            ranked, listing = [], []
+            for term in terms:
+                started = time.perf_counter()
+                search(term, 20)
+                ranked.append((time.perf_counter() - started) * 1000)
+
+                started = time.perf_counter()
+                list(Participant.objects.filter(participant_search_q(term)).order_by('-id').values_list('id', flat=True)[:50])
+                listing.append((time.perf_counter() - started) * 1000)
+
+            for label, timings in (('Ranked search', ranked), ('Listing filter', listing)):
+                timings.sort()
+                p95 = timings[int(len(timings) * 0.95) - 1]
+                self.stdout.write(
+                    f"{label:15} p50 {statistics.median(timings):6.1f} ms   "
+                    f"p95 {p95:6.1f} ms   max {timings[-1]:6.1f} ms"
+                )
+            worst_p95 = max(sorted(t)[int(len(t) * 0.95) - 1] for t in (ranked, listing))
+        finally:
+            TeamParticipant.objects.filter(team=team).delete()
+            team.delete()
+            Payment.objects.filter(trx_id__startswith=f"BENCH{run_id}").delete()
+            Participant.objects.filter(email__startswith=f"bench{run_id}.").delete()
+            bump_version('search')
+
+        if worst_p95 > options['budget_ms']:
+            raise CommandError(f"p95 {worst_p95:.1f} ms exceeds the {options['budget_ms']:.0f} ms budget")
+
+        self.stdout.write(self.style.SUCCESS("Within budget"))
@@ -0,0 +1,121 @@
+import os
+import socketserver
+import threading
+import time
+from django.core.mail import EmailMultiAlternatives
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from api import mail
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept and discard messages"""
+
+    def reply(self, line):
+        time.sleep(self.server.rtt)
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        # Stands in for the TLS handshake and AUTH a real relay needs per session
+        time.sleep(self.server.session_setup)
+        self.server.sessions += 1
+        self.reply('220 sink ESMTP')
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250-sink\r\n250 8BITMIME')
+            elif command.startswith('DATA'):
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.messages += 1
+                self.reply('250 OK')
+            elif command.startswith('QUIT'):
+                self.reply('221 Bye')
+                return
+            else:  # MAIL, RCPT, RSET, NOOP
+                self.reply('250 OK')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, session_setup, rtt):
+        super().__init__(('127.0.0.1', 0), SMTPSinkHandler)
+        self.session_setup = session_setup
+        self.rtt = rtt
+        self.sessions = 0
+        self.messages = 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare one SMTP session per email (EmailMessage.send) with the pooled "
+        "per-process session in api.mail, against a local SMTP stand-in"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200)
+        parser.add_argument('--session-setup-ms', type=float, default=250,
+                            help='Simulated TLS handshake + AUTH per session (Gmail is typically 200-500 ms)')
+        parser.add_argument('--rtt-ms', type=float, default=2, help='Simulated round trip per SMTP command')
+        parser.add_argument('--attachment-kb', type=int, default=120, help='Ticket-sized attachment per message')
+
+    def handle(self, *args, **options):
+        sink = SMTPSink(options['session_setup_ms'] / 1000, options['rtt_ms'] / 1000)
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+        attachment = os.urandom(options['attachment_kb'] * 1024)
+
+        smtp_settings = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=sink.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+        )
+
+        def messages():
+            for i in range(options['messages']):
+                email = EmailMultiAlternatives(
+                    subject=f"Payment Verified - Bench {i}",
+                    body="Your payment has been verified.",
+                    from_email='bench@example.com',
+                    to=[f'participant{i}@example.com'],
+                )
+                email.attach_alternative(f"<p>Ticket {i}</p>", "text/html")
+                email.attach(f'p_{i}_ticket.jpg', attachment, 'image/jpeg')
+                yield email
+
+        try:
+            with smtp_settings:
+                results = []
+                for name, send in (
+                    ('EmailMessage.send', lambda batch: [email.send(fail_silently=False) for email in batch]),
+                    ('api.mail.send_messages', mail.send_messages),
+                ):
+                    sessions_before = sink.sessions
+                    batch = list(messages())
+                    started = time.perf_counter()
+                    send(batch)
+                    mail.close_connection()
+                    elapsed = time.perf_counter() - started
+                    results.append((name, elapsed, sink.sessions - sessions_before))
+        finally:
+            sink.shutdown()
+            sink.server_close()
+
+        baseline = results[0][1]
+        for name, elapsed, sessions in results:
+            self.stdout.write(
+                f"{name:<24} {options['messages'] / elapsed * 60:8.0f} emails/min  "
+                f"{elapsed:6.2f}s  {sessions:4d} session(s)  ({baseline / elapsed:.1f}x)"
+            )
+        self.stdout.write(f"Sink received {sink.messages} message(s)")
@@ -0,0 +1,46 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from api import exports
+from api.exports import EXPORTS, CHUNK_SIZE, iter_export, stream_csv, write_xlsx
+
+
+class Command(BaseCommand):
+    help = "Export participants, teams or payments to CSV (default) or XLSX"
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(EXPORTS))
+        parser.add_argument('--format', dest='file_type', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument('--output', '-o', default='-', help="File to write; '-' for stdout (CSV only)")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--segment', help='Segment code')
+        parser.add_argument('--competition', help='Competition or team competition code')
+        parser.add_argument('--payment-verified', choices=['true', 'false'])
+        parser.add_argument('--search', help='Name, email, phone or transaction ID')
+        parser.add_argument('--method', help='Payment method')
+
+    def handle(self, *args, **options):
+        params = {
+            key: options[key]
+            for key in ('segment', 'competition', 'payment_verified', 'search', 'method')
+            if options[key] is not None
+        }
+        rows = iter_export(options['dataset'], params, options['chunk_size'])
+        output = options['output']
+
+        if options['file_type'] == 'xlsx':
+            if exports.openpyxl is None:
+                raise CommandError("XLSX export requires openpyxl")
+            if output == '-':
+                raise CommandError("XLSX export needs --output")
+            with open(output, 'wb') as fileobj:
+                write_xlsx(rows, fileobj, options['dataset'])
+        elif output == '-':
+            for piece in stream_csv(rows):
+                sys.stdout.write(piece)
+        else:
+            with open(output, 'w', encoding='utf-8', newline='') as fileobj:
+                for piece in stream_csv(rows):
+                    fileobj.write(piece)
+
+        if output != '-':
+            self.stdout.write(self.style.SUCCESS(f"Exported {options['dataset']} to {output}"))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from api.tickets import all_qr_ids, default_workers, prerender
+
+
+class Command(BaseCommand):
+    help = (
+        "Render QR codes and ticket images ahead of time across a process pool, "
+        "so verification emails only attach files. Tickets already stored are "
+        "skipped, so re-running only renders new registrations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=default_workers(), help='Processes (default: CPU count)')
+        parser.add_argument('--force', action='store_true', help='Re-render tickets that are already stored')
+        parser.add_argument('--participants-only', action='store_true')
+        parser.add_argument('--teams-only', action='store_true')
+        parser.add_argument('--limit', type=int, help='Render at most this many (for sizing runs)')
+
+    def handle(self, *args, **options):
+        qr_ids = all_qr_ids(
+            participants=not options['teams_only'],
+            teams=not options['participants_only']
+        )
+        if options['limit']:
+            qr_ids = qr_ids[:options['limit']]
+
+        stats = prerender(qr_ids, workers=options['workers'], force=options['force'])
+
+        for qr_id in stats['failed']:
+            self.stderr.write(self.style.ERROR(f"Failed: {qr_id}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['rendered']} rendered, {stats['skipped']} already stored, "
+            f"{len(stats['failed'])} failed of {stats['total']} in {stats['seconds']}s "
+            f"with {stats['workers']} worker(s): {stats['tickets_per_sec']} tickets/sec"
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from api.models import EventSummary
+from api.summaries import SOURCES, EVENT_KINDS, rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute the segment / competition summary counters and report any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(SOURCES), help='Only rebuild one kind of event')
+
+    def handle(self, *args, **options):
+        for model, kind in EVENT_KINDS.items():
+            if options['kind'] and kind != options['kind']:
+                continue
+
+            object_ids = list(model.objects.order_by('id').values_list('id', flat=True))
+            orphans, _ = EventSummary.objects.filter(kind=kind).exclude(object_id__in=object_ids).delete()
+            drifted = rebuild_summaries(kind, object_ids)
+
+            style = self.style.WARNING if drifted or orphans else self.style.SUCCESS
+            self.stdout.write(style(
+                f"{kind}: {len(object_ids)} summaries, {drifted} drifted, {orphans} orphaned removed"
+            ))
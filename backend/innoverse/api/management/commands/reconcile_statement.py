@@ -0,0 +1,36 @@
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from api.reconciliation import StatementError, reconcile, write_report
+
+
+class Command(BaseCommand):
+    help = "Match a bKash / Nagad statement CSV against payments and verify the exact matches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help='Statement CSV file')
+        parser.add_argument('--method', help='Only match payments made with this method (e.g. bkash)')
+        parser.add_argument('--dry-run', action='store_true', help='Report matches without verifying')
+        parser.add_argument('--report', '-o', help="Mismatch report CSV; '-' for stdout")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            with open(options['statement'], 'rb') as fileobj:
+                counts, report = reconcile(fileobj, method=options['method'], dry_run=options['dry_run'])
+        except (OSError, StatementError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        if options['report'] == '-':
+            write_report(report, sys.stdout)
+        elif options['report']:
+            with open(options['report'], 'w', newline='', encoding='utf-8') as fileobj:
+                write_report(report, fileobj)
+
+        for name, count in sorted(counts.items()):
+            self.stderr.write(f"{name:<28} {count}")
+        verb = 'would be verified' if options['dry_run'] else 'verified'
+        self.stderr.write(self.style.SUCCESS(
+            f"{counts.get('verified', 0)} payment(s) {verb}, {len(report)} row(s) reported in {elapsed:.2f}s"
+        ))
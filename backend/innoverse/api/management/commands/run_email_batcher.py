@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.batching import EmailBatcher
+from innoverse.celery import app
+
+
+class Command(BaseCommand):
+    help = (
+        "Consume the emails queue in micro-batches: up to --batch-size messages "
+        "or --window-ms after the first, sent over one SMTP session. Run this "
+        "instead of a Celery worker on the emails queue (celery worker -X emails)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_BATCH_SIZE)
+        parser.add_argument('--window-ms', type=int, default=settings.EMAIL_BATCH_WINDOW_MS)
+
+    def handle(self, *args, **options):
+        from api.assets import preload
+        from api.mail import close_connection
+
+        preload()
+        try:
+            stats = EmailBatcher(app, options['batch_size'], options['window_ms']).run()
+        finally:
+            close_connection()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['sent']} sent in {stats['batches']} batch(es), "
+            f"{stats['retried']} retried, {stats['failed']} failed"
+        ))
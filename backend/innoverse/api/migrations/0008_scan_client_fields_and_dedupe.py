@@ -0,0 +1,74 @@
+# Generated by Django 5.2.6 on 2026-10-17 14:05
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_scans(apps, schema_editor):
+    """Keep the first row per entity (and gift) so the unique constraints apply"""
+    EntryStatus = apps.get_model('api', 'EntryStatus')
+    GiftStatus = apps.get_model('api', 'GiftStatus')
+
+    for model, group_fields in (
+        (EntryStatus, ['participant']),
+        (EntryStatus, ['team']),
+        (GiftStatus, ['participant', 'gift']),
+        (GiftStatus, ['team', 'gift']),
+    ):
+        duplicates = (
+            model.objects.filter(**{f'{group_fields[0]}__isnull': False})
+            .values(*group_fields)
+            .annotate(n=Count('id'), first_id=Min('id'))
+            .filter(n__gt=1)
+        )
+        for group in duplicates:
+            first_id = group.pop('first_id')
+            group.pop('n')
+            model.objects.filter(**group).exclude(id=first_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entrystatus',
+            name='client_datetime',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='entrystatus',
+            name='device_id',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='giftstatus',
+            name='client_datetime',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='giftstatus',
+            name='device_id',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(remove_duplicate_scans, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='entrystatus',
+            constraint=models.UniqueConstraint(condition=models.Q(('participant__isnull', False)), fields=('participant',), name='unique_participant_entry'),
+        ),
+        migrations.AddConstraint(
+            model_name='entrystatus',
+            constraint=models.UniqueConstraint(condition=models.Q(('team__isnull', False)), fields=('team',), name='unique_team_entry'),
+        ),
+        migrations.AddConstraint(
+            model_name='giftstatus',
+            constraint=models.UniqueConstraint(condition=models.Q(('participant__isnull', False)), fields=('participant', 'gift'), name='unique_participant_gift'),
+        ),
+        migrations.AddConstraint(
+            model_name='giftstatus',
+            constraint=models.UniqueConstraint(condition=models.Q(('team__isnull', False)), fields=('team', 'gift'), name='unique_team_gift'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_scan_client_fields_and_dedupe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='volunteer',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
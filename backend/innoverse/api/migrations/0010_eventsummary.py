@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_volunteer_token_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('segment', 'Segment'), ('competition', 'Competition'), ('team_competition', 'Team Competition')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('registrations', models.IntegerField(default=0)),
+                ('verified', models.IntegerField(default=0)),
+                ('entries', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_event_summary')],
+            },
+        ),
+    ]
@@ -15,6 +15,7 @@ class Volunteer(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='volunteer_profile', db_index=True)
     v_name = models.CharField(max_length=100, db_index=True)
     role = models.ForeignKey(Role, on_delete=models.CASCADE, related_name='role', db_index=True)
+    token_version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"{self.v_name} ({self.role.role_name})"
@@ -31,6 +32,22 @@ class GiftStatus(models.Model):
     gift = models.ForeignKey(Gift, on_delete=models.CASCADE, db_index=True)
     volunteer = models.ForeignKey(Volunteer, on_delete=models.CASCADE, null=True, blank=True, db_index=True)
     datetime = models.DateTimeField(auto_now_add=True, db_index=True)
+    client_datetime = models.DateTimeField(null=True, blank=True)
+    device_id = models.CharField(max_length=100, blank=True, default='')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['participant', 'gift'],
+                condition=models.Q(participant__isnull=False),
+                name='unique_participant_gift'
+            ),
+            models.UniqueConstraint(
+                fields=['team', 'gift'],
+                condition=models.Q(team__isnull=False),
+                name='unique_team_gift'
+            ),
+        ]
 
     def clean(self):
         if not self.participant and not self.team:
@@ -50,6 +67,22 @@ class EntryStatus(models.Model):
     team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='entry_status', null=True, blank=True, db_index=True)
     volunteer = models.ForeignKey(Volunteer, on_delete=models.CASCADE, null=True, blank=True, db_index=True)
     datetime = models.DateTimeField(auto_now_add=True, db_index=True)
+    client_datetime = models.DateTimeField(null=True, blank=True)
+    device_id = models.CharField(max_length=100, blank=True, default='')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['participant'],
+                condition=models.Q(participant__isnull=False),
+                name='unique_participant_entry'
+            ),
+            models.UniqueConstraint(
+                fields=['team'],
+                condition=models.Q(team__isnull=False),
+                name='unique_team_entry'
+            ),
+        ]
 
     def clean(self):
         if not self.participant and not self.team:
@@ -64,5 +97,57 @@ class EntryStatus(models.Model):
 
 
 
+class EmailOutbox(models.Model):
+    """Email tasks written in the same transaction as the rows they describe"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('dispatching', 'Dispatching'),
+        ('dispatched', 'Dispatched'),
+        ('failed', 'Failed'),
+    ]
+
+    task_name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.task_name} [{self.status}] #{self.id}"
+
+
+
 # class User(AbstractUser):
 #     email = models.EmailField(unique=True)
+
+
+class EventSummary(models.Model):
+    """
+    Registration, verified-payment and entry counts per segment /
+    competition / team competition. Kept current with F() updates in the
+    same transaction as the writes (api/summaries.py); rebuild with
+    `manage.py rebuild_event_summaries`.
+    """
+    KIND_CHOICES = [
+        ('segment', 'Segment'),
+        ('competition', 'Competition'),
+        ('team_competition', 'Team Competition'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    registrations = models.IntegerField(default=0)
+    verified = models.IntegerField(default=0)
+    entries = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_event_summary'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}: {self.registrations} registered, {self.entries} entered"
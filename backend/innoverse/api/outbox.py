@@ -0,0 +1,135 @@
+import logging
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+MAX_ATTEMPTS = 5
+CLAIM_TIMEOUT = timedelta(minutes=10)
+DISPATCHED_RETENTION = timedelta(days=7)
+
+PUBLISH_RETRY_POLICY = {
+    'max_retries': 2,
+    'interval_start': 0,
+    'interval_step': 1,
+    'interval_max': 2,
+}
+
+
+def enqueue_email(task, *args, **kwargs):
+    """
+    Record an email task in the outbox.
+
+    Call this inside the transaction that writes the rows the email is
+    about: the task is only published if that transaction commits, and the
+    request never waits on the broker.
+    """
+    return EmailOutbox.objects.create(
+        task_name=task.name,
+        args=list(args),
+        kwargs=kwargs
+    )
+
+
+def dispatch_pending(batch_size=100):
+    """
+    Publish one batch of pending outbox rows to the emails queue.
+
+    Rows are claimed in a short transaction (SKIP LOCKED, so several
+    dispatchers never publish the same row) and published outside of it.
+    Returns the number of rows published.
+    """
+    from innoverse.celery import app
+
+    now = timezone.now()
+
+    # Rows claimed by a dispatcher that died mid-batch go back to the queue
+    EmailOutbox.objects.filter(
+        status='dispatching',
+        claimed_at__lt=now - CLAIM_TIMEOUT
+    ).update(status='pending')
+
+    with transaction.atomic():
+        ids = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+
+        EmailOutbox.objects.filter(id__in=ids).update(
+            status='dispatching',
+            claimed_at=now,
+            attempts=F('attempts') + 1
+        )
+
+    entries = list(EmailOutbox.objects.filter(id__in=ids).order_by('id'))
+    published = []
+    failed = []
+
+    try:
+        with app.producer_or_acquire() as producer:
+            for entry in entries:
+                try:
+                    app.send_task(
+                        entry.task_name,
+                        args=entry.args,
+                        kwargs=entry.kwargs,
+                        queue='emails',
+                        producer=producer,
+                        retry=True,
+                        retry_policy=PUBLISH_RETRY_POLICY
+                    )
+                    published.append(entry.id)
+                except Exception as e:
+                    logger.error(f"Failed to publish outbox entry {entry.id}: {str(e)}")
+                    failed.append((entry, str(e)))
+    except Exception as e:
+        # Broker unreachable - release everything not yet published
+        logger.error(f"Outbox dispatch aborted: {str(e)}")
+        handled = set(published) | {entry.id for entry, _ in failed}
+        failed.extend((entry, str(e)) for entry in entries if entry.id not in handled)
+
+    if published:
+        EmailOutbox.objects.filter(id__in=published).update(
+            status='dispatched',
+            dispatched_at=timezone.now()
+        )
+
+    for entry, error in failed:
+        entry.status = 'failed' if entry.attempts >= MAX_ATTEMPTS else 'pending'
+        entry.last_error = error
+        entry.save(update_fields=['status', 'last_error'])
+
+    logger.info(f"Outbox batch: {len(published)} published, {len(failed)} failed")
+    return len(published)
+
+
+def purge_dispatched(older_than=DISPATCHED_RETENTION, batch_size=1000):
+    """
+    Delete dispatched outbox rows older than older_than, in batches so no
+    single DELETE holds locks for long. Failed rows are kept for inspection.
+    Returns the number of rows deleted.
+    """
+    cutoff = timezone.now() - older_than
+    total = 0
+    while True:
+        ids = list(
+            EmailOutbox.objects.filter(status='dispatched', dispatched_at__lt=cutoff)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        deleted, _ = EmailOutbox.objects.filter(id__in=ids).delete()
+        total += deleted
+
+    if total:
+        logger.info(f"Purged {total} dispatched outbox row(s) older than {older_than}")
+    return total
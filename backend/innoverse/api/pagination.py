@@ -0,0 +1,62 @@
+import hashlib
+import logging
+from django.core.cache import cache
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+
+COUNT_TTL = 60  # totals may lag behind new registrations by up to a minute
+
+
+def cached_count(queryset):
+    """queryset.count(), cached per distinct SQL for COUNT_TTL seconds"""
+    sql = str(queryset.query)
+    key = f"listing_count_{hashlib.sha256(sql.encode()).hexdigest()}"
+
+    try:
+        count = cache.get(key)
+        if count is not None:
+            return count
+    except Exception as e:
+        logger.warning(f"Listing count cache unavailable: {str(e)}")
+
+    count = queryset.count()
+    try:
+        cache.set(key, count, timeout=COUNT_TTL)
+    except Exception:
+        pass
+    return count
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination on -id with opaque cursors.
+
+    Each page is one indexed range scan however deep the client goes.
+    The total is only computed when asked for with ?count=true, and is
+    served from a short-lived cache.
+    """
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.queryset = queryset
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response_data = {
+            'success': True,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+
+        if self.request.query_params.get(self.count_query_param, '').lower() == 'true':
+            response_data['count'] = cached_count(self.queryset)
+
+        response_data['data'] = data
+        return Response(response_data)
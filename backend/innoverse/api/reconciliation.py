@@ -0,0 +1,261 @@
+"""
+Reconciliation of bKash / Nagad statements against Payment rows.
+
+The statement CSV is read row by row and matched by transaction ID
+through a hash index of every Payment built once per import, with amount
+and sender phone as tie-breakers when several registrations claim the
+same transaction. Exact matches are verified in bulk through
+verification.bulk_verify; every other row ends up in the mismatch report.
+"""
+
+import csv
+import io
+import logging
+import re
+from collections import Counter, defaultdict, namedtuple
+from decimal import Decimal, InvalidOperation
+from participant.models import Payment, TeamParticipant
+from .verification import MAX_IDS, bulk_verify
+
+logger = logging.getLogger(__name__)
+
+
+HEADER_SEARCH_ROWS = 20
+
+# Normalised header -> column, covering the bKash and Nagad merchant exports
+COLUMN_ALIASES = {
+    'trx_id': ('trxid', 'transactionid', 'txnid', 'trxno', 'transactionno', 'transactionnumber'),
+    'amount': ('amount', 'amountbdt', 'transactionamount', 'amounttk'),
+    'phone': ('sender', 'from', 'phone', 'account', 'customer', 'customerno', 'msisdn', 'senderno', 'fromaccount'),
+    'status': ('status', 'transactionstatus'),
+}
+COMPLETED_STATUSES = {'', 'completed', 'complete', 'success', 'successful'}
+
+# Outcomes for a statement row
+MATCHED = 'verified'
+ALREADY_VERIFIED = 'already_verified'
+NOT_FOUND = 'not_found'
+AMOUNT_MISMATCH = 'amount_mismatch'
+PHONE_MISMATCH = 'phone_mismatch'
+MISMATCH = 'amount_and_phone_mismatch'
+AMBIGUOUS = 'ambiguous'
+DUPLICATE = 'duplicate_row'
+NO_PARTICIPANT = 'no_participant'
+NOT_COMPLETED = 'not_completed'
+INVALID = 'invalid_row'
+
+REPORT_HEADER = ['line', 'trx_id', 'amount', 'phone', 'status', 'payment_ids', 'participant_id', 'detail']
+
+
+class StatementError(Exception):
+    """The file is not a statement we can read"""
+
+
+IndexedPayment = namedtuple('IndexedPayment', ['id', 'amount', 'phone', 'owner'])
+
+
+def normalize_trx(value):
+    return (value or '').strip().upper()
+
+
+def normalize_phone(value):
+    # Last 10 digits: 017XXXXXXXX, +88017XXXXXXXX and 88017XXXXXXXX are the same account
+    digits = re.sub(r'\D', '', value or '')
+    return digits[-10:]
+
+
+def parse_amount(value):
+    cleaned = re.sub(r'[^\d.\-]', '', value or '')
+    try:
+        return Decimal(cleaned).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+def _normalize_header(value):
+    return re.sub(r'[^a-z]', '', (value or '').lower())
+
+
+def _columns(header):
+    names = [_normalize_header(cell) for cell in header]
+    columns = {}
+    for column, aliases in COLUMN_ALIASES.items():
+        for position, name in enumerate(names):
+            if name in aliases:
+                columns[column] = position
+                break
+    return columns
+
+
+def read_statement(fileobj):
+    """
+    Yield (line, trx_id, amount, phone, status) for each statement row.
+
+    fileobj is a binary file. Exports often start with a few lines of
+    account details, so the header is the first row naming a transaction
+    ID and an amount column.
+    """
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', errors='replace', newline='')
+    reader = csv.reader(text)
+
+    columns = None
+    for row in reader:
+        candidate = _columns(row)
+        if 'trx_id' in candidate and 'amount' in candidate:
+            columns = candidate
+            break
+        if reader.line_num >= HEADER_SEARCH_ROWS:
+            break
+    if columns is None:
+        raise StatementError("No header with transaction ID and amount columns found")
+
+    width = max(columns.values()) + 1
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        if len(row) < width:
+            row = row + [''] * (width - len(row))
+        yield (
+            reader.line_num,
+            row[columns['trx_id']],
+            row[columns['amount']],
+            row[columns['phone']] if 'phone' in columns else None,
+            row[columns['status']] if 'status' in columns else '',
+        )
+
+
+def build_index(method=None):
+    """trx_id -> [IndexedPayment]; owner is the participant to verify (None if there is none)"""
+    queryset = Payment.objects.order_by()
+    if method:
+        queryset = queryset.filter(method__iexact=method)
+
+    leaders = dict(
+        TeamParticipant.objects.filter(is_leader=True, participant__isnull=False)
+        .values_list('team_id', 'participant_id')
+    )
+
+    index = defaultdict(list)
+    for payment_id, trx_id, amount, phone, participant_id, team_id in (
+        queryset.values_list('id', 'trx_id', 'amount', 'phone', 'participant_id', 'team_id')
+        .iterator(chunk_size=5000)
+    ):
+        owner = participant_id or leaders.get(team_id)
+        index[normalize_trx(trx_id)].append(
+            IndexedPayment(payment_id, amount, normalize_phone(phone), owner)
+        )
+    return index
+
+
+def match_row(candidates, amount, phone):
+    """(status, [IndexedPayment]) for one statement row against the payments claiming its trx_id"""
+    if not candidates:
+        return NOT_FOUND, []
+
+    amount_ok = [p for p in candidates if p.amount == amount]
+    exact = [p for p in amount_ok if not phone or p.phone == phone]
+
+    if not exact:
+        if amount_ok:
+            return PHONE_MISMATCH, amount_ok
+        if phone and any(p.phone == phone for p in candidates):
+            return AMOUNT_MISMATCH, [p for p in candidates if p.phone == phone]
+        return (AMOUNT_MISMATCH if not phone else MISMATCH), candidates
+
+    # A participant's payment and the team payment of the same registration share the trx_id
+    owners = {p.owner for p in exact}
+    if None in owners:
+        return NO_PARTICIPANT, exact
+    if len(owners) > 1:
+        return AMBIGUOUS, exact
+    return MATCHED, exact
+
+
+def reconcile(fileobj, method=None, dry_run=False):
+    """
+    Match a statement and verify the exact matches.
+
+    Returns (counts, report) where report holds one entry per statement
+    row that was not verified by this import (and, with dry_run, the rows
+    that would have been).
+    """
+    index = build_index(method)
+    seen = set()
+    matched = []  # (entry, participant_id)
+    report = []
+    counts = Counter()
+
+    for line, raw_trx, raw_amount, raw_phone, raw_status in read_statement(fileobj):
+        trx_id = normalize_trx(raw_trx)
+        amount = parse_amount(raw_amount)
+        phone = normalize_phone(raw_phone) if raw_phone else ''
+        entry = {
+            'line': line, 'trx_id': trx_id, 'amount': str(amount) if amount is not None else raw_amount,
+            'phone': raw_phone or '', 'payment_ids': [], 'participant_id': None, 'detail': '',
+        }
+
+        if not trx_id or amount is None:
+            entry['status'] = INVALID
+        elif raw_status.strip().lower() not in COMPLETED_STATUSES:
+            entry['status'] = NOT_COMPLETED
+            entry['detail'] = raw_status.strip()
+        elif trx_id in seen:
+            entry['status'] = DUPLICATE
+        else:
+            seen.add(trx_id)
+            status, payments = match_row(index.get(trx_id), amount, phone)
+            entry['status'] = status
+            entry['payment_ids'] = [p.id for p in payments]
+            if status == MATCHED:
+                entry['participant_id'] = payments[0].owner
+                matched.append(entry)
+                continue
+            if payments and status != NO_PARTICIPANT:
+                entry['detail'] = '; '.join(f"{p.amount} from {p.phone or '-'}" for p in payments)
+
+        counts[entry['status']] += 1
+        report.append(entry)
+
+    if dry_run:
+        counts[MATCHED] += len(matched)
+        report.extend(matched)
+    else:
+        _verify(matched, counts, report)
+
+    report.sort(key=lambda entry: entry['line'])
+    logger.info(f"Statement reconciled: {dict(counts)}{' (dry run)' if dry_run else ''}")
+    return dict(counts), report
+
+
+def _verify(matched, counts, report):
+    # bulk_verify commits each chunk on its own, so row locks are held for
+    # one chunk rather than the whole statement
+    outcomes = {}
+    participant_ids = list(dict.fromkeys(entry['participant_id'] for entry in matched))
+    for start in range(0, len(participant_ids), MAX_IDS):
+        results, _ = bulk_verify(participant_ids[start:start + MAX_IDS])
+        outcomes.update((result['id'], result['status']) for result in results)
+
+    for entry in matched:
+        outcome = outcomes.get(entry['participant_id'])
+        if outcome == 'verified':
+            counts[MATCHED] += 1
+            continue
+        if outcome is None or outcome == 'not_found':
+            entry['status'] = NOT_FOUND
+            entry['detail'] = 'participant no longer exists'
+        else:
+            entry['status'] = ALREADY_VERIFIED if outcome == 'already_verified' else outcome
+        counts[entry['status']] += 1
+        report.append(entry)
+
+
+def write_report(report, fileobj):
+    writer = csv.writer(fileobj)
+    writer.writerow(REPORT_HEADER)
+    for entry in report:
+        writer.writerow([
+            entry['line'], entry['trx_id'], entry['amount'], entry['phone'], entry['status'],
+            ' '.join(str(pid) for pid in entry['payment_ids']),
+            entry['participant_id'] or '', entry['detail'],
+        ])
@@ -0,0 +1,204 @@
+import logging
+from collections import namedtuple
+from django.db import transaction
+from django.db.models import Q
+from participant.models import Participant, Team
+from .models import EntryStatus, GiftStatus
+from .serializers import ScanEventSerializer
+from .entitlements import invalidate_entitlements
+from .versions import bump_version
+from .stats import invalidate_stats
+from . import summaries
+
+logger = logging.getLogger(__name__)
+
+
+MAX_EVENTS = 1000
+
+ScanEvent = namedtuple('ScanEvent', [
+    'index',            # position in the uploaded list
+    'type',             # 'entry' or 'gift'
+    'entity_type',      # 'participant' or 'team'
+    'entity_id',
+    'gift_id',          # None for entries
+    'client_datetime',
+    'device_id',
+])
+
+
+def _key(event):
+    return (event.type, event.entity_type, event.entity_id, event.gift_id)
+
+
+def _row_key(kind, row):
+    entity_type = 'participant' if row.participant_id else 'team'
+    entity_id = row.participant_id or row.team_id
+    return (kind, entity_type, entity_id, getattr(row, 'gift_id', None))
+
+
+def _order(event):
+    # Earliest scan wins; device id and upload position only break ties
+    return (event.client_datetime, event.device_id, event.index)
+
+
+def _is_ours(row, event, volunteer_id):
+    # bulk_create(ignore_conflicts=True) does not say which rows it inserted
+    return (
+        row.client_datetime == event.client_datetime and
+        row.device_id == event.device_id and
+        row.volunteer_id == volunteer_id
+    )
+
+
+def sync_scan_events(items, volunteer_id, device_id=''):
+    """
+    Apply a batch of scans recorded offline.
+
+    There is at most one entry per entity and one handout per (entity, gift).
+    When several scans claim the same slot, the one with the earliest
+    client_datetime is kept, whether it arrives in this batch, a later batch
+    or was recorded online (which counts at its server time). The outcome
+    therefore does not depend on the order in which devices sync.
+
+    Returns one result per item, in upload order, with status
+    'recorded', 'duplicate' or 'invalid'.
+    """
+    results = []
+    events = []
+
+    for index, item in enumerate(items):
+        result = {'index': index}
+        if isinstance(item, dict) and item.get('client_id'):
+            result['client_id'] = item['client_id']
+        results.append(result)
+
+        serializer = ScanEventSerializer(data=item)
+        if not serializer.is_valid():
+            result.update(status='invalid', errors=serializer.errors)
+            continue
+
+        data = serializer.validated_data
+        events.append(ScanEvent(
+            index=index,
+            type=data['type'],
+            entity_type=data['entity_type'],
+            entity_id=data['entity_id'],
+            gift_id=data['gift'].id if data['type'] == 'gift' else None,
+            client_datetime=data['client_datetime'],
+            device_id=data.get('device_id') or device_id,
+        ))
+
+    # Unknown participants / teams (one query each)
+    participant_ids = {e.entity_id for e in events if e.entity_type == 'participant'}
+    team_ids = {e.entity_id for e in events if e.entity_type == 'team'}
+    participant_ids &= set(Participant.objects.filter(id__in=participant_ids).values_list('id', flat=True))
+    team_ids &= set(Team.objects.filter(id__in=team_ids).values_list('id', flat=True))
+
+    valid_events = []
+    for event in events:
+        known = participant_ids if event.entity_type == 'participant' else team_ids
+        if event.entity_id not in known:
+            results[event.index].update(
+                status='invalid',
+                errors={'id': [f"No {event.entity_type} with the ID"]}
+            )
+        else:
+            valid_events.append(event)
+
+    # One candidate per slot; the rest of the batch are duplicates
+    candidates = {}
+    for event in sorted(valid_events, key=_order):
+        if _key(event) in candidates:
+            results[event.index]['status'] = 'duplicate'
+        else:
+            candidates[_key(event)] = event
+
+    if not candidates:
+        return results
+
+    entity_filter = Q(participant_id__in=participant_ids) | Q(team_id__in=team_ids)
+    new_entries, new_gifts, superseded = [], [], []
+    inserted = {}  # key -> event, for slots that were free when we looked
+
+    def supersede_or_duplicate(row, event):
+        if event.client_datetime < (row.client_datetime or row.datetime):
+            # This scan happened first - it becomes the record
+            row.volunteer_id = volunteer_id
+            row.client_datetime = event.client_datetime
+            row.device_id = event.device_id
+            superseded.append(row)
+            results[event.index]['status'] = 'recorded'
+        else:
+            results[event.index]['status'] = 'duplicate'
+
+    with transaction.atomic():
+        existing = {}
+        for kind, model in (('entry', EntryStatus), ('gift', GiftStatus)):
+            for row in model.objects.select_for_update().filter(entity_filter):
+                existing[_row_key(kind, row)] = row
+
+        for key, event in candidates.items():
+            row = existing.get(key)
+            if row is not None:
+                supersede_or_duplicate(row, event)
+                continue
+
+            fields = {
+                f'{event.entity_type}_id': event.entity_id,
+                'volunteer_id': volunteer_id,
+                'client_datetime': event.client_datetime,
+                'device_id': event.device_id,
+            }
+            if event.type == 'entry':
+                new_entries.append(EntryStatus(**fields))
+            else:
+                new_gifts.append(GiftStatus(gift_id=event.gift_id, **fields))
+            inserted[key] = event
+
+        # ignore_conflicts: a concurrent scan may have taken the slot since
+        EntryStatus.objects.bulk_create(new_entries, ignore_conflicts=True)
+        GiftStatus.objects.bulk_create(new_gifts, ignore_conflicts=True)
+
+        # Read the slots back - a row that is not ours lost the race and is
+        # resolved by the same earliest-scan rule as the existing rows
+        entered = {'participant': [], 'team': []}
+        created = 0
+        if inserted:
+            inserted_participants = {k[2] for k in inserted if k[1] == 'participant'}
+            inserted_teams = {k[2] for k in inserted if k[1] == 'team'}
+            inserted_filter = Q(participant_id__in=inserted_participants) | Q(team_id__in=inserted_teams)
+            for kind, model in (('entry', EntryStatus), ('gift', GiftStatus)):
+                for row in model.objects.select_for_update().filter(inserted_filter):
+                    event = inserted.get(_row_key(kind, row))
+                    if event is None:
+                        continue
+                    if _is_ours(row, event, volunteer_id):
+                        results[event.index]['status'] = 'recorded'
+                        created += 1
+                        if kind == 'entry':
+                            entered[event.entity_type].append(event.entity_id)
+                    else:
+                        supersede_or_duplicate(row, event)
+
+        for owner, owner_ids in entered.items():
+            if owner_ids:
+                summaries.entries_changed(owner, owner_ids, 1)
+        for model in (EntryStatus, GiftStatus):
+            rows = [row for row in superseded if isinstance(row, model)]
+            if rows:
+                model.objects.bulk_update(rows, ['volunteer', 'client_datetime', 'device_id'])
+
+        # bulk_create / bulk_update do not send model signals
+        invalidate_entitlements(
+            participant_ids={e.entity_id for e in candidates.values() if e.entity_type == 'participant'},
+            team_ids={e.entity_id for e in candidates.values() if e.entity_type == 'team'}
+        )
+        if new_entries or new_gifts or superseded:
+            transaction.on_commit(lambda: bump_version('participants', 'teams'))
+            invalidate_stats('scans')
+
+    logger.info(
+        f"Scan sync: {created} created, "
+        f"{len(superseded)} superseded, {len(items)} uploaded"
+    )
+    return results
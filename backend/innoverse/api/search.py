@@ -0,0 +1,298 @@
+"""
+Fuzzy search over participants, team members and payments.
+
+On PostgreSQL every searched column has a GIN trigram index on
+UPPER(col::text) (participant migration 0013), which serves both the
+icontains filters and pg_trgm similarity ranking. Other databases (SQLite
+dev/test setups) use an in-process trigram index that is rebuilt whenever
+the 'search' version is bumped.
+"""
+
+import heapq
+import logging
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Greatest, Upper
+from participant.models import Participant, TeamParticipant, Payment
+from .versions import get_version
+
+logger = logging.getLogger(__name__)
+
+
+SIMILARITY_THRESHOLD = 0.3  # pg_trgm.similarity_threshold default
+MAX_LIMIT = 100
+
+# Used only when the cache is unreachable and the version cannot be checked
+FALLBACK_TTL = 30
+
+SearchSource = namedtuple('SearchSource', ['model', 'fields', 'columns'])
+
+SOURCES = {
+    'participant': SearchSource(
+        Participant,
+        ['f_name', 'l_name', 'email', 'phone'],
+        ['id', 'f_name', 'l_name', 'email', 'phone'],
+    ),
+    'team_member': SearchSource(
+        TeamParticipant,
+        ['f_name', 'l_name', 'email', 'phone'],
+        ['id', 'f_name', 'l_name', 'email', 'phone', 'team_id', 'participant_id'],
+    ),
+    'payment': SearchSource(
+        Payment,
+        ['trx_id', 'phone'],
+        ['id', 'trx_id', 'phone', 'participant_id', 'team_id'],
+    ),
+}
+
+
+def _use_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def _format(kind, row, score):
+    result = {'type': kind, 'score': round(score, 3), **row}
+    if kind == 'participant':
+        result['qr_id'] = f"p_{row['id']}"
+    elif kind == 'team_member':
+        result['qr_id'] = f"t_{row['team_id']}"
+    else:
+        result['qr_id'] = f"p_{row['participant_id']}" if row['participant_id'] else f"t_{row['team_id']}"
+    return result
+
+
+def search(term, limit=20):
+    """
+    Ranked matches for `term` across all sources, best first.
+
+    A row matches when any searched field contains the term or is
+    trigram-similar to it; rows are ranked by their best field similarity.
+    """
+    term = (term or '').strip()
+    if not term:
+        return []
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    if _use_postgres():
+        results = _search_postgres(term, limit)
+    else:
+        results = trigram_index.search(term, limit)
+
+    results.sort(key=lambda r: (-r['score'], r['type'], -r['id']))
+    return results[:limit]
+
+
+def participant_search_q(term):
+    """
+    Filter for participant listings: substring match on name, email,
+    phone, or on the phone / trx_id of one of their payments. Served by
+    the trigram indexes on PostgreSQL; a plain scan elsewhere.
+    """
+    payments = Payment.objects.filter(
+        Q(trx_id__icontains=term) | Q(phone__icontains=term),
+        participant__isnull=False
+    ).values('participant_id')
+    return (
+        Q(f_name__icontains=term) |
+        Q(l_name__icontains=term) |
+        Q(email__icontains=term) |
+        Q(phone__icontains=term) |
+        Q(id__in=payments)
+    )
+
+
+def _search_postgres(term, limit):
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    upper = term.upper()
+    results = []
+
+    for kind, source in SOURCES.items():
+        uppers = {f"{field}_upper": Upper(field) for field in source.fields}
+
+        match = Q()
+        for field in source.fields:
+            match |= Q(**{f"{field}__icontains": term})
+            match |= Q(**{f"{field}_upper__trigram_similar": upper})
+
+        similarities = [TrigramSimilarity(Upper(field), upper) for field in source.fields]
+        score = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+
+        rows = (
+            source.model.objects
+            .annotate(**uppers)
+            .filter(match)
+            .annotate(score=score)
+            .order_by('-score', '-id')
+            .values(*source.columns, 'score')[:limit]
+        )
+        for row in rows:
+            score = row.pop('score') or 0.0
+            results.append(_format(kind, row, score))
+
+    return results
+
+
+WORD_RE = re.compile(r'[0-9a-z]+')
+
+
+def trigrams(text):
+    """pg_trgm-compatible trigram set: lowercased words padded '  word '"""
+    grams = set()
+    for word in WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _inner_trigrams(text):
+    # Trigrams every containing string must also have (no word padding)
+    grams = set()
+    for word in WORD_RE.findall(text.lower()):
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+SearchIndex = namedtuple('SearchIndex', [
+    'docs',      # doc id -> (kind, row)
+    'values',    # value id -> (lowercased value, trigram count, [doc id, ...])
+    'postings',  # trigram -> [value id, ...]
+])
+
+
+class TrigramIndex:
+    """
+    Process-local inverted trigram index (fallback for non-PostgreSQL).
+
+    Distinct field values are indexed once with their trigram count, so
+    similarity comes from posting counts alone:
+    shared / (len(query) + len(value) - shared). Reads compare against the
+    'search' version in the cache, so a rebuild happens at most once per
+    data change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._built_at = None
+        self._index = SearchIndex([], [], {})
+
+    def _ensure_fresh(self):
+        try:
+            version = get_version('search')
+        except Exception as e:
+            logger.warning(f"Search version unavailable: {str(e)}")
+            version = None
+
+        with self._lock:
+            if self._built_at is not None:
+                if version is not None and version == self._version:
+                    return self._index
+                if version is None and time.monotonic() - self._built_at < FALLBACK_TTL:
+                    return self._index
+            self._index = self._build()
+            self._version = version
+            self._built_at = time.monotonic()
+            return self._index
+
+    def _build(self):
+        docs, values, postings = [], [], {}
+        value_ids = {}
+
+        for kind, source in SOURCES.items():
+            for row in source.model.objects.values(*source.columns).iterator(chunk_size=2000):
+                doc_id = len(docs)
+                docs.append((kind, row))
+                for field in source.fields:
+                    if not row[field]:
+                        continue
+                    value = row[field].lower()
+                    value_id = value_ids.get(value)
+                    if value_id is None:
+                        grams = trigrams(value)
+                        value_id = value_ids[value] = len(values)
+                        values.append((value, len(grams), []))
+                        for gram in grams:
+                            postings.setdefault(gram, []).append(value_id)
+                    if values[value_id][2][-1:] != [doc_id]:
+                        values[value_id][2].append(doc_id)
+
+        logger.info(f"Search index rebuilt: {len(docs)} documents, {len(values)} values, {len(postings)} trigrams")
+        return SearchIndex(docs, values, postings)
+
+    def _containing(self, index, term):
+        """Value ids containing term (case-insensitive)"""
+        needle = term.lower()
+        inner = _inner_trigrams(term)
+
+        if inner:
+            lists = sorted((index.postings.get(gram, []) for gram in inner), key=len)
+            candidates = set(lists[0])
+            for posting in lists[1:]:
+                candidates.intersection_update(posting)
+                if not candidates:
+                    break
+        else:
+            # Too short for trigrams - scan
+            candidates = range(len(index.values))
+
+        return [value_id for value_id in candidates if needle in index.values[value_id][0]]
+
+    def search(self, term, limit):
+        index = self._ensure_fresh()
+        query_grams = trigrams(term)
+        q = len(query_grams)
+
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(index.postings.get(gram, ()))
+
+        def score(value_id, count):
+            return count / (q + index.values[value_id][1] - count) if q else 0.0
+
+        # Best `limit` values by similarity. Walking by shared count allows an
+        # early stop: similarity can never exceed count / len(query).
+        top = []
+        for value_id, count in shared.most_common():
+            bound = count / q
+            if bound < SIMILARITY_THRESHOLD or (len(top) >= limit and bound <= top[0][0]):
+                break
+            value_score = score(value_id, count)
+            if value_score < SIMILARITY_THRESHOLD:
+                continue
+            if len(top) < limit:
+                heapq.heappush(top, (value_score, value_id))
+            elif value_score > top[0][0]:
+                heapq.heapreplace(top, (value_score, value_id))
+
+        # Substring matches qualify whatever their similarity
+        candidates = dict((value_id, value_score) for value_score, value_id in top)
+        for value_id in self._containing(index, term):
+            if value_id not in candidates:
+                candidates[value_id] = score(value_id, shared.get(value_id, 0))
+
+        results = {}
+        for value_id, value_score in sorted(candidates.items(), key=lambda item: -item[1]):
+            if len(results) >= limit:
+                break
+            for doc_id in index.values[value_id][2][:limit]:
+                results.setdefault(doc_id, value_score)
+
+        return [
+            _format(index.docs[doc_id][0], dict(index.docs[doc_id][1]), doc_score)
+            for doc_id, doc_score in results.items()
+        ]
+
+
+trigram_index = TrigramIndex()
@@ -6,11 +6,12 @@ from participant.models import (
     Participant, Team, TeamParticipant, Payment,
     Registration, CompetitionRegistration, TeamCompetitionRegistration
 )
-from event.models import Coupons, Segment, Competition, TeamCompetition
+from event.models import Coupons
 
-from django.core.cache import cache
-from django.db.models import Q
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q, Subquery
 from participant.models import TanvinAward
+from .catalog import catalog
+from .qr_tokens import parse_qr_id
 
 
 class RoleSerializer(serializers.ModelSerializer):
@@ -37,6 +38,34 @@ class EntryStatusSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class ScanEventSerializer(serializers.Serializer):
+    """One scan recorded offline by the volunteer app"""
+    client_id = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    type = serializers.ChoiceField(choices=['entry', 'gift'])
+    id = serializers.CharField(max_length=100)
+    gift_name = serializers.CharField(max_length=100, required=False)
+    client_datetime = serializers.DateTimeField()
+    device_id = serializers.CharField(max_length=100, required=False, allow_blank=True)
+
+    def validate_id(self, value):
+        try:
+            parse_qr_id(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+    def validate(self, data):
+        data['entity_type'], data['entity_id'] = parse_qr_id(data['id'])
+        if data['type'] == 'gift':
+            if not data.get('gift_name'):
+                raise serializers.ValidationError({"gift_name": "This field is required for gift scans."})
+            gift = catalog.get().gifts.get(data['gift_name'].lower())
+            if gift is None:
+                raise serializers.ValidationError({"gift_name": f"Gift '{data['gift_name']}' not found"})
+            data['gift'] = gift
+        return data
+
+
 
 
 class ParticipantRegistrationSerializer(serializers.Serializer):
@@ -136,13 +165,11 @@ class CompleteRegistrationSerializer(serializers.Serializer):
         return value
 
     def validate_segment(self, value):
-        """Validate all segment codes in ONE query - OPTIMIZED"""
+        """Validate all segment codes against the catalog cache - no queries"""
         if not value:
             return value
         
-        valid_codes = set(
-            Segment.objects.filter(code__in=value).values_list('code', flat=True)
-        )
+        valid_codes = catalog.get().segments
         
         invalid_codes = [code for code in value if code not in valid_codes]
         
@@ -154,13 +181,11 @@ class CompleteRegistrationSerializer(serializers.Serializer):
         return value
 
     def validate_competition(self, value):
-        """Validate all competition codes in ONE query - OPTIMIZED"""
+        """Validate all competition codes against the catalog cache - no queries"""
         if not value:
             return value
         
-        valid_codes = set(
-            Competition.objects.filter(code__in=value).values_list('code', flat=True)
-        )
+        valid_codes = catalog.get().competitions
         
         invalid_codes = [code for code in value if code not in valid_codes]
         
@@ -172,17 +197,13 @@ class CompleteRegistrationSerializer(serializers.Serializer):
         return value
 
     def validate_team_competition(self, value):
-        """Validate all team competition codes in ONE query - OPTIMIZED"""
+        """Validate all team competition codes against the catalog cache - no queries"""
         if not value or 'competition' not in value:
             return value
         
         competition_codes = value['competition']
         
-        valid_codes = set(
-            TeamCompetition.objects.filter(
-                code__in=competition_codes
-            ).values_list('code', flat=True)
-        )
+        valid_codes = catalog.get().team_competitions
         
         invalid_codes = [code for code in competition_codes if code not in valid_codes]
         
@@ -194,7 +215,10 @@ class CompleteRegistrationSerializer(serializers.Serializer):
         return value
 
     def validate_coupon(self, value):
-        """Validate coupon - OPTIMIZED with select_for_update"""
+        """
+        Validate coupon - early rejection only.
+        The authoritative check is the conditional decrement in api.coupons
+        """
         if not value:
             return None
         
@@ -207,7 +231,7 @@ class CompleteRegistrationSerializer(serializers.Serializer):
                 'id', 'coupon_code', 'coupon_number', 'discount'
             ).get(coupon_code=coupon_code)
             
-            if coupon.coupon_number <= 0:
+            if not coupon.coupon_number or coupon.coupon_number <= 0:
                 raise serializers.ValidationError(
                     f"Coupon '{coupon_code}' has no remaining uses"
                 )
@@ -291,100 +315,6 @@ class CompleteRegistrationSerializer(serializers.Serializer):
     
 
 
-# BONUS: Add caching for frequently accessed codes (optional but powerful)
-class CachedValidationMixin:
-    """
-    Mixin to add caching to code validation
-    Use this if you have stable segment/competition codes that don't change often
-    """
-    
-    @staticmethod
-    def get_valid_codes_cached(model, codes, cache_key_prefix, timeout=3600):
-        """
-        Get valid codes with caching
-        
-        Args:
-            model: Django model class (Segment, Competition, etc.)
-            codes: List of codes to validate
-            cache_key_prefix: Prefix for cache key (e.g., 'valid_segments')
-            timeout: Cache timeout in seconds (default 1 hour)
-        """
-        cache_key = f"{cache_key_prefix}_all"
-        
-        # Try to get from cache
-        valid_codes = cache.get(cache_key)
-        
-        if valid_codes is None:
-            # Cache miss - fetch from database
-            valid_codes = set(model.objects.values_list('code', flat=True))
-            cache.set(cache_key, valid_codes, timeout)
-        
-        # Filter requested codes
-        valid_codes_set = set(codes) & valid_codes
-        invalid_codes = [code for code in codes if code not in valid_codes_set]
-        
-        return valid_codes_set, invalid_codes
-
-
-# Example usage of caching (modify your serializer methods):
-class CompleteRegistrationSerializerWithCache(CompleteRegistrationSerializer):
-    """
-    Version with aggressive caching - use if codes rarely change
-    Clear cache when you add/remove segments/competitions
-    """
-    
-    def validate_segment(self, value):
-        if not value:
-            return value
-        
-        _, invalid_codes = CachedValidationMixin.get_valid_codes_cached(
-            Segment, value, 'valid_segments', timeout=3600
-        )
-        
-        if invalid_codes:
-            raise serializers.ValidationError(
-                f"Invalid segment codes: {', '.join(invalid_codes)}"
-            )
-        
-        return value
-    
-    def validate_competition(self, value):
-        if not value:
-            return value
-        
-        _, invalid_codes = CachedValidationMixin.get_valid_codes_cached(
-            Competition, value, 'valid_competitions', timeout=3600
-        )
-        
-        if invalid_codes:
-            raise serializers.ValidationError(
-                f"Invalid competition codes: {', '.join(invalid_codes)}"
-            )
-        
-        return value
-    
-    def validate_team_competition(self, value):
-        if not value or 'competition' not in value:
-            return value
-        
-        _, invalid_codes = CachedValidationMixin.get_valid_codes_cached(
-            TeamCompetition, value['competition'], 'valid_team_competitions', timeout=3600
-        )
-        
-        if invalid_codes:
-            raise serializers.ValidationError(
-                f"Invalid team competition codes: {', '.join(invalid_codes)}"
-            )
-        
-        return value
-    
-
-
-
-
-
-
-
 class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
@@ -418,12 +348,25 @@ class TeamCompetitionRegistrationInfoSerializer(serializers.ModelSerializer):
         fields = ['competition_name', 'competition_code', 'datetime']
 
 
+def entry_annotations(owner_field):
+    """has_entry / entry_datetime for each row, computed in the list query"""
+    entries = EntryStatus.objects.filter(**{owner_field: OuterRef('pk')})
+    return {
+        'has_entry': Exists(entries),
+        'entry_datetime': Subquery(entries.order_by('datetime').values('datetime')[:1]),
+    }
+
+
+def gift_status_prefetch():
+    return Prefetch('gift_status', queryset=GiftStatus.objects.select_related('gift', 'volunteer'))
+
+
 class ParticipantListSerializer(serializers.ModelSerializer):
     """Serializer for participant list view - minimal info"""
     full_name = serializers.SerializerMethodField()
     segments = serializers.SerializerMethodField()
     competitions = serializers.SerializerMethodField()
-    has_entry = serializers.SerializerMethodField()
+    has_entry = serializers.BooleanField(read_only=True)
     payments = PaymentSerializer(many=True, read_only=True) 
     
     class Meta:
@@ -441,9 +384,14 @@ class ParticipantListSerializer(serializers.ModelSerializer):
     
     def get_competitions(self, obj):
         return [comp.competition.competition for comp in obj.competition_registrations.all()]
-    
-    def get_has_entry(self, obj):
-        return obj.entry_status.exists()
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.prefetch_related(
+            'registrations__segment',
+            'competition_registrations__competition',
+            'payments'
+        ).annotate(has_entry=entry_annotations('participant')['has_entry'])
 
 
 class ParticipantDetailSerializer(serializers.ModelSerializer):
@@ -452,7 +400,7 @@ class ParticipantDetailSerializer(serializers.ModelSerializer):
     competition_registrations = CompetitionRegistrationInfoSerializer(many=True, read_only=True)
     gifts_received = serializers.SerializerMethodField()
     payments = PaymentSerializer(many=True, read_only=True)
-    has_entry = serializers.SerializerMethodField()
+    has_entry = serializers.BooleanField(read_only=True)
     entry_datetime = serializers.SerializerMethodField()
     team_info = serializers.SerializerMethodField()
     
@@ -474,17 +422,14 @@ class ParticipantDetailSerializer(serializers.ModelSerializer):
             'received_at': gift.datetime,
             'volunteer': gift.volunteer.v_name if gift.volunteer else None
         } for gift in obj.gift_status.all()]
-    
-    def get_has_entry(self, obj):
-        return obj.entry_status.exists()
-    
+
     def get_entry_datetime(self, obj):
-        entry = obj.entry_status.first()
-        return entry.datetime if entry else None
+        # Annotated by setup_eager_loading
+        return obj.entry_datetime
     
     def get_team_info(self, obj):
         try:
-            team = Team.objects.filter(members__email=obj.email).first()
+            team = Team.objects.filter(members__participant=obj).first()
             if team:
                 return {
                     'id': team.id,
@@ -495,6 +440,15 @@ class ParticipantDetailSerializer(serializers.ModelSerializer):
             pass
         return None
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.prefetch_related(
+            'registrations__segment',
+            'competition_registrations__competition',
+            'payments',
+            gift_status_prefetch()
+        ).annotate(**entry_annotations('participant'))
+
 
 class TeamParticipantSerializer(serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
@@ -517,9 +471,9 @@ class TeamListSerializer(serializers.ModelSerializer):
     )
     gifts_received = serializers.SerializerMethodField()
     payments = PaymentSerializer(many=True, read_only=True)
-    has_entry = serializers.SerializerMethodField()
+    has_entry = serializers.BooleanField(read_only=True)
     entry_datetime = serializers.SerializerMethodField()
-    member_count = serializers.SerializerMethodField()
+    member_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Team
@@ -529,22 +483,28 @@ class TeamListSerializer(serializers.ModelSerializer):
             'payments', 'has_entry', 'entry_datetime'
         ]
     
-    def get_member_count(self, obj):
-        return obj.members.count()
-    
     def get_gifts_received(self, obj):
         return [{
             'gift_name': gift.gift.gift_name,
             'received_at': gift.datetime,
             'volunteer': gift.volunteer.v_name if gift.volunteer else None
         } for gift in obj.gift_status.all()]
-    
-    def get_has_entry(self, obj):
-        return obj.entry_status.exists()
-    
+
     def get_entry_datetime(self, obj):
-        entry = obj.entry_status.first()
-        return entry.datetime if entry else None
+        # Annotated by setup_eager_loading
+        return obj.entry_datetime
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.prefetch_related(
+            'members',
+            'team_competition_registrations__competition',
+            'payments',
+            gift_status_prefetch()
+        ).annotate(
+            member_count=Count('members', distinct=True),
+            **entry_annotations('team')
+        )
 
 
 class PaymentVerificationSerializer(serializers.Serializer):
@@ -682,7 +642,7 @@ class TanvinAwardListSerializer(serializers.ModelSerializer):
     team_name = serializers.CharField(source='team.team_name', read_only=True)
     team_id = serializers.IntegerField(source='team.id', read_only=True)
     project_type_display = serializers.CharField(source='get_project_type_display', read_only=True)
-    member_count = serializers.SerializerMethodField()
+    member_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = TanvinAward
@@ -690,6 +650,7 @@ class TanvinAwardListSerializer(serializers.ModelSerializer):
             'id', 'team_id', 'team_name', 'project_name', 
             'project_type', 'project_type_display', 'member_count'
         ]
-    
-    def get_member_count(self, obj):
-        return obj.team.members.count()
\ No newline at end of file
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('team').annotate(member_count=Count('team__members'))
\ No newline at end of file
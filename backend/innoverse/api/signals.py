@@ -0,0 +1,213 @@
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from event.models import Coupons, Segment, Competition, TeamCompetition, Gift
+from participant.models import (
+    Participant, Team, TeamParticipant, Payment,
+    Registration, CompetitionRegistration, TeamCompetitionRegistration
+)
+from .models import Role, Volunteer, EntryStatus, GiftStatus, EventSummary
+from .coupons import sync_coupon_counter, clear_coupon_counter
+from .versions import bump_version
+from .entitlements import invalidate_entitlements
+from .claims import bump_token_version
+from .stats import invalidate_stats
+from . import summaries
+
+
+@receiver(post_save, sender=Coupons)
+def coupon_saved(sender, instance, **kwargs):
+    # Admin edits (and coupon creation) reset the fast-path counter
+    sync_coupon_counter(instance)
+
+
+@receiver(post_delete, sender=Coupons)
+def coupon_deleted(sender, instance, **kwargs):
+    clear_coupon_counter(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Segment)
+@receiver([post_save, post_delete], sender=Competition)
+@receiver([post_save, post_delete], sender=TeamCompetition)
+@receiver([post_save, post_delete], sender=Gift)
+def catalog_changed(sender, instance, **kwargs):
+    # Every process reloads its catalog cache on the next read
+    transaction.on_commit(lambda: bump_version('catalog'))
+
+
+@receiver([post_save, post_delete], sender=Participant)
+def participant_changed(sender, instance, **kwargs):
+    invalidate_entitlements(participant_ids=[instance.id])
+
+
+@receiver([post_save, post_delete], sender=Team)
+def team_changed(sender, instance, **kwargs):
+    invalidate_entitlements(team_ids=[instance.id])
+
+
+@receiver([post_save, post_delete], sender=TeamParticipant)
+def team_member_changed(sender, instance, **kwargs):
+    invalidate_entitlements(participant_ids=[instance.participant_id], team_ids=[instance.team_id])
+
+
+@receiver([post_save, post_delete], sender=Registration)
+@receiver([post_save, post_delete], sender=CompetitionRegistration)
+def participant_registration_changed(sender, instance, **kwargs):
+    invalidate_entitlements(participant_ids=[instance.participant_id])
+
+
+@receiver([post_save, post_delete], sender=TeamCompetitionRegistration)
+def team_registration_changed(sender, instance, **kwargs):
+    invalidate_entitlements(team_ids=[instance.team_id])
+
+
+@receiver([post_save, post_delete], sender=EntryStatus)
+@receiver([post_save, post_delete], sender=GiftStatus)
+def scan_status_changed(sender, instance, **kwargs):
+    invalidate_entitlements(
+        participant_ids=[instance.participant_id],
+        team_ids=[instance.team_id]
+    )
+
+
+@receiver(post_save, sender=Volunteer)
+def volunteer_saved(sender, instance, created, **kwargs):
+    # Role or account changes must not be served from old token claims
+    if not created:
+        bump_token_version([instance.id])
+
+
+@receiver(post_delete, sender=Volunteer)
+def volunteer_deleted(sender, instance, **kwargs):
+    bump_token_version([instance.id])
+
+
+@receiver(post_save, sender=Role)
+def role_saved(sender, instance, created, **kwargs):
+    if not created:
+        bump_token_version(list(instance.role.values_list('id', flat=True)))
+
+
+@receiver([post_save, post_delete], sender=Participant)
+@receiver([post_save, post_delete], sender=TeamParticipant)
+@receiver([post_save, post_delete], sender=Payment)
+def search_source_changed(sender, instance, **kwargs):
+    # Only the in-process search index needs this; PostgreSQL searches its own indexes
+    if connection.vendor != 'postgresql':
+        transaction.on_commit(lambda: bump_version('search'))
+
+
+@receiver([post_save, post_delete], sender=Participant)
+@receiver([post_save, post_delete], sender=Registration)
+@receiver([post_save, post_delete], sender=CompetitionRegistration)
+def participant_listing_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_version('participants'))
+
+
+@receiver([post_save, post_delete], sender=Team)
+@receiver([post_save, post_delete], sender=TeamParticipant)
+@receiver([post_save, post_delete], sender=Volunteer)
+def listings_changed(sender, instance, **kwargs):
+    # Shown in both listings (participant team_info, volunteer names on gifts)
+    transaction.on_commit(lambda: bump_version('participants', 'teams'))
+
+
+@receiver([post_save, post_delete], sender=TeamCompetitionRegistration)
+def team_listing_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_version('teams'))
+
+
+@receiver([post_save, post_delete], sender=Payment)
+@receiver([post_save, post_delete], sender=EntryStatus)
+@receiver([post_save, post_delete], sender=GiftStatus)
+def owner_listing_changed(sender, instance, **kwargs):
+    resource = 'participants' if instance.participant_id else 'teams'
+    transaction.on_commit(lambda: bump_version(resource))
+
+
+@receiver([post_save, post_delete], sender=Registration)
+@receiver([post_save, post_delete], sender=CompetitionRegistration)
+@receiver([post_save, post_delete], sender=TeamCompetitionRegistration)
+def registration_stats_changed(sender, instance, **kwargs):
+    invalidate_stats('registrations')
+
+
+@receiver([post_save, post_delete], sender=Team)
+@receiver([post_save, post_delete], sender=Payment)
+def payment_stats_changed(sender, instance, **kwargs):
+    # payment_verified lives on Participant / Team
+    invalidate_stats('payments')
+
+
+@receiver([post_save, post_delete], sender=Participant)
+def participant_stats_changed(sender, instance, **kwargs):
+    invalidate_stats('payments', 'people')
+
+
+@receiver([post_save, post_delete], sender=TeamParticipant)
+def people_stats_changed(sender, instance, **kwargs):
+    invalidate_stats('people')
+
+
+@receiver([post_save, post_delete], sender=EntryStatus)
+@receiver([post_save, post_delete], sender=GiftStatus)
+def scan_stats_changed(sender, instance, **kwargs):
+    invalidate_stats('scans')
+
+
+# EventSummary counters - applied inside the writing transaction
+
+SUMMARY_KINDS = {
+    Registration: ('segment', 'segment_id', 'participant_id'),
+    CompetitionRegistration: ('competition', 'competition_id', 'participant_id'),
+    TeamCompetitionRegistration: ('team_competition', 'competition_id', 'team_id'),
+}
+
+
+@receiver(post_save, sender=Registration)
+@receiver(post_save, sender=CompetitionRegistration)
+@receiver(post_save, sender=TeamCompetitionRegistration)
+def summary_registration_saved(sender, instance, created, **kwargs):
+    if created:
+        kind, key, owner = SUMMARY_KINDS[sender]
+        summaries.registration_changed(kind, getattr(instance, key), getattr(instance, owner), 1)
+
+
+@receiver(post_delete, sender=Registration)
+@receiver(post_delete, sender=CompetitionRegistration)
+@receiver(post_delete, sender=TeamCompetitionRegistration)
+def summary_registration_deleted(sender, instance, **kwargs):
+    kind, key, owner = SUMMARY_KINDS[sender]
+    summaries.registration_changed(kind, getattr(instance, key), getattr(instance, owner), -1)
+
+
+@receiver(post_save, sender=EntryStatus)
+def summary_entry_saved(sender, instance, created, **kwargs):
+    if created:
+        owner = 'participant' if instance.participant_id else 'team'
+        summaries.entries_changed(owner, [instance.participant_id or instance.team_id], 1)
+
+
+@receiver(post_delete, sender=EntryStatus)
+def summary_entry_deleted(sender, instance, **kwargs):
+    owner = 'participant' if instance.participant_id else 'team'
+    summaries.entries_changed(owner, [instance.participant_id or instance.team_id], -1)
+
+
+# payment_verified flips are applied explicitly at the write sites (toggle and
+# bulk verification endpoints, admin) - no pre_save read on every save
+
+
+@receiver(post_save, sender=Segment)
+@receiver(post_save, sender=Competition)
+@receiver(post_save, sender=TeamCompetition)
+def summary_event_saved(sender, instance, created, **kwargs):
+    if created:
+        summaries.get_summaries(summaries.EVENT_KINDS[sender], [instance.id])
+
+
+@receiver(post_delete, sender=Segment)
+@receiver(post_delete, sender=Competition)
+@receiver(post_delete, sender=TeamCompetition)
+def summary_event_deleted(sender, instance, **kwargs):
+    EventSummary.objects.filter(kind=summaries.EVENT_KINDS[sender], object_id=instance.id).delete()
@@ -0,0 +1,222 @@
+"""
+Event statistics for the organizer dashboard.
+
+Each section is computed with one grouped query and cached against its
+own version counters, which signals bump when the underlying tables
+change. A scan therefore only recomputes the 'scans' section, and a
+refresh with nothing changed costs two cache reads. While one request
+recomputes a section, concurrent requests are served the previous
+figures instead of piling onto the database.
+"""
+
+import logging
+from collections import defaultdict, namedtuple
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from participant.models import (
+    Participant, TeamParticipant, Payment,
+    Registration, CompetitionRegistration, TeamCompetitionRegistration
+)
+from .models import EntryStatus, GiftStatus
+from .catalog import catalog
+from .versions import get_versions, bump_version
+
+logger = logging.getLogger(__name__)
+
+
+STATS_TTL = 60  # upper bound on staleness for changes that bypass signals
+LOCK_TTL = 10
+
+
+def _grouped_rows(*querysets):
+    # One round trip for several GROUP BY queries with the same columns
+    first, *rest = querysets
+    return list(first.union(*rest, all=True)) if rest else list(first)
+
+
+def _labelled(queryset, label, key):
+    return queryset.annotate(
+        kind=Value(label, output_field=CharField()),
+        key=F(key)
+    ).values('kind', 'key').annotate(count=Count('id')).values_list('kind', 'key', 'count')
+
+
+def compute_registrations():
+    counts = defaultdict(int)
+    for kind, key, count in _grouped_rows(
+        _labelled(Registration.objects.all(), 'segment', 'segment_id'),
+        _labelled(CompetitionRegistration.objects.all(), 'competition', 'competition_id'),
+        _labelled(TeamCompetitionRegistration.objects.all(), 'team_competition', 'competition_id'),
+    ):
+        counts[(kind, key)] = count
+
+    event_catalog = catalog.get()
+    return {
+        'segments': [
+            {'code': seg.code, 'name': seg.segment_name, 'count': counts[('segment', seg.id)]}
+            for seg in event_catalog.segments.values()
+        ],
+        'competitions': [
+            {'code': comp.code, 'name': comp.competition, 'count': counts[('competition', comp.id)]}
+            for comp in event_catalog.competitions.values()
+        ],
+        'team_competitions': [
+            {'code': comp.code, 'name': comp.competition, 'count': counts[('team_competition', comp.id)]}
+            for comp in event_catalog.team_competitions.values()
+        ],
+    }
+
+
+def compute_payments():
+    rows = (
+        Payment.objects
+        .annotate(
+            owner=Case(
+                When(participant__isnull=False, then=Value('participants')),
+                default=Value('teams'),
+                output_field=CharField()
+            ),
+            verified=Coalesce('participant__payment_verified', 'team__payment_verified')
+        )
+        .values('owner', 'verified', 'method')
+        .annotate(count=Count('id'), amount=Sum('amount'))
+    )
+
+    def bucket():
+        return {'count': 0, 'amount': 0}
+
+    result = {
+        owner: {'verified': bucket(), 'unverified': bucket()}
+        for owner in ('participants', 'teams')
+    }
+    by_method = defaultdict(bucket)
+
+    for row in rows:
+        status = 'verified' if row['verified'] else 'unverified'
+        for target in (result[row['owner']][status], by_method[row['method']]):
+            target['count'] += row['count']
+            target['amount'] += row['amount'] or 0
+
+    result['by_method'] = dict(by_method)
+    return result
+
+
+def compute_people():
+    def breakdown(model, label):
+        return (
+            model.objects
+            .annotate(kind=Value(label, output_field=CharField()))
+            .values('kind', 'gender', 't_shirt_size')
+            .annotate(count=Count('id'))
+            .values_list('kind', 'gender', 't_shirt_size', 'count')
+        )
+
+    result = {
+        kind: {'total': 0, 'gender': defaultdict(int), 't_shirt_size': defaultdict(int)}
+        for kind in ('participants', 'team_members')
+    }
+    for kind, gender, size, count in _grouped_rows(
+        breakdown(Participant, 'participants'),
+        breakdown(TeamParticipant, 'team_members'),
+    ):
+        result[kind]['total'] += count
+        result[kind]['gender'][gender or 'unknown'] += count
+        result[kind]['t_shirt_size'][size or 'unknown'] += count
+
+    for section in result.values():
+        section['gender'] = dict(section['gender'])
+        section['t_shirt_size'] = dict(section['t_shirt_size'])
+    return result
+
+
+def compute_scans():
+    def split(queryset, label, key):
+        return (
+            queryset
+            .annotate(kind=Value(label, output_field=CharField()), key=key)
+            .values('kind', 'key')
+            .annotate(
+                participants=Count('id', filter=Q(participant__isnull=False)),
+                teams=Count('id', filter=Q(team__isnull=False))
+            )
+            .values_list('kind', 'key', 'participants', 'teams')
+        )
+
+    entries = {'participants': 0, 'teams': 0}
+    gifts = {}
+    for kind, key, participants, teams in _grouped_rows(
+        split(EntryStatus.objects.all(), 'entry', Value(0)),
+        split(GiftStatus.objects.all(), 'gift', F('gift_id')),
+    ):
+        if kind == 'entry':
+            entries = {'participants': participants, 'teams': teams}
+        else:
+            gifts[key] = {'participants': participants, 'teams': teams}
+
+    gifts_by_id = catalog.get().gifts_by_id
+    return {
+        'entries': entries,
+        'gifts': [
+            {'gift': gift.gift_name, **gifts.get(gift_id, {'participants': 0, 'teams': 0})}
+            for gift_id, gift in gifts_by_id.items()
+        ],
+    }
+
+
+Section = namedtuple('Section', ['compute', 'versions'])
+
+SECTIONS = {
+    'registrations': Section(compute_registrations, ('stats_registrations', 'catalog')),
+    'payments': Section(compute_payments, ('stats_payments',)),
+    'people': Section(compute_people, ('stats_people',)),
+    'scans': Section(compute_scans, ('stats_scans', 'catalog')),
+}
+
+STATS_VERSIONS = tuple(sorted({name for section in SECTIONS.values() for name in section.versions}))
+
+
+def invalidate_stats(*sections):
+    """Recompute these sections on the next read after the transaction commits"""
+    transaction.on_commit(lambda: bump_version(*[f"stats_{name}" for name in sections]))
+
+
+def _cache_key(name):
+    return f"stats_section_{name}"
+
+
+def get_stats():
+    try:
+        versions = dict(zip(STATS_VERSIONS, get_versions(*STATS_VERSIONS)))
+        cached = cache.get_many([_cache_key(name) for name in SECTIONS])
+    except Exception as e:
+        logger.warning(f"Stats cache unavailable: {str(e)}")
+        return {name: section.compute() for name, section in SECTIONS.items()}
+
+    stats = {}
+    for name, section in SECTIONS.items():
+        version = [versions[v] for v in section.versions]
+        entry = cached.get(_cache_key(name))
+
+        if entry is not None and entry['version'] == version:
+            stats[name] = entry['data']
+            continue
+
+        lock_key = f"{_cache_key(name)}_lock"
+        if entry is not None and not cache.add(lock_key, 1, timeout=LOCK_TTL):
+            # Someone else is recomputing; the previous figures will do
+            stats[name] = entry['data']
+            continue
+
+        try:
+            data = section.compute()
+            data['generated_at'] = timezone.now().isoformat()
+            cache.set(_cache_key(name), {'version': version, 'data': data}, timeout=STATS_TTL)
+        finally:
+            if entry is not None:
+                cache.delete(lock_key)
+        stats[name] = data
+
+    return stats
@@ -0,0 +1,193 @@
+"""
+Incrementally maintained EventSummary counters.
+
+Every write that changes a count (a registration, an entry, a payment
+verification) applies an F() delta to the affected summary rows inside
+its own transaction, so the counters commit or roll back with it. A
+missing row is computed from scratch on first use; rebuild_summaries()
+recomputes everything to repair drift.
+"""
+
+import logging
+from collections import Counter, defaultdict, namedtuple
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+from event.models import Segment, Competition, TeamCompetition
+from participant.models import Participant, Team, Registration, CompetitionRegistration, TeamCompetitionRegistration
+from .models import EntryStatus, EventSummary
+
+logger = logging.getLogger(__name__)
+
+
+SummarySource = namedtuple('SummarySource', [
+    'model',      # registration model
+    'key',        # column holding the segment / competition id
+    'owner',      # 'participant' or 'team'
+])
+
+SOURCES = {
+    'segment': SummarySource(Registration, 'segment_id', 'participant'),
+    'competition': SummarySource(CompetitionRegistration, 'competition_id', 'participant'),
+    'team_competition': SummarySource(TeamCompetitionRegistration, 'competition_id', 'team'),
+}
+
+KINDS_BY_OWNER = {
+    'participant': ('segment', 'competition'),
+    'team': ('team_competition',),
+}
+
+OWNER_MODELS = {'participant': Participant, 'team': Team}
+
+EVENT_KINDS = {Segment: 'segment', Competition: 'competition', TeamCompetition: 'team_competition'}
+
+
+def compute_summaries(kind, object_ids=None):
+    """Exact {object_id: (registrations, verified, entries)} from the registration tables"""
+    source = SOURCES[kind]
+    entered = EntryStatus.objects.filter(**{source.owner: OuterRef(f'{source.owner}_id')})
+
+    queryset = source.model.objects.order_by()
+    if object_ids is not None:
+        queryset = queryset.filter(**{f'{source.key}__in': object_ids})
+
+    rows = (
+        queryset.values(source.key)
+        .annotate(
+            registrations=Count('id'),
+            verified=Count('id', filter=Q(**{f'{source.owner}__payment_verified': True})),
+            entries=Count('id', filter=Exists(entered)),
+        )
+        .values_list(source.key, 'registrations', 'verified', 'entries')
+    )
+    return {object_id: tuple(counts) for object_id, *counts in rows}
+
+
+def _create_missing(kind, object_ids):
+    # Computed after the current write, so the exact count already includes it
+    counts = compute_summaries(kind, object_ids)
+    EventSummary.objects.bulk_create([
+        EventSummary(
+            kind=kind, object_id=object_id,
+            **dict(zip(('registrations', 'verified', 'entries'), counts.get(object_id, (0, 0, 0))))
+        )
+        for object_id in object_ids
+    ], ignore_conflicts=True)
+
+
+def _apply(kind, deltas):
+    """deltas: {object_id: (registrations, verified, entries)}; one UPDATE per distinct delta"""
+    by_delta = defaultdict(list)
+    for object_id, delta in deltas.items():
+        if any(delta):
+            by_delta[delta].append(object_id)
+
+    for (registrations, verified, entries), object_ids in by_delta.items():
+        updated = EventSummary.objects.filter(kind=kind, object_id__in=object_ids).update(
+            registrations=F('registrations') + registrations,
+            verified=F('verified') + verified,
+            entries=F('entries') + entries,
+        )
+        if updated < len(object_ids):
+            existing = set(
+                EventSummary.objects.filter(kind=kind, object_id__in=object_ids)
+                .values_list('object_id', flat=True)
+            )
+            _create_missing(kind, [oid for oid in object_ids if oid not in existing])
+
+
+def _owner_state(owner, owner_id):
+    # (payment_verified, has_entry) for a participant or team
+    entered = EntryStatus.objects.filter(**{owner: OuterRef('pk')})
+    state = (
+        OWNER_MODELS[owner].objects.filter(pk=owner_id)
+        .annotate(has_entry=Exists(entered))
+        .values_list('payment_verified', 'has_entry')
+        .first()
+    )
+    return state or (False, False)
+
+
+def registration_changed(kind, object_id, owner_id, sign):
+    """A registration row was created (sign=1) or deleted (sign=-1)"""
+    verified, has_entry = _owner_state(SOURCES[kind].owner, owner_id)
+    _apply(kind, {object_id: (sign, sign * verified, sign * has_entry)})
+
+
+def registrations_added(kind, object_ids):
+    """Bulk-created registrations of a new (unverified, not entered) owner"""
+    _apply(kind, {object_id: (count, 0, 0) for object_id, count in Counter(object_ids).items()})
+
+
+def _owner_registrations(owner, owner_ids):
+    # {kind: Counter(object_id -> registrations held by these owners)}
+    result = {}
+    for kind in KINDS_BY_OWNER[owner]:
+        source = SOURCES[kind]
+        result[kind] = Counter(
+            source.model.objects.filter(**{f'{owner}_id__in': owner_ids})
+            .values_list(source.key, flat=True)
+        )
+    return result
+
+
+def entries_changed(owner, owner_ids, sign):
+    """Entries recorded (sign=1) or removed (sign=-1) for these participants / teams"""
+    owner_ids = [oid for oid in owner_ids if oid]
+    if not owner_ids:
+        return
+    for kind, counts in _owner_registrations(owner, owner_ids).items():
+        _apply(kind, {object_id: (0, 0, sign * n) for object_id, n in counts.items()})
+
+
+def verification_changed(owner, owner_ids, verified):
+    """payment_verified flipped for these participants / teams"""
+    sign = 1 if verified else -1
+    for kind, counts in _owner_registrations(owner, owner_ids).items():
+        _apply(kind, {object_id: (0, sign * n, 0) for object_id, n in counts.items()})
+
+
+def get_summaries(kind, object_ids):
+    """{object_id: EventSummary}, creating any missing rows"""
+    summaries = {s.object_id: s for s in EventSummary.objects.filter(kind=kind, object_id__in=object_ids)}
+    missing = [oid for oid in object_ids if oid not in summaries]
+    if missing:
+        _create_missing(kind, missing)
+        summaries.update(
+            (s.object_id, s) for s in EventSummary.objects.filter(kind=kind, object_id__in=missing)
+        )
+    return summaries
+
+
+def summary_counts(kind, object_id):
+    """Counters of one segment / competition as a response dict"""
+    summary = get_summaries(kind, [object_id])[object_id]
+    return {
+        'registrations': summary.registrations,
+        'verified': summary.verified,
+        'entries': summary.entries,
+    }
+
+
+def rebuild_summaries(kind, object_ids):
+    """Overwrite the counters with exact values; returns the number of rows that had drifted"""
+    get_summaries(kind, object_ids)
+
+    with transaction.atomic():
+        # Locked before counting: concurrent deltas wait and apply on top of the exact values
+        summaries = {
+            s.object_id: s for s in
+            EventSummary.objects.select_for_update().filter(kind=kind, object_id__in=object_ids)
+        }
+        counts = compute_summaries(kind, object_ids)
+        drifted = []
+
+        for object_id, summary in summaries.items():
+            exact = counts.get(object_id, (0, 0, 0))
+            current = (summary.registrations, summary.verified, summary.entries)
+            if current != exact:
+                logger.warning(f"EventSummary {kind} #{object_id} drifted: {current} -> {exact}")
+                summary.registrations, summary.verified, summary.entries = exact
+                drifted.append(summary)
+
+        EventSummary.objects.bulk_update(drifted, ['registrations', 'verified', 'entries'])
+    return len(drifted)
@@ -2,116 +2,372 @@ from celery import shared_task
 from celery.exceptions import MaxRetriesExceededError, SoftTimeLimitExceeded
 import logging
 from django.core.cache import cache
+from collections import namedtuple
+from . import assets, mail, tickets
 
 logger = logging.getLogger(__name__)
 
 
-def generate_qr_with_ticket_template(qr_id, settings):
+def generate_qr_with_ticket_template(qr_id, settings=None):
     """
-    Generate QR code and overlay it on ticket template
+    QR code and ticket for an email - cached or stored under their content
+    address (see api.tickets), rendered only when absent
     Returns: (qr_buffer, ticket_buffer)
     """
     try:
-        import qrcode
         from io import BytesIO
-        from PIL import Image
-        import os
         
-        logger.info(f"Generating QR code for: {qr_id}")
-        
-        # Generate QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(qr_id)
-        qr.make(fit=True)
-        
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Save plain QR to buffer (for inline display)
-        qr_buffer = BytesIO()
-        qr_img.save(qr_buffer, format='PNG')
-        qr_buffer.seek(0)
-        
-        # Load ticket template
-        template_path = os.path.join(settings.MEDIA_ROOT, 'qr_codes', 'qr_ticket_template.jpg')
-        
-        if os.path.exists(template_path):
-            # Open template
-            template = Image.open(template_path).convert('RGB')
-            
-            # Resize QR code to fit nicely (e.g., 250x250 px)
-            qr_img_pil = qr_img.resize((300, 300), Image.Resampling.LANCZOS)
-            
-            # Calculate position (centered horizontally and vertically)
-            template_width, template_height = template.size
-            qr_width, qr_height = qr_img_pil.size
-
-            x_position = (template_width - qr_width) // 2  # Center horizontally
-            y_position = (template_height - qr_height) // 2  # Center vertically
-            
-            # Paste QR code onto template
-            template.paste(qr_img_pil, (x_position, y_position))
-            
-            # Save ticket with QR to buffer
-            ticket_buffer = BytesIO()
-            template.save(ticket_buffer, format='JPEG', quality=95)
-            ticket_buffer.seek(0)
-            
-            # Also save to disk
-            qr_dir = settings.QR_CODE_ROOT
-            os.makedirs(qr_dir, exist_ok=True)
-            
-            # Save plain QR
-            qr_filepath = os.path.join(qr_dir, f"{qr_id}_qr.png")
-            with open(qr_filepath, 'wb') as f:
-                qr_buffer_copy = BytesIO()
-                qr_img.save(qr_buffer_copy, format='PNG')
-                qr_buffer_copy.seek(0)
-                f.write(qr_buffer_copy.read())
-            
-            # Save ticket with QR
-            ticket_filepath = os.path.join(qr_dir, f"{qr_id}_ticket.jpg")
-            template.save(ticket_filepath, format='JPEG', quality=95)
-            
-            logger.info(f"QR and ticket saved: {qr_filepath}, {ticket_filepath}")
-            
-            # Reset buffers
-            qr_buffer.seek(0)
-            ticket_buffer.seek(0)
-            
-            return qr_buffer, ticket_buffer
-        else:
-            logger.warning(f"Ticket template not found at {template_path}, using plain QR")
-            qr_buffer.seek(0)
-            return qr_buffer, None
+        qr_png, ticket_jpg = tickets.get_ticket(qr_id)
+        return BytesIO(qr_png), (BytesIO(ticket_jpg) if ticket_jpg is not None else None)
             
     except Exception as e:
         logger.error(f"QR/Ticket generation failed: {str(e)}", exc_info=True)
         return None, None
 
 
-def attach_logo_inline(email, settings):
-    """Attach logo inline"""
-    import os
+def attach_logo_inline(email, settings=None):
+    """Attach logo inline (MIME part built once per worker process)"""
+    logo_image = assets.logo_part()
+    
+    if logo_image is not None:
+        email.attach(logo_image)
+        logger.info("Logo attached")
+    else:
+        logger.warning(f"Logo not found at {assets.logo_path()}")
+    
+    return email
+
+
+PreparedEmail = namedtuple('PreparedEmail', [
+    'message',    # EmailMultiAlternatives, or None when there is nothing to send
+    'cache_key',  # idempotency key to set once it is sent
+    'result',     # task result
+])
+
+
+def _build_participant_verification_email(participant_data, is_team_leader=False):
+    """Solo payment verification email; raises so the caller can retry"""
+    if not participant_data or not participant_data.get('email'):
+        logger.error("Invalid participant data - missing email")
+        return PreparedEmail(None, None, {'success': False, 'error': 'Invalid participant data'})
+    
+    participant_id = participant_data['id']
+    
+    # Idempotency check
+    try:
+        cache_key = f"payment_email_sent_{participant_id}"
+        if cache.get(cache_key):
+            logger.info(f"Email already sent for participant {participant_id}, skipping")
+            return PreparedEmail(None, None, {'success': True, 'message': 'Already sent', 'duplicate': True})
+    except Exception as cache_error:
+        logger.warning(f"Cache check failed: {cache_error}")
+    
+    from django.core.mail import EmailMultiAlternatives
+    from django.template.loader import render_to_string
+    from django.conf import settings
     from email.mime.image import MIMEImage
     
-    logo_path = os.path.join(settings.MEDIA_ROOT, 'logo.png')
+    # Generate QR and ticket
+    qr_id = f"p_{participant_id}"
+    qr_buffer, ticket_buffer = generate_qr_with_ticket_template(qr_id, settings)
+    
+    if not qr_buffer:
+        raise ValueError("QR code generation failed")
+    
+    # Prepare context
+    context = {
+        'participant_name': participant_data.get('name', 'Participant'),
+        'participant_id': participant_id,
+        'participant_email': participant_data['email'],
+        'qr_id': qr_id,
+        'segments': participant_data.get('segments', []),
+        'competitions': participant_data.get('competitions', []),
+        'is_team_leader': is_team_leader,
+    }
+    
+    # Render email
+    html_content = render_to_string('email_template.html', context)
+    
+    subject = "Payment Verified - Solo Competitions - Innoverse"
+    if is_team_leader:
+        subject = "Payment Verified - Your Solo Competitions - Innoverse"
+    
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body="Your payment has been verified.",
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[participant_data['email']]
+    )
+    
+    email.attach_alternative(html_content, "text/html")
+    
+    # Attach logo
+    try:
+        email = attach_logo_inline(email, settings)
+    except Exception:
+        pass
+    
+    # Attach inline QR (for email display)
+    qr_buffer.seek(0)
+    qr_data = qr_buffer.read()
+    
+    qr_image = MIMEImage(qr_data)
+    qr_image.add_header('Content-ID', '<qr_code>')
+    qr_image.add_header('Content-Disposition', 'inline', filename=f'{qr_id}_qr.png')
+    email.attach(qr_image)
     
-    if os.path.exists(logo_path):
-        with open(logo_path, 'rb') as f:
-            logo_image = MIMEImage(f.read())
-            logo_image.add_header('Content-ID', '<logo>')
-            logo_image.add_header('Content-Disposition', 'inline', filename='logo.png')
-            email.attach(logo_image)
-            logger.info("Logo attached")
+    # Attach downloadable QR ticket (if template exists)
+    if ticket_buffer:
+        ticket_buffer.seek(0)
+        ticket_data = ticket_buffer.read()
+        email.attach(f'{qr_id}_ticket.jpg', ticket_data, 'image/jpeg')
+        logger.info(f"Ticket attached ({len(ticket_data)} bytes)")
     else:
-        logger.warning(f"Logo not found at {logo_path}")
+        # Fallback: attach plain QR as download
+        email.attach(f'{qr_id}_qr.png', qr_data, 'image/png')
     
-    return email
+    return PreparedEmail(email, cache_key, {
+        'success': True,
+        'recipient': participant_data['email'],
+        'qr_id': qr_id,
+        'participant_id': participant_id
+    })
+
+
+def _build_team_verification_email(team_data, team_members_data):
+    """Team payment verification email (members in CC); raises so the caller can retry"""
+    if not team_data or not team_members_data:
+        logger.error("Invalid team data")
+        return PreparedEmail(None, None, {'success': False, 'error': 'Invalid team data'})
+    
+    team_id = team_data['id']
+    
+    # Idempotency check
+    try:
+        cache_key = f"team_payment_email_sent_{team_id}"
+        if cache.get(cache_key):
+            logger.info(f"Team email already sent for {team_id}, skipping")
+            return PreparedEmail(None, None, {'success': True, 'message': 'Already sent', 'duplicate': True})
+    except Exception as cache_error:
+        logger.warning(f"Cache check failed: {cache_error}")
+    
+    from django.core.mail import EmailMultiAlternatives
+    from django.template.loader import render_to_string
+    from django.conf import settings
+    from email.mime.image import MIMEImage
+    
+    # Generate team QR and ticket
+    qr_id = f"t_{team_id}"
+    qr_buffer, ticket_buffer = generate_qr_with_ticket_template(qr_id, settings)
+    
+    if not qr_buffer:
+        raise ValueError("Team QR generation failed")
+    
+    # Prepare recipient lists
+    leader_email = None
+    cc_emails = []
+    
+    for member in team_members_data:
+        email = member.get('email')
+        if not email:
+            continue
+    
+        if member.get('is_leader'):
+            leader_email = email
+        else:
+            cc_emails.append(email)
+    
+    if not leader_email:
+        logger.error("No team leader email found")
+        return PreparedEmail(None, None, {'success': False, 'error': 'No team leader email'})
+    
+    # Prepare context
+    context = {
+        'team_name': team_data.get('name'),
+        'team_id': team_id,
+        'qr_id': qr_id,
+        'team_competitions': team_data.get('competitions', []),
+        'team_members': [
+            {'name': m.get('name'), 'is_leader': m.get('is_leader')}
+            for m in team_members_data
+        ],
+    }
+    
+    # Render email
+    html_content = render_to_string('email_template.html', context)
+    
+    subject = f"Payment Verified - Team {team_data.get('name')} - Innoverse"
+    
+    # Create email with CC
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body="Your team's payment has been verified.",
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[leader_email],
+        cc=cc_emails  # All other members as CC
+    )
+    
+    email.attach_alternative(html_content, "text/html")
+    
+    # Attach logo
+    try:
+        email = attach_logo_inline(email, settings)
+    except Exception:
+        pass
+    
+    # Attach inline QR
+    qr_buffer.seek(0)
+    qr_data = qr_buffer.read()
+    
+    qr_image = MIMEImage(qr_data)
+    qr_image.add_header('Content-ID', '<qr_code>')
+    qr_image.add_header('Content-Disposition', 'inline', filename=f'{qr_id}_qr.png')
+    email.attach(qr_image)
+    
+    # Attach ticket
+    if ticket_buffer:
+        ticket_buffer.seek(0)
+        ticket_data = ticket_buffer.read()
+        email.attach(f'{qr_id}_ticket.jpg', ticket_data, 'image/jpeg')
+        logger.info(f"Team ticket attached ({len(ticket_data)} bytes)")
+    else:
+        email.attach(f'{qr_id}_qr.png', qr_data, 'image/png')
+    
+    # ONE email to all via CC
+    return PreparedEmail(email, cache_key, {
+        'success': True,
+        'team_id': team_id,
+        'recipients_count': len(cc_emails) + 1,
+        'leader': leader_email,
+        'cc_count': len(cc_emails)
+    })
+
+
+def _build_registration_email(participant_data, payment_data, team_data=None,
+                              team_members_data=None, team_competitions=None):
+    """Registration confirmation email (team members in CC)"""
+    if not participant_data or not participant_data.get('email'):
+        logger.error("Invalid participant data")
+        return PreparedEmail(None, None, {'success': False, 'error': 'Invalid participant data'})
+    
+    # Idempotency check
+    try:
+        cache_key = f"reg_email_{participant_data['id']}_{payment_data.get('trx_id')}"
+        if cache.get(cache_key):
+            logger.info("Registration email already sent")
+            return PreparedEmail(None, None, {'success': True, 'message': 'Already sent', 'duplicate': True})
+    except Exception as cache_error:
+        logger.warning(f"Cache check failed: {cache_error}")
+    
+    from django.template.loader import render_to_string
+    from django.core.mail import EmailMultiAlternatives
+    from django.conf import settings
+    
+    context = {
+        'participant_name': participant_data.get('name', 'Participant'),
+        'participant_id': participant_data['id'],
+        'participant_email': participant_data['email'],
+        'participant_phone': participant_data.get('phone', ''),
+        'participant_institution': participant_data.get('institution', ''),
+        'participant_guardian_phone': participant_data.get('guardian_phone', ''),
+        'trx_id': payment_data.get('trx_id', ''),
+        'amount': payment_data.get('amount', ''),
+        'method': payment_data.get('method', ''),
+        'payment_phone': payment_data.get('phone', ''),
+        'segments': participant_data.get('segments', []),
+        'competitions': participant_data.get('competitions', []),
+    }
+    
+    # Prepare CC list for team
+    cc_emails = []
+    
+    if team_data:
+        context.update({
+            'team_name': team_data.get('name', ''),
+            'team_id': team_data.get('id', ''),
+            'team_members': team_members_data or [],
+            'team_competitions': team_competitions or []
+        })
+    
+        # Add team members as CC
+        if team_members_data:
+            for member in team_members_data:
+                member_email = member.get('email')
+                if member_email and member_email != participant_data['email']:
+                    cc_emails.append(member_email)
+    
+    html_content = render_to_string('registration_email_template.html', context)
+    
+    subject = "Registration Successful - Innoverse"
+    if team_data:
+        subject = f"Registration Successful - Team {team_data.get('name')} - Innoverse"
+    
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body="Thank you for registering for Innoverse!",
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[participant_data['email']],
+        cc=cc_emails if cc_emails else None
+    )
+    
+    email.attach_alternative(html_content, "text/html")
+    email = attach_logo_inline(email)
+    
+    return PreparedEmail(email, cache_key, {
+        'success': True,
+        'recipient': participant_data['email'],
+        'cc_count': len(cc_emails),
+        'participant_id': participant_data['id']
+    })
+
+
+def _mark_sent(prepared):
+    try:
+        cache.set(prepared.cache_key, True, timeout=604800)
+    except Exception:
+        pass
+    
+    message = prepared.message
+    logger.info(f"✓ [SUCCESS] Email sent to {message.to[0]} (CC: {len(message.cc)})")
+
+
+def _send_prepared(prepared):
+    if prepared.message is not None:
+        mail.send_message(prepared.message)
+        _mark_sent(prepared)
+    return prepared.result
+
+
+def send_prepared_emails(prepared):
+    """
+    Send several PreparedEmails over one SMTP session.
+    Returns None per email sent (or with nothing to send), else the exception.
+    
+    Each idempotency key is set as soon as its message is sent, so a crash
+    mid-batch does not resend what already went out on redelivery. Emails
+    sharing a cache_key are sent once and share its outcome.
+    """
+    first = {}  # cache_key -> index of the email that is actually sent
+    pending = []
+    for index, email in enumerate(prepared):
+        if email.message is None:
+            continue
+        if email.cache_key in first:
+            logger.info(f"Duplicate email in batch for {email.cache_key}, sending once")
+            continue
+        first[email.cache_key] = index
+        pending.append(index)
+    
+    errors = mail.send_messages(
+        [prepared[index].message for index in pending],
+        on_sent=lambda n: _mark_sent(prepared[pending[n]])
+    )
+    errors = dict(zip(pending, errors))
+    
+    return [
+        errors[first[email.cache_key]] if email.message is not None else None
+        for email in prepared
+    ]
 
 
 @shared_task(
@@ -128,103 +384,7 @@ def send_payment_verification_email_task(self, participant_data, is_team_leader=
     """
     try:
         logger.info(f"[TASK START] Payment verification email for participant {participant_data.get('id')}")
-        
-        if not participant_data or not participant_data.get('email'):
-            logger.error("Invalid participant data - missing email")
-            return {'success': False, 'error': 'Invalid participant data'}
-        
-        participant_id = participant_data['id']
-        
-        # Idempotency check
-        try:
-            cache_key = f"payment_email_sent_{participant_id}"
-            if cache.get(cache_key):
-                logger.info(f"Email already sent for participant {participant_id}, skipping")
-                return {'success': True, 'message': 'Already sent', 'duplicate': True}
-        except Exception as cache_error:
-            logger.warning(f"Cache check failed: {cache_error}")
-        
-        from django.core.mail import EmailMultiAlternatives
-        from django.template.loader import render_to_string
-        from django.conf import settings
-        from email.mime.image import MIMEImage
-        
-        # Generate QR and ticket
-        qr_id = f"p_{participant_id}"
-        qr_buffer, ticket_buffer = generate_qr_with_ticket_template(qr_id, settings)
-        
-        if not qr_buffer:
-            raise ValueError("QR code generation failed")
-        
-        # Prepare context
-        context = {
-            'participant_name': participant_data.get('name', 'Participant'),
-            'participant_id': participant_id,
-            'participant_email': participant_data['email'],
-            'qr_id': qr_id,
-            'segments': participant_data.get('segments', []),
-            'competitions': participant_data.get('competitions', []),
-            'is_team_leader': is_team_leader,
-        }
-        
-        # Render email
-        html_content = render_to_string('email_template.html', context)
-        
-        subject = "Payment Verified - Solo Competitions - Innoverse"
-        if is_team_leader:
-            subject = "Payment Verified - Your Solo Competitions - Innoverse"
-        
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body="Your payment has been verified.",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[participant_data['email']]
-        )
-        
-        email.attach_alternative(html_content, "text/html")
-        
-        # Attach logo
-        try:
-            email = attach_logo_inline(email, settings)
-        except Exception:
-            pass
-        
-        # Attach inline QR (for email display)
-        qr_buffer.seek(0)
-        qr_data = qr_buffer.read()
-        
-        qr_image = MIMEImage(qr_data)
-        qr_image.add_header('Content-ID', '<qr_code>')
-        qr_image.add_header('Content-Disposition', 'inline', filename=f'{qr_id}_qr.png')
-        email.attach(qr_image)
-        
-        # Attach downloadable QR ticket (if template exists)
-        if ticket_buffer:
-            ticket_buffer.seek(0)
-            ticket_data = ticket_buffer.read()
-            email.attach(f'{qr_id}_ticket.jpg', ticket_data, 'image/jpeg')
-            logger.info(f"Ticket attached ({len(ticket_data)} bytes)")
-        else:
-            # Fallback: attach plain QR as download
-            email.attach(f'{qr_id}_qr.png', qr_data, 'image/png')
-        
-        # Send
-        email.send(fail_silently=False)
-        
-        # Cache
-        try:
-            cache.set(cache_key, True, timeout=604800)
-        except Exception:
-            pass
-        
-        logger.info(f"✓ [SUCCESS] Participant email sent to {participant_data['email']}")
-        
-        return {
-            'success': True,
-            'recipient': participant_data['email'],
-            'qr_id': qr_id,
-            'participant_id': participant_id
-        }
+        return _send_prepared(_build_participant_verification_email(participant_data, is_team_leader))
         
     except SoftTimeLimitExceeded:
         logger.error(f"Task timeout for participant {participant_data.get('id')}")
@@ -255,123 +415,7 @@ def send_team_payment_verification_emails_task(self, team_data, team_members_dat
     """
     try:
         logger.info(f"[TASK START] Team verification email for team {team_data.get('id')}")
-        
-        if not team_data or not team_members_data:
-            logger.error("Invalid team data")
-            return {'success': False, 'error': 'Invalid team data'}
-        
-        team_id = team_data['id']
-        
-        # Idempotency check
-        try:
-            cache_key = f"team_payment_email_sent_{team_id}"
-            if cache.get(cache_key):
-                logger.info(f"Team email already sent for {team_id}, skipping")
-                return {'success': True, 'message': 'Already sent', 'duplicate': True}
-        except Exception as cache_error:
-            logger.warning(f"Cache check failed: {cache_error}")
-        
-        from django.core.mail import EmailMultiAlternatives
-        from django.template.loader import render_to_string
-        from django.conf import settings
-        from email.mime.image import MIMEImage
-        
-        # Generate team QR and ticket
-        qr_id = f"t_{team_id}"
-        qr_buffer, ticket_buffer = generate_qr_with_ticket_template(qr_id, settings)
-        
-        if not qr_buffer:
-            raise ValueError("Team QR generation failed")
-        
-        # Prepare recipient lists
-        leader_email = None
-        cc_emails = []
-        
-        for member in team_members_data:
-            email = member.get('email')
-            if not email:
-                continue
-            
-            if member.get('is_leader'):
-                leader_email = email
-            else:
-                cc_emails.append(email)
-        
-        if not leader_email:
-            logger.error("No team leader email found")
-            return {'success': False, 'error': 'No team leader email'}
-        
-        # Prepare context
-        context = {
-            'team_name': team_data.get('name'),
-            'team_id': team_id,
-            'qr_id': qr_id,
-            'team_competitions': team_data.get('competitions', []),
-            'team_members': [
-                {'name': m.get('name'), 'is_leader': m.get('is_leader')}
-                for m in team_members_data
-            ],
-        }
-        
-        # Render email
-        html_content = render_to_string('email_template.html', context)
-        
-        subject = f"Payment Verified - Team {team_data.get('name')} - Innoverse"
-        
-        # Create email with CC
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body="Your team's payment has been verified.",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[leader_email],
-            cc=cc_emails  # All other members as CC
-        )
-        
-        email.attach_alternative(html_content, "text/html")
-        
-        # Attach logo
-        try:
-            email = attach_logo_inline(email, settings)
-        except Exception:
-            pass
-        
-        # Attach inline QR
-        qr_buffer.seek(0)
-        qr_data = qr_buffer.read()
-        
-        qr_image = MIMEImage(qr_data)
-        qr_image.add_header('Content-ID', '<qr_code>')
-        qr_image.add_header('Content-Disposition', 'inline', filename=f'{qr_id}_qr.png')
-        email.attach(qr_image)
-        
-        # Attach ticket
-        if ticket_buffer:
-            ticket_buffer.seek(0)
-            ticket_data = ticket_buffer.read()
-            email.attach(f'{qr_id}_ticket.jpg', ticket_data, 'image/jpeg')
-            logger.info(f"Team ticket attached ({len(ticket_data)} bytes)")
-        else:
-            email.attach(f'{qr_id}_qr.png', qr_data, 'image/png')
-        
-        # Send (ONE email to all via CC)
-        email.send(fail_silently=False)
-        
-        # Cache
-        try:
-            cache.set(cache_key, True, timeout=604800)
-        except Exception:
-            pass
-        
-        recipients_count = len(cc_emails) + 1
-        logger.info(f"✓ [SUCCESS] Team email sent to {recipients_count} members (1 TO + {len(cc_emails)} CC)")
-        
-        return {
-            'success': True,
-            'team_id': team_id,
-            'recipients_count': recipients_count,
-            'leader': leader_email,
-            'cc_count': len(cc_emails)
-        }
+        return _send_prepared(_build_team_verification_email(team_data, team_members_data))
         
     except Exception as e:
         logger.error(f"[ERROR] Team email failed: {str(e)}", exc_info=True)
@@ -384,108 +428,76 @@ def send_team_payment_verification_emails_task(self, team_data, team_members_dat
             return {'success': False, 'error': str(e), 'max_retries_exceeded': True}
 
 
+@shared_task(
+    bind=True,
+    time_limit=1800,
+    soft_time_limit=1740
+)
+def send_payment_verification_batch_task(self, participants, teams):
+    """
+    Payment verification emails for a bulk verification, in one task.
+
+    participants: [[participant_data, is_team_leader], ...]
+    teams: [[team_data, team_members_data], ...]
+
+    An email that fails is handed to its single-email task, which retries
+    it with backoff, so one bad address does not hold up the batch.
+    """
+    failed = 0
+    jobs = (
+        [(send_payment_verification_email_task, _build_participant_verification_email, args) for args in participants] +
+        [(send_team_payment_verification_emails_task, _build_team_verification_email, args) for args in teams]
+    )
+    
+    # Build every message first, then send them all over one SMTP session
+    prepared = []
+    for index, (task, build, args) in enumerate(jobs):
+        try:
+            email = build(*args)
+            if email.message is not None:
+                prepared.append((task, args, email))
+            elif not email.result.get('success'):
+                failed += 1
+        except SoftTimeLimitExceeded:
+            # Out of time - the rest go out as single tasks
+            logger.error(f"Batch timed out, requeueing {len(jobs) - index} email(s)")
+            for task, _, args in jobs[index:]:
+                task.apply_async(args=args)
+            break
+        except Exception as e:
+            logger.error(f"[ERROR] Batched verification email failed, requeueing: {str(e)}")
+            task.apply_async(args=args, countdown=60)
+            failed += 1
+    
+    try:
+        outcomes = send_prepared_emails([email for _, _, email in prepared])
+    except SoftTimeLimitExceeded:
+        # Out of time mid-send - hand every email to its single task; the
+        # idempotency keys stop the ones already sent from going out twice
+        logger.error(f"Batch timed out while sending, requeueing {len(prepared)} email(s)")
+        for task, args, _ in prepared:
+            task.apply_async(args=args)
+        raise
+    
+    for (task, args, email), error in zip(prepared, outcomes):
+        if error is not None:
+            task.apply_async(args=args, countdown=60)
+            failed += 1
+    
+    sent = outcomes.count(None)
+    logger.info(f"✓ Verification batch: {sent} sent, {failed} failed or requeued")
+    return {'success': True, 'sent': sent, 'failed': failed}
+
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def send_registration_email_task(self, participant_data, payment_data, team_data=None, 
                                  team_members_data=None, team_competitions=None):
     """Send registration confirmation email"""
     try:
         logger.info(f"[TASK START] Registration email for participant {participant_data.get('id')}")
-        
-        if not participant_data or not participant_data.get('email'):
-            logger.error("Invalid participant data")
-            return {'success': False, 'error': 'Invalid participant data'}
-        
-        # Idempotency check
-        try:
-            cache_key = f"reg_email_{participant_data['id']}_{payment_data.get('trx_id')}"
-            if cache.get(cache_key):
-                logger.info("Registration email already sent")
-                return {'success': True, 'message': 'Already sent', 'duplicate': True}
-        except Exception as cache_error:
-            logger.warning(f"Cache check failed: {cache_error}")
-        
-        from django.template.loader import render_to_string
-        from django.core.mail import EmailMultiAlternatives
-        from django.conf import settings
-        from email.mime.image import MIMEImage
-        import os
-        
-        # Attach logo helper
-        def attach_logo(email):
-            logo_path = os.path.join(settings.MEDIA_ROOT, 'logo.png')
-            if os.path.exists(logo_path):
-                with open(logo_path, 'rb') as f:
-                    logo_image = MIMEImage(f.read())
-                    logo_image.add_header('Content-ID', '<logo>')
-                    logo_image.add_header('Content-Disposition', 'inline', filename='logo.png')
-                    email.attach(logo_image)
-            return email
-        
-        context = {
-            'participant_name': participant_data.get('name', 'Participant'),
-            'participant_id': participant_data['id'],
-            'participant_email': participant_data['email'],
-            'participant_phone': participant_data.get('phone', ''),
-            'participant_institution': participant_data.get('institution', ''),
-            'participant_guardian_phone': participant_data.get('guardian_phone', ''),
-            'trx_id': payment_data.get('trx_id', ''),
-            'amount': payment_data.get('amount', ''),
-            'method': payment_data.get('method', ''),
-            'payment_phone': payment_data.get('phone', ''),
-            'segments': participant_data.get('segments', []),
-            'competitions': participant_data.get('competitions', []),
-        }
-        
-        # Prepare CC list for team
-        cc_emails = []
-        
-        if team_data:
-            context.update({
-                'team_name': team_data.get('name', ''),
-                'team_id': team_data.get('id', ''),
-                'team_members': team_members_data or [],
-                'team_competitions': team_competitions or []
-            })
-            
-            # Add team members as CC
-            if team_members_data:
-                for member in team_members_data:
-                    member_email = member.get('email')
-                    if member_email and member_email != participant_data['email']:
-                        cc_emails.append(member_email)
-        
-        html_content = render_to_string('registration_email_template.html', context)
-        
-        subject = "Registration Successful - Innoverse"
-        if team_data:
-            subject = f"Registration Successful - Team {team_data.get('name')} - Innoverse"
-        
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body="Thank you for registering for Innoverse!",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[participant_data['email']],
-            cc=cc_emails if cc_emails else None
-        )
-        
-        email.attach_alternative(html_content, "text/html")
-        email = attach_logo(email)
-        email.send(fail_silently=False)
-        
-        # Cache
-        try:
-            cache.set(cache_key, True, timeout=604800)
-        except Exception:
-            pass
-        
-        logger.info(f"✓ [SUCCESS] Registration email sent to {participant_data['email']} (CC: {len(cc_emails)})")
-        
-        return {
-            'success': True,
-            'recipient': participant_data['email'],
-            'cc_count': len(cc_emails),
-            'participant_id': participant_data['id']
-        }
+        return _send_prepared(_build_registration_email(
+            participant_data, payment_data, team_data, team_members_data, team_competitions
+        ))
         
     except Exception as e:
         logger.error(f"[ERROR] Registration email failed: {str(e)}", exc_info=True)
@@ -495,4 +507,71 @@ def send_registration_email_task(self, participant_data, payment_data, team_data
             raise self.retry(exc=e, countdown=countdown)
         except MaxRetriesExceededError:
             logger.critical("Max retries exceeded for registration email")
-            return {'success': False, 'error': str(e), 'max_retries_exceeded': True}
\ No newline at end of file
+            return {'success': False, 'error': str(e), 'max_retries_exceeded': True}
+
+
+# Task name -> builder, for consumers that send emails without running the task
+EMAIL_BUILDERS = {
+    send_payment_verification_email_task.name: _build_participant_verification_email,
+    send_team_payment_verification_emails_task.name: _build_team_verification_email,
+    send_registration_email_task.name: _build_registration_email,
+}
+
+
+@shared_task(ignore_result=True)
+def dispatch_email_outbox_task(batch_size=100, max_batches=20):
+    """
+    Publish committed outbox rows to the emails queue in batches.
+    Scheduled by celery beat (CELERY_BEAT_SCHEDULE).
+    """
+    from .outbox import dispatch_pending
+    
+    total = 0
+    for _ in range(max_batches):
+        published = dispatch_pending(batch_size=batch_size)
+        total += published
+        if published < batch_size:
+            break
+    
+    if total:
+        logger.info(f"✓ Outbox dispatcher published {total} email task(s)")
+    
+    return total
+
+
+@shared_task(ignore_result=True)
+def purge_email_outbox_task():
+    """
+    Delete dispatched outbox rows past their retention, so the table and
+    the dispatcher's pending scan do not grow without bound.
+    Scheduled by celery beat (CELERY_BEAT_SCHEDULE).
+    """
+    from .outbox import purge_dispatched
+    
+    return purge_dispatched()
+
+
+PRERENDER_LOCK = 'prerender_tickets_lock'
+
+
+@shared_task(ignore_result=True)
+def prerender_tickets_task(force=False):
+    """
+    Render QR codes and tickets for verified participants / teams that have
+    none stored for the current window, so ticket emails only attach files.
+    Scheduled by celery beat (CELERY_BEAT_SCHEDULE); a run still going when
+    the next one is due makes the next one a no-op.
+    """
+    if not cache.add(PRERENDER_LOCK, 1, timeout=tickets.PRERENDER_LOCK_TTL):
+        logger.info("Ticket pre-render already running, skipping")
+        return None
+    
+    try:
+        stats = tickets.prerender(tickets.all_qr_ids(), force=force)
+    finally:
+        cache.delete(PRERENDER_LOCK)
+    
+    if stats['rendered']:
+        logger.info(f"✓ Pre-rendered {stats['rendered']} ticket(s) at {stats['tickets_per_sec']}/s")
+    
+    return stats
@@ -1,3 +1,1523 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import shutil
+import smtplib
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail as django_mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import viewsets
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+from event.models import Competition, Coupons, Gift, Segment, TeamCompetition
+from innoverse.celery import app
+from participant.models import Participant, Payment, Registration, TanvinAward, Team, TeamParticipant
+from .catalog import CatalogCache
+from .conditional import ETAG_MAX_AGE
+from .coupons import CouponSoldOut, redeem_coupon, release_coupon, reserve_coupon
+from .entitlements import get_entitlements, warm_entitlements
+from .exports import iter_export, openpyxl
+from .idempotency import idempotent
+from .models import EmailOutbox, EntryStatus, EventSummary, GiftStatus, Role, Volunteer
+from .renderers import FastJSONParser, FastJSONRenderer
+from .qr_tokens import parse_qr_id, sign_qr_id
+from .scan_sync import sync_scan_events
+from .search import search, trigrams
+from .summaries import compute_summaries, rebuild_summaries, summary_counts
+from .stats import STATS_TTL, get_stats, invalidate_stats
+from .verification import bulk_verify
+from . import assets, mail, outbox, reconciliation, tasks, tickets
 
-# Create your tests here.
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_participant(email, **fields):
+    defaults = {
+        'f_name': 'Test', 'l_name': 'User', 'gender': 'M',
+        'phone': '01700000000', 'institution': 'Test School',
+    }
+    return Participant.objects.create(email=email, **{**defaults, **fields})
+
+
+def volunteer_client(username='volunteer', role='volunteer'):
+    """(APIClient authenticated with a JWT, Volunteer)"""
+    user = User.objects.create(username=username)
+    volunteer = Volunteer.objects.create(
+        user=user, v_name=username.title(), role=Role.objects.get_or_create(role_name=role)[0]
+    )
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+    return client, volunteer
+
+
+def registration(email, members=(), coupon=None):
+    """Body for POST /api/register/; members makes it a team registration"""
+    body = {
+        'participant': {
+            'full_name': 'Test User', 'gender': 'M', 'email': email,
+            'phone': '01700000000', 'institution': 'Test School',
+        },
+        'payment': {'amount': '100', 'phone': '01700000000', 'method': 'bkash', 'trx_id': uuid.uuid4().hex},
+        'segment': ['rob'],
+        'competition': ['quiz'],
+    }
+    if coupon:
+        body['coupon'] = {'coupon_code': coupon}
+    if members:
+        body['team_competition'] = {
+            'team': {
+                'team_name': f"Team {uuid.uuid4().hex[:8]}",
+                'participant': [
+                    {'full_name': 'Team Member', 'gender': 'F', 'email': member, 'phone': '01800000000', 'institution': 'Test School'}
+                    for member in members
+                ],
+            },
+            'competition': ['relay'],
+        }
+    return body
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+
+class RegistrationTestCase(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.segment = Segment.objects.create(segment_name='Robotics', code='rob')
+        self.competition = Competition.objects.create(competition='Quiz', code='quiz')
+        self.team_competition = TeamCompetition.objects.create(competition='Relay', code='relay')
+
+    def register(self, email, members=(), coupon=None):
+        return APIClient().post('/api/register/', registration(email, members, coupon), format='json')
+
+
+class CouponTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.coupon = Coupons.objects.create(coupon_code='TEST', discount=10, coupon_number=2)
+
+    def counter(self):
+        return cache.get(f"coupon_remaining_{self.coupon.id}")
+
+    def test_reserve_until_sold_out(self):
+        self.assertTrue(reserve_coupon(self.coupon))
+        self.assertTrue(reserve_coupon(self.coupon))
+        with self.assertRaises(CouponSoldOut) as raised:
+            reserve_coupon(self.coupon)
+        self.assertFalse(raised.exception.settled)
+        self.assertEqual(self.counter(), 0)
+
+    def test_release_gives_the_use_back(self):
+        reserve_coupon(self.coupon)
+        reserve_coupon(self.coupon)
+        release_coupon(self.coupon)
+        self.assertEqual(self.counter(), 1)
+        self.assertTrue(reserve_coupon(self.coupon))
+
+    def test_redeem_decrements_and_never_goes_below_zero(self):
+        redeem_coupon(self.coupon)
+        redeem_coupon(self.coupon)
+        with self.assertRaises(CouponSoldOut):
+            redeem_coupon(self.coupon)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.coupon_number, 0)
+
+    def test_db_sold_out_leaves_counter_at_zero(self):
+        # Redis still thinks uses are left, the database does not
+        cache.set(f"coupon_remaining_{self.coupon.id}", 5, timeout=None)
+        Coupons.objects.filter(pk=self.coupon.pk).update(coupon_number=0)
+
+        self.assertTrue(reserve_coupon(self.coupon))
+        with self.assertRaises(CouponSoldOut) as raised:
+            redeem_coupon(self.coupon)
+        self.assertTrue(raised.exception.settled)
+        self.assertEqual(self.counter(), 0)
+
+        with self.assertRaises(CouponSoldOut):
+            reserve_coupon(self.coupon)
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.published = []
+        patches = [
+            mock.patch.object(app, 'producer_or_acquire', return_value=mock.MagicMock()),
+            mock.patch.object(app, 'send_task', side_effect=self.send_task),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.fail_for = set()
+
+    def send_task(self, name, args=None, kwargs=None, **options):
+        if args and args[0] in self.fail_for:
+            raise ConnectionError('broker down')
+        self.published.append((name, args, options['queue']))
+
+    def enqueue(self, value):
+        return outbox.enqueue_email(tasks.send_registration_email_task, value, {'amount': 1})
+
+    def test_enqueue_only_writes_a_row(self):
+        entry = self.enqueue('a')
+        self.assertEqual(entry.task_name, tasks.send_registration_email_task.name)
+        self.assertEqual(entry.status, 'pending')
+        self.assertEqual(self.published, [])
+
+    def test_rolled_back_transaction_leaves_nothing_to_send(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.enqueue('a')
+                raise RuntimeError('registration failed')
+        self.assertEqual(outbox.dispatch_pending(), 0)
+
+    def test_dispatch_publishes_pending_rows_in_batches(self):
+        for value in 'abc':
+            self.enqueue(value)
+
+        self.assertEqual(outbox.dispatch_pending(batch_size=2), 2)
+        self.assertEqual(outbox.dispatch_pending(batch_size=2), 1)
+        self.assertEqual(outbox.dispatch_pending(batch_size=2), 0)
+
+        self.assertEqual([args[0] for _, args, _ in self.published], ['a', 'b', 'c'])
+        self.assertEqual({queue for _, _, queue in self.published}, {'emails'})
+        self.assertFalse(EmailOutbox.objects.exclude(status='dispatched').exists())
+
+    def test_failed_publish_returns_to_pending_until_max_attempts(self):
+        entry = self.enqueue('bad')
+        self.enqueue('good')
+        self.fail_for = {'bad'}
+
+        self.assertEqual(outbox.dispatch_pending(), 1)
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts, entry.last_error), ('pending', 1, 'broker down'))
+
+        for _ in range(outbox.MAX_ATTEMPTS - 1):
+            outbox.dispatch_pending()
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), ('failed', outbox.MAX_ATTEMPTS))
+        self.assertEqual(outbox.dispatch_pending(), 0)
+
+    def test_stale_claims_are_dispatched_again(self):
+        entry = self.enqueue('a')
+        EmailOutbox.objects.filter(id=entry.id).update(
+            status='dispatching', claimed_at=timezone.now() - outbox.CLAIM_TIMEOUT - timedelta(minutes=1)
+        )
+        self.assertEqual(outbox.dispatch_pending(), 1)
+
+        fresh = self.enqueue('b')
+        EmailOutbox.objects.filter(id=fresh.id).update(status='dispatching', claimed_at=timezone.now())
+        self.assertEqual(outbox.dispatch_pending(), 0)
+
+    def test_purge_keeps_recent_and_failed_rows(self):
+        old = timezone.now() - outbox.DISPATCHED_RETENTION - timedelta(days=1)
+        for value in 'abc':
+            self.enqueue(value)
+        EmailOutbox.objects.update(status='dispatched', dispatched_at=old)
+        recent = self.enqueue('recent')
+        EmailOutbox.objects.filter(id=recent.id).update(status='dispatched', dispatched_at=timezone.now())
+        failed = self.enqueue('failed')
+        EmailOutbox.objects.filter(id=failed.id).update(status='failed', dispatched_at=old)
+
+        self.assertEqual(outbox.purge_dispatched(batch_size=2), 3)
+        self.assertEqual(set(EmailOutbox.objects.values_list('id', flat=True)), {recent.id, failed.id})
+
+
+class CountingViewSet(viewsets.ViewSet):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    calls = 0
+    status_code = 201
+
+    @idempotent
+    def create(self, request):
+        CountingViewSet.calls += 1
+        return Response({'call': CountingViewSet.calls}, status=self.status_code)
+
+
+class IdempotencyTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        CountingViewSet.calls = 0
+        CountingViewSet.status_code = 201
+        self.view = CountingViewSet.as_view({'post': 'create'})
+
+    def post(self, body=None, key='key-1'):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        request = APIRequestFactory().post('/api/register/', body or {'email': 'a@example.com'}, format='json', **headers)
+        return self.view(request)
+
+    def test_without_key_every_request_runs(self):
+        self.post(key=None)
+        self.post(key=None)
+        self.assertEqual(CountingViewSet.calls, 2)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post()
+        retry = self.post()
+
+        self.assertEqual(CountingViewSet.calls, 1)
+        self.assertEqual((retry.status_code, retry.data), (201, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+
+        self.post(key='key-2')
+        self.assertEqual(CountingViewSet.calls, 2)
+
+    def test_same_key_with_another_body_is_rejected(self):
+        self.post()
+        self.assertEqual(self.post({'email': 'b@example.com'}).status_code, 422)
+        self.assertEqual(CountingViewSet.calls, 1)
+
+    def test_server_errors_are_not_stored(self):
+        CountingViewSet.status_code = 503
+        self.post()
+        CountingViewSet.status_code = 201
+        self.assertEqual(self.post().status_code, 201)
+        self.assertEqual(CountingViewSet.calls, 2)
+
+    def test_key_length_is_limited(self):
+        self.assertEqual(self.post(key='k' * 256).status_code, 400)
+        self.assertEqual(CountingViewSet.calls, 0)
+
+    def test_concurrent_retry_gets_conflict_when_first_never_finishes(self):
+        with mock.patch.object(cache, 'add', return_value=False), \
+                mock.patch('api.idempotency.WAIT_TIMEOUT', 0.2):
+            self.assertEqual(self.post().status_code, 409)
+        self.assertEqual(CountingViewSet.calls, 0)
+
+
+class CatalogCacheTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        Segment.objects.create(segment_name='Robotics', code='rob')
+        self.catalog = CatalogCache()
+
+    def test_reads_hit_the_database_once_per_version(self):
+        with self.assertNumQueries(4):
+            self.catalog.get()
+        with self.assertNumQueries(0):
+            self.assertEqual(list(self.catalog.get().segments), ['rob'])
+
+    def test_saving_an_event_table_reloads_every_copy(self):
+        self.catalog.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Gift.objects.create(gift_name='Mug')
+
+        gifts = self.catalog.get()
+        self.assertEqual(list(gifts.gifts), ['mug'])
+        self.assertEqual(gifts.gifts_by_id[gifts.gifts['mug'].id].gift_name, 'Mug')
+
+    def test_uncommitted_changes_are_not_picked_up(self):
+        self.catalog.get()
+        with self.captureOnCommitCallbacks(execute=False):
+            Gift.objects.create(gift_name='Mug')
+        self.assertEqual(self.catalog.get().gifts, {})
+
+    def test_cache_outage_falls_back_to_a_short_ttl(self):
+        self.catalog.get()
+        with mock.patch('api.catalog.get_version', side_effect=ConnectionError('redis down')):
+            with self.assertNumQueries(0):
+                self.catalog.get()
+            with mock.patch('api.catalog.time.monotonic', return_value=10 ** 9):
+                with self.assertNumQueries(4):
+                    self.catalog.get()
+
+
+class EntitlementTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.segment = Segment.objects.create(segment_name='Robotics', code='rob')
+        self.participant = make_participant('member@example.com')
+        self.team = Team.objects.create(team_name='Bots')
+        TeamParticipant.objects.create(
+            team=self.team, participant=self.participant, f_name='Test', l_name='User',
+            email='member@example.com', phone='01700000000', institution='Test School', is_leader=True
+        )
+
+    def test_records_are_served_from_the_cache(self):
+        participant_record, team_record = get_entitlements('participant', self.participant.id)
+        self.assertEqual(participant_record['team_id'], self.team.id)
+        self.assertEqual(team_record['info']['member_count'], 1)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_entitlements('participant', self.participant.id), (participant_record, team_record))
+
+    def test_changes_invalidate_on_commit(self):
+        get_entitlements('participant', self.participant.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Registration.objects.create(participant=self.participant, segment=self.segment)
+            EntryStatus.objects.create(team=self.team)
+
+        participant_record, team_record = get_entitlements('participant', self.participant.id)
+        self.assertEqual(participant_record['segments'], ['rob'])
+        self.assertTrue(team_record['has_entry'])
+        self.assertFalse(participant_record['has_entry'])
+
+    def test_unknown_entities(self):
+        with self.assertRaises(Participant.DoesNotExist):
+            get_entitlements('participant', 999999)
+        with self.assertRaises(Team.DoesNotExist):
+            get_entitlements('team', 999999)
+
+    def test_warm_builds_every_record(self):
+        make_participant('solo@example.com')
+        self.assertEqual(warm_entitlements(batch_size=1), 3)
+        with self.assertNumQueries(0):
+            get_entitlements('participant', self.participant.id)
+            get_entitlements('team', self.team.id)
+
+
+class TeamMembershipLinkTests(RegistrationTestCase):
+    def test_members_link_to_existing_participants_ignoring_case(self):
+        self.assertEqual(self.register('member@example.com').status_code, 201)
+        member = Participant.objects.get(email='member@example.com')
+
+        self.assertEqual(self.register('leader@example.com', members=['Member@Example.com']).status_code, 201)
+        leader = Participant.objects.get(email='leader@example.com')
+
+        links = dict(TeamParticipant.objects.values_list('email', 'participant_id'))
+        self.assertEqual(links, {'leader@example.com': leader.id, 'Member@Example.com': member.id})
+
+    def test_later_registration_claims_member_rows(self):
+        self.register('leader@example.com', members=['LATE@example.com'])
+        team = Team.objects.get()
+        get_entitlements('team', team.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.register('late@example.com').status_code, 201)
+        late = Participant.objects.get(email='late@example.com')
+
+        self.assertEqual(TeamParticipant.objects.get(email='LATE@example.com').participant_id, late.id)
+        participant_record, team_record = get_entitlements('participant', late.id)
+        self.assertEqual(participant_record['team_id'], team.id)
+        self.assertEqual(team_record['info']['id'], team.id)
+
+    def test_unrelated_emails_stay_unlinked(self):
+        self.register('leader@example.com', members=['nobody@example.com'])
+        self.register('somebody@example.com')
+        self.assertIsNone(TeamParticipant.objects.get(email='nobody@example.com').participant_id)
+
+
+class ScanBundleTests(RegistrationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.gift = Gift.objects.create(gift_name='Mug')
+        self.client, _ = volunteer_client()
+        self.register('leader@example.com', members=['member@example.com'])
+        self.leader = Participant.objects.get(email='leader@example.com')
+        self.team = Team.objects.get()
+
+    def test_bundle_for_a_participant(self):
+        data = self.client.get(f"/api/scan/p_{self.leader.id}/").json()
+
+        self.assertTrue(data['success'])
+        self.assertFalse(data['has_entry'])
+        self.assertEqual(data['gifts'], {'mug': 0})
+        self.assertEqual(data['participant']['email'], 'leader@example.com')
+        self.assertEqual(data['team']['member_count'], 2)
+        self.assertNotIn('allowed', data)
+
+    def test_bundle_reflects_scans_of_the_scanned_entity(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            GiftStatus.objects.create(team=self.team, gift=self.gift)
+
+        self.assertEqual(self.client.get(f"/api/scan/t_{self.team.id}/").json()['gifts'], {'mug': 1})
+        self.assertEqual(self.client.get(f"/api/scan/p_{self.leader.id}/").json()['gifts'], {'mug': 0})
+
+    def test_bundle_with_gate_allowance(self):
+        def allowed(page, event):
+            return self.client.get(f"/api/scan/{page}/{event}/p_{self.leader.id}/").json()['allowed']
+
+        self.assertTrue(allowed('segment', 'rob'))
+        self.assertTrue(allowed('solo', 'quiz'))
+        self.assertTrue(allowed('team', 'relay'))
+        self.assertFalse(allowed('segment', 'other'))
+        self.assertEqual(self.client.get(f"/api/scan/stage/rob/p_{self.leader.id}/").status_code, 400)
+
+    def test_unknown_and_malformed_ids(self):
+        self.assertEqual(self.client.get('/api/scan/p_999999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/scan/t_999999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/scan/nonsense/').status_code, 400)
+        self.assertEqual(APIClient().get(f"/api/scan/p_{self.leader.id}/").status_code, 401)
+
+
+class ScanSyncTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client, self.volunteer = volunteer_client('scanner')
+        self.participant = make_participant('scan@example.com')
+        self.gift = Gift.objects.create(gift_name='T-shirt')
+        self.now = timezone.now()
+
+    def scan(self, when, type='entry', **extra):
+        return {
+            'id': f"p_{self.participant.id}",
+            'type': type,
+            'client_datetime': when.isoformat(),
+            **extra,
+        }
+
+    def sync(self, *items, device_id='dev-1'):
+        return [r['status'] for r in sync_scan_events(list(items), self.volunteer.id, device_id=device_id)]
+
+    def test_earliest_scan_in_a_batch_wins(self):
+        early = self.now - timedelta(hours=2)
+        statuses = self.sync(self.scan(self.now), self.scan(early))
+
+        self.assertEqual(statuses, ['duplicate', 'recorded'])
+        self.assertEqual(EntryStatus.objects.get(participant=self.participant).client_datetime, early)
+
+    def test_earlier_scan_from_a_later_batch_supersedes(self):
+        self.sync(self.scan(self.now))
+        early = self.now - timedelta(hours=1)
+
+        self.assertEqual(self.sync(self.scan(early), device_id='dev-2'), ['recorded'])
+        entry = EntryStatus.objects.get(participant=self.participant)
+        self.assertEqual((entry.client_datetime, entry.device_id), (early, 'dev-2'))
+
+        self.assertEqual(self.sync(self.scan(self.now + timedelta(hours=1))), ['duplicate'])
+        self.assertEqual(EntryStatus.objects.count(), 1)
+
+    def test_gift_slots_are_per_gift(self):
+        statuses = self.sync(
+            self.scan(self.now, type='gift', gift_name='T-shirt'),
+            self.scan(self.now, type='gift', gift_name='t-shirt'),
+        )
+        self.assertEqual(sorted(statuses), ['duplicate', 'recorded'])
+        self.assertEqual(GiftStatus.objects.count(), 1)
+
+    def test_invalid_items(self):
+        statuses = self.sync({'id': 'p_1', 'type': 'entry'}, self.scan(self.now) | {'id': 'p_999999'})
+        self.assertEqual(statuses, ['invalid', 'invalid'])
+
+    def race(self, competitor_time):
+        # A concurrent scan takes the slot between our read and our insert
+        bulk_create = EntryStatus.objects.bulk_create
+
+        def racing(rows, **kwargs):
+            EntryStatus.objects.create(
+                participant=self.participant, client_datetime=competitor_time, device_id='other'
+            )
+            return bulk_create(rows, **kwargs)
+
+        return mock.patch.object(EntryStatus.objects, 'bulk_create', side_effect=racing)
+
+    def test_lost_insert_race_with_earlier_scan_supersedes(self):
+        ours = self.now - timedelta(hours=1)
+        with self.race(self.now):
+            self.assertEqual(self.sync(self.scan(ours)), ['recorded'])
+        entry = EntryStatus.objects.get(participant=self.participant)
+        self.assertEqual((entry.client_datetime, entry.device_id), (ours, 'dev-1'))
+
+    def test_lost_insert_race_with_later_scan_is_duplicate(self):
+        theirs = self.now - timedelta(hours=3)
+        with self.race(theirs):
+            self.assertEqual(self.sync(self.scan(self.now - timedelta(hours=1))), ['duplicate'])
+        entry = EntryStatus.objects.get(participant=self.participant)
+        self.assertEqual((entry.client_datetime, entry.device_id), (theirs, 'other'))
+
+    def test_endpoint_summary(self):
+        response = self.client.post('/api/scan/sync/', {
+            'device_id': 'dev-1',
+            'events': [self.scan(self.now), self.scan(self.now), {'id': 'p_1'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['summary'], {'recorded': 1, 'duplicate': 1, 'invalid': 1})
+
+    def test_endpoint_rejects_malformed_bodies(self):
+        self.assertEqual(self.client.post('/api/scan/sync/', [self.scan(self.now)], format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/scan/sync/', {'events': []}, format='json').status_code, 400)
+
+
+class QRTokenTests(CacheTestCase):
+    def test_round_trip(self):
+        self.assertEqual(parse_qr_id(sign_qr_id('p_42')), ('participant', 42))
+        self.assertEqual(parse_qr_id(sign_qr_id('t_7')), ('team', 7))
+
+    def test_tampered_payload_is_rejected(self):
+        token = sign_qr_id('p_42')
+        with self.assertRaisesMessage(ValueError, 'signature'):
+            parse_qr_id(token.replace('p_42', 'p_43', 1))
+
+    def test_expired_token_is_rejected(self):
+        token = sign_qr_id('p_42', expires=time.time() - 1)
+        with self.assertRaisesMessage(ValueError, 'expired'):
+            parse_qr_id(token)
+
+    def test_pinned_expiry_gives_the_same_payload(self):
+        expires = time.time() + 3600
+        self.assertEqual(sign_qr_id('p_42', expires=expires), sign_qr_id('p_42', expires=expires))
+
+    def test_unsigned_codes_accepted_by_default(self):
+        # Tickets emailed before signing carry plain codes
+        self.assertEqual(parse_qr_id('p_42'), ('participant', 42))
+
+    @override_settings(QR_ACCEPT_UNSIGNED=False)
+    def test_unsigned_codes_rejected_once_switched_off(self):
+        with self.assertRaises(ValueError):
+            parse_qr_id('p_42')
+        self.assertEqual(parse_qr_id(sign_qr_id('p_42')), ('participant', 42))
+
+    def test_malformed_id(self):
+        with self.assertRaises(ValueError):
+            sign_qr_id('x_1')
+        with self.assertRaises(ValueError):
+            parse_qr_id('nonsense')
+
+    @override_settings(QR_ACCEPT_UNSIGNED=False)
+    def test_session_probe_does_not_parse_qr_codes(self):
+        client, volunteer = volunteer_client()
+        response = client.get('/api/session/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['volunteer_id'], volunteer.id)
+        self.assertEqual(APIClient().get('/api/session/').status_code, 401)
+        self.assertEqual(client.get('/api/gifts/p_01/').status_code, 400)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class VolunteerClaimsTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='organizer', password='secret-pass')
+        self.volunteer = Volunteer.objects.create(
+            user=user, v_name='Organizer', role=Role.objects.create(role_name='admin')
+        )
+        access = APIClient().post('/login/', {'username': 'organizer', 'password': 'secret-pass'}, format='json').json()['access']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_login_embeds_the_claims(self):
+        self.assertEqual(self.client.get('/api/session/').json()['role'], 'admin')
+
+    def test_claims_need_no_volunteer_queries(self):
+        self.client.get('/api/session/')
+        # Only the JWT user lookup remains
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/session/').json()['volunteer_id'], self.volunteer.id)
+
+    def test_role_change_invalidates_issued_claims(self):
+        self.assertEqual(self.client.get('/api/stats/').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.volunteer.role = Role.objects.create(role_name='volunteer')
+            self.volunteer.save()
+
+        self.assertEqual(self.client.get('/api/session/').json()['role'], 'volunteer')
+        self.assertEqual(self.client.get('/api/stats/').status_code, 403)
+
+    def test_tokens_without_claims_fall_back_to_the_database(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.volunteer.user).access_token}")
+        self.assertEqual(client.get('/api/session/').json()['role'], 'admin')
+        self.assertEqual(client.get('/api/stats/').status_code, 200)
+
+
+class KeysetPaginationTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client, _ = volunteer_client('organizer', role='admin')
+        self.ids = [make_participant(f"p{i}@example.com").id for i in range(7)]
+
+    def walk(self, url):
+        seen, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [row['id'] for row in response.json()['data']]
+            url = response.json()['next']
+            pages += 1
+        return seen, pages
+
+    def test_pages_walk_ids_descending_without_gaps(self):
+        seen, pages = self.walk('/api/participant/?page_size=3')
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, sorted(self.ids, reverse=True))
+
+    def test_rows_added_while_paging_do_not_shift_pages(self):
+        first = self.client.get('/api/participant/?page_size=3').json()
+        make_participant('late@example.com')
+        rest, _ = self.walk(first['next'])
+
+        self.assertEqual([row['id'] for row in first['data']] + rest, sorted(self.ids, reverse=True))
+
+    def test_previous_link_returns_the_same_page(self):
+        first = self.client.get('/api/participant/?page_size=3').json()
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['data'], first['data'])
+
+    def test_count_only_when_asked(self):
+        self.assertNotIn('count', self.client.get('/api/participant/').json())
+        self.assertEqual(self.client.get('/api/participant/?count=true').json()['count'], 7)
+
+    def test_team_listing(self):
+        team_ids = [Team.objects.create(team_name=f"Team {i}").id for i in range(4)]
+        seen, pages = self.walk('/api/team/?page_size=3')
+        self.assertEqual((seen, pages), (sorted(team_ids, reverse=True), 2))
+
+
+class SearchTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client, _ = volunteer_client('organizer', role='admin')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.jonathan = make_participant('jonathan@example.com', f_name='Jonathan', l_name='Rahman')
+            self.other = make_participant('mira@example.com', f_name='Mira', l_name='Sultana')
+            Payment.objects.create(participant=self.other, phone='01911111111', amount='100', method='bkash', trx_id='BK7Q2X9Z')
+            team = Team.objects.create(team_name='Bots')
+            TeamParticipant.objects.create(
+                team=team, f_name='Jonas', l_name='Karim', email='jonas@example.com',
+                phone='01822222222', institution='Test School'
+            )
+            self.team = team
+
+    def test_trigrams_match_pg_trgm(self):
+        self.assertEqual(trigrams('Cat'), {'  c', ' ca', 'cat', 'at '})
+        self.assertEqual(trigrams('a-b'), {'  a', ' a ', '  b', ' b '})
+
+    def test_misspelled_name_ranks_the_closest_first(self):
+        results = search('Jonathn')
+        self.assertEqual((results[0]['type'], results[0]['id']), ('participant', self.jonathan.id))
+        self.assertEqual(results[0]['qr_id'], f"p_{self.jonathan.id}")
+
+    def test_substring_of_a_transaction_id(self):
+        results = search('7q2x')
+        self.assertEqual([(r['type'], r['qr_id']) for r in results], [('payment', f"p_{self.other.id}")])
+
+    def test_team_members_open_their_team(self):
+        results = search('jonas@example.com')
+        self.assertEqual(results[0]['qr_id'], f"t_{self.team.id}")
+
+    def test_new_rows_are_searchable_after_commit(self):
+        search('Jonathan')
+        with self.captureOnCommitCallbacks(execute=True):
+            make_participant('tahmid@example.com', f_name='Tahmid')
+        self.assertEqual(search('Tahmid')[0]['email'], 'tahmid@example.com')
+
+    def test_endpoint(self):
+        data = self.client.get('/api/search/?q=mira&limit=5').json()
+        self.assertEqual(data['data'][0]['id'], self.other.id)
+        self.assertEqual(data['count'], len(data['data']))
+        self.assertEqual(self.client.get('/api/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/search/?q=mira&limit=x').status_code, 400)
+
+
+class ListQueryCountTests(RegistrationTestCase):
+    """List endpoints run a fixed number of queries however many rows they return"""
+
+    def setUp(self):
+        super().setUp()
+        self.client, self.volunteer = volunteer_client('organizer', role='admin')
+        self.gift = Gift.objects.create(gift_name='Mug')
+        self.registered = 0
+
+    def add_registrations(self, count):
+        for _ in range(count):
+            self.registered += 1
+            self.register(f"leader{self.registered}@example.com", members=[f"member{self.registered}@example.com"])
+            participant = Participant.objects.latest('id')
+            team = Team.objects.latest('id')
+            EntryStatus.objects.create(participant=participant, volunteer=self.volunteer)
+            GiftStatus.objects.create(participant=participant, gift=self.gift, volunteer=self.volunteer)
+            GiftStatus.objects.create(team=team, gift=self.gift, volunteer=self.volunteer)
+            TanvinAward.objects.create(team=team, project_name='Rover', project_type='robotics', project_description='A rover')
+
+    def assertConstantQueries(self, url):
+        self.add_registrations(2)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        # Read now: later requests reset the connection's query log
+        expected = len(small)
+
+        self.add_registrations(4)
+        self.client.get(url)
+        with self.assertNumQueries(expected):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_participant_listing(self):
+        self.assertConstantQueries('/api/participant/')
+
+    def test_participant_detail(self):
+        self.add_registrations(1)
+        self.assertConstantQueries(f"/api/participant/{Participant.objects.order_by('id').first().id}/")
+
+    def test_team_listing(self):
+        self.assertConstantQueries('/api/team/')
+
+    def test_segment_participants(self):
+        self.assertConstantQueries('/api/segment/rob/')
+
+    def test_competition_participants(self):
+        self.assertConstantQueries('/api/competition/quiz/')
+
+    def test_team_competition_teams(self):
+        self.assertConstantQueries('/api/team-competition/relay/')
+
+    def test_tanvin_award_listing(self):
+        self.assertConstantQueries('/api/tanvin-award/')
+
+
+class ExportTests(RegistrationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client, _ = volunteer_client('organizer', role='admin')
+        for i in range(3):
+            self.register(f"p{i}@example.com")
+        self.hostile = make_participant(
+            'hostile@example.com', f_name='=HYPERLINK("http://x.test","open")', l_name='+1+1',
+            institution='@SUM(A1)', phone='-5'
+        )
+        Payment.objects.create(participant=self.hostile, phone='01700000000', amount='100', method='bkash', trx_id='=1+2')
+
+    def rows(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        text = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(io.StringIO(text)))
+
+    def test_csv_has_one_row_per_record(self):
+        rows = self.rows('/api/export/participants.csv')
+        self.assertEqual(rows[0][:4], ['ID', 'First name', 'Last name', 'Email'])
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(self.rows('/api/export/participants.csv?segment=rob')[1][11], 'Robotics')
+        self.assertEqual(len(self.rows('/api/export/participants.csv?segment=rob')), 4)
+
+    def test_chunks_cover_every_row(self):
+        rows = list(iter_export('participants', {}, chunk_size=2))
+        self.assertEqual([row[0] for row in rows[1:]], sorted(Participant.objects.values_list('id', flat=True)))
+
+    def test_csv_cells_never_start_a_formula(self):
+        row = next(r for r in self.rows('/api/export/participants.csv') if r[3] == 'hostile@example.com')
+        self.assertEqual(row[1:3], ['\'=HYPERLINK("http://x.test","open")', "'+1+1"])
+        self.assertEqual((row[4], row[6], row[17]), ("'-5", "'@SUM(A1)", "'=1+2"))
+
+        payment = self.rows('/api/export/payments.csv')[-1]
+        self.assertEqual(payment[1], "'=1+2")
+
+    @skipUnless(openpyxl, 'openpyxl is not installed')
+    def test_xlsx_cells_never_start_a_formula(self):
+        response = self.client.get('/api/export/participants.xlsx')
+        self.assertEqual(response.status_code, 200)
+        sheet = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        row = next(r for r in sheet.iter_rows(min_row=2) if r[3].value == 'hostile@example.com')
+
+        self.assertEqual([cell.data_type for cell in row[1:3]], ['s', 's'])
+        self.assertEqual(row[1].value, '\'=HYPERLINK("http://x.test","open")')
+        self.assertEqual(row[17].value, "'=1+2")
+        self.assertEqual(sheet.max_row, 5)
+
+    def test_unknown_export(self):
+        self.assertEqual(self.client.get('/api/export/volunteers.csv').status_code, 404)
+        self.assertEqual(self.client.get('/api/export/participants.pdf').status_code, 404)
+
+
+class ConditionalGetTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client, _ = volunteer_client('organizer', role='admin')
+        make_participant('first@example.com')
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_listing_is_not_modified(self):
+        response = self.client.get('/api/participant/')
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertIn('Authorization', response['Vary'])
+
+        not_modified = self.revalidate('/api/participant/', etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+        self.assertEqual(self.revalidate('/api/participant/', '*').status_code, 304)
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get('/api/participant/')['ETag']
+        team_etag = self.client.get('/api/team/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            make_participant('second@example.com')
+
+        response = self.revalidate('/api/participant/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['data']), 2)
+        self.assertEqual(self.revalidate('/api/team/', team_etag).status_code, 304)
+
+    def test_etag_depends_on_the_query(self):
+        etag = self.client.get('/api/participant/')['ETag']
+        self.assertEqual(self.revalidate('/api/participant/?page_size=1', etag).status_code, 200)
+
+    def test_writes_that_skip_signals_show_up_when_the_bucket_turns(self):
+        now = time.time()
+        with mock.patch('api.conditional.time.time', return_value=now):
+            etag = self.client.get('/api/participant/')['ETag']
+            Participant.objects.update(f_name='Renamed')
+            self.assertEqual(self.revalidate('/api/participant/', etag).status_code, 304)
+
+        with mock.patch('api.conditional.time.time', return_value=now + ETAG_MAX_AGE):
+            response = self.revalidate('/api/participant/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'][0]['full_name'], 'Renamed User')
+
+
+class StatsTests(RegistrationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client, self.volunteer = volunteer_client('organizer', role='admin')
+        self.gift = Gift.objects.create(gift_name='Mug')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.register('solo@example.com')
+            self.register('leader@example.com', members=['member@example.com'])
+
+    def test_figures(self):
+        participant = Participant.objects.get(email='solo@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            EntryStatus.objects.create(participant=participant)
+            GiftStatus.objects.create(participant=participant, gift=self.gift)
+            invalidate_stats('scans')
+
+        stats = get_stats()
+        registrations = stats['registrations']
+        self.assertEqual([s['count'] for s in registrations['segments']], [2])
+        self.assertEqual([c['count'] for c in registrations['team_competitions']], [1])
+        self.assertEqual(stats['payments']['participants']['unverified']['count'], 2)
+        self.assertEqual(stats['payments']['teams']['unverified']['count'], 1)
+        self.assertEqual(stats['payments']['by_method']['bkash']['count'], 3)
+        self.assertEqual(stats['people']['participants']['total'], 2)
+        self.assertEqual(stats['people']['team_members']['gender'], {'M': 1, 'F': 1})
+        self.assertEqual(stats['scans']['entries'], {'participants': 1, 'teams': 0})
+        self.assertEqual(stats['scans']['gifts'], [{'gift': 'Mug', 'participants': 1, 'teams': 0}])
+
+    def test_unchanged_sections_come_from_the_cache(self):
+        get_stats()
+        with self.assertNumQueries(0):
+            get_stats()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_stats('scans')
+        # Only the scans section is recomputed, in one query
+        with self.assertNumQueries(1):
+            get_stats()
+
+    def test_concurrent_recompute_serves_previous_figures(self):
+        before = get_stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_stats('people')
+        cache.add('stats_section_people_lock', 1)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_stats()['people'], before['people'])
+
+    def test_endpoint_revalidates_with_the_stats_versions(self):
+        response = self.client.get('/api/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/stats/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_stats('payments')
+        self.assertEqual(self.client.get('/api/stats/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+        later = time.time() + STATS_TTL
+        etag = self.client.get('/api/stats/')['ETag']
+        with mock.patch('api.conditional.time.time', return_value=later):
+            self.assertEqual(self.client.get('/api/stats/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class FastJSONTests(TestCase):
+    payload = {
+        'id': 7,
+        'name': 'Zahin \u2028 \u09a8\u09be\u09ae',
+        'amount': Decimal('250.50'),
+        'when': timezone.now(),
+        'trx': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'nested': [{'ok': True, 'none': None, 'ratio': 0.25}],
+        3: 'int key',
+    }
+
+    def test_renders_like_json_renderer(self):
+        self.assertEqual(FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+        self.assertEqual(FastJSONRenderer().render(None), JSONRenderer().render(None))
+
+    def test_values_orjson_rejects_fall_back(self):
+        data = {'huge': 2 ** 70}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indented_output_is_left_to_json_renderer(self):
+        context = {'indent': 2}
+        self.assertEqual(
+            FastJSONRenderer().render(self.payload, renderer_context=context),
+            JSONRenderer().render(self.payload, renderer_context=context)
+        )
+
+    def test_without_orjson(self):
+        with mock.patch('api.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+            self.assertEqual(FastJSONParser().parse(io.BytesIO(b'{"a": [1, 2]}')), {'a': [1, 2]})
+
+    def test_parses_like_json_parser(self):
+        body = '{"name": "\u09a8\u09be\u09ae", "amount": 1.5, "items": [1, null, true]}'.encode()
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+
+    def test_invalid_json_is_a_parse_error(self):
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"a": '))
+
+    def test_api_round_trip(self):
+        response = APIClient().get('/api/coupon/NOPE/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIsInstance(response.json(), dict)
+
+
+class EventSummaryTests(RegistrationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client, _ = volunteer_client('organizer', role='admin')
+        self.register('solo@example.com')
+        self.register('leader@example.com', members=['member@example.com'])
+        self.solo = Participant.objects.get(email='solo@example.com')
+
+    def counts(self):
+        return (
+            summary_counts('segment', self.segment.id),
+            summary_counts('team_competition', self.team_competition.id),
+        )
+
+    def assertExact(self):
+        for kind, event in (('segment', self.segment), ('competition', self.competition), ('team_competition', self.team_competition)):
+            exact = dict(zip(('registrations', 'verified', 'entries'), compute_summaries(kind, [event.id])[event.id]))
+            self.assertEqual(summary_counts(kind, event.id), exact, kind)
+
+    def test_registrations_are_counted(self):
+        segment, team_competition = self.counts()
+        self.assertEqual(segment, {'registrations': 2, 'verified': 0, 'entries': 0})
+        self.assertEqual(team_competition, {'registrations': 1, 'verified': 0, 'entries': 0})
+        self.assertExact()
+
+    def test_verification_and_entries_move_the_counters(self):
+        self.client.post('/api/payment/verify/', {'id': self.solo.id}, format='json')
+        EntryStatus.objects.create(participant=self.solo)
+        self.assertEqual(self.counts()[0], {'registrations': 2, 'verified': 1, 'entries': 1})
+        self.assertExact()
+
+        self.client.post('/api/payment/verify/', {'id': self.solo.id}, format='json')
+        EntryStatus.objects.filter(participant=self.solo).delete()
+        Registration.objects.filter(participant=self.solo).delete()
+        self.assertEqual(self.counts()[0], {'registrations': 1, 'verified': 0, 'entries': 0})
+        self.assertExact()
+
+    def test_team_verification(self):
+        leader = Participant.objects.get(email='leader@example.com')
+        self.client.post('/api/payment/verify/', {'id': leader.id}, format='json')
+        self.assertEqual(self.counts()[1]['verified'], 1)
+        self.assertExact()
+
+    def test_failed_registration_leaves_the_counters_alone(self):
+        before = self.counts()
+        coupon = Coupons.objects.create(coupon_code='LAST', discount=10, coupon_number=1)
+        Coupons.objects.filter(pk=coupon.pk).update(coupon_number=0)  # counter still says 1
+
+        response = self.register('late@example.com', members=['late-member@example.com'], coupon='LAST')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Participant.objects.filter(email='late@example.com').exists())
+        self.assertEqual(self.counts(), before)
+        self.assertExact()
+
+    def test_rebuild_repairs_drift(self):
+        EventSummary.objects.filter(kind='segment').update(registrations=40, entries=3)
+        self.assertEqual(rebuild_summaries('segment', [self.segment.id]), 1)
+        self.assertExact()
+        self.assertEqual(rebuild_summaries('segment', [self.segment.id]), 0)
+
+    def test_rebuild_command(self):
+        EventSummary.objects.filter(kind='competition').update(verified=5)
+        EventSummary.objects.create(kind='segment', object_id=999999)
+        out = io.StringIO()
+        call_command('rebuild_event_summaries', stdout=out)
+
+        self.assertIn('competition: 1 summaries, 1 drifted, 0 orphaned removed', out.getvalue())
+        self.assertIn('segment: 1 summaries, 0 drifted, 1 orphaned removed', out.getvalue())
+        self.assertExact()
+
+
+class BulkVerificationTests(RegistrationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client, _ = volunteer_client('organizer', role='admin')
+        self.register('solo@example.com')
+        self.register('leader@example.com', members=['member@example.com'])
+        self.solo = Participant.objects.get(email='solo@example.com')
+        self.leader = Participant.objects.get(email='leader@example.com')
+        self.team = Team.objects.get()
+        # Member who never registered on their own: pays through the team
+        self.member = make_participant('member@example.com')
+        TeamParticipant.objects.filter(email='member@example.com').update(participant=self.member)
+        self.unpaid = make_participant('unpaid@example.com')
+        EmailOutbox.objects.all().delete()
+
+    def statuses(self, ids):
+        results, _ = bulk_verify(ids)
+        return [result['status'] for result in results]
+
+    def test_outcomes(self):
+        Participant.objects.filter(id=self.solo.id).update(payment_verified=True)
+        statuses = self.statuses([self.solo.id, self.unpaid.id, 999999, 'abc', -1, self.member.id])
+        self.assertEqual(statuses, ['already_verified', 'no_payment', 'not_found', 'invalid', 'invalid', 'verified'])
+
+    def test_leader_verifies_their_team(self):
+        results, batches = bulk_verify([self.leader.id])
+        self.assertEqual(results, [{'id': self.leader.id, 'team_id': self.team.id, 'status': 'verified'}])
+        self.team.refresh_from_db()
+        self.assertTrue(self.team.payment_verified)
+
+        self.assertEqual(batches, 1)
+        entry = EmailOutbox.objects.get()
+        participants, teams = entry.args
+        self.assertEqual([(p[0]['email'], p[1]) for p in participants], [('leader@example.com', True)])
+        self.assertEqual([len(t[1]) for t in teams], [2])
+
+    def test_member_is_verified_through_the_team(self):
+        self.assertEqual(self.statuses([self.member.id]), ['verified'])
+        self.member.refresh_from_db()
+        self.team.refresh_from_db()
+        self.assertTrue(self.member.payment_verified and self.team.payment_verified)
+        self.assertEqual(self.statuses([self.member.id]), ['already_verified'])
+
+    def test_emails_are_batched(self):
+        extra = [make_participant(f"x{i}@example.com") for i in range(3)]
+        for participant in extra:
+            Payment.objects.create(participant=participant, phone='01700000000', amount='100', method='bkash', trx_id=f"X{participant.id}")
+            Registration.objects.create(participant=participant, segment=self.segment)
+
+        with mock.patch('api.verification.EMAIL_BATCH_SIZE', 2):
+            _, batches = bulk_verify([p.id for p in extra] + [self.solo.id])
+        self.assertEqual((batches, EmailOutbox.objects.count()), (2, 2))
+
+    def test_query_count_does_not_grow_with_ids(self):
+        def make_paid(count):
+            made = []
+            for _ in range(count):
+                participant = make_participant(f"{uuid.uuid4().hex[:8]}@example.com")
+                Payment.objects.create(participant=participant, phone='01700000000', amount='100', method='bkash', trx_id=uuid.uuid4().hex)
+                Registration.objects.create(participant=participant, segment=self.segment)
+                made.append(participant.id)
+            return made
+
+        small = make_paid(2)
+        with CaptureQueriesContext(connection) as queries:
+            bulk_verify(small)
+        expected = len(queries)
+
+        large = make_paid(6)
+        with self.assertNumQueries(expected):
+            bulk_verify(large)
+
+    def test_endpoint(self):
+        response = self.client.post('/api/payment/verify/bulk/', {'ids': [self.solo.id, 999999]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['counts'], {'verified': 1, 'not_found': 1})
+
+        self.assertEqual(self.client.post('/api/payment/verify/bulk/', {'ids': []}, format='json').status_code, 400)
+        with mock.patch('api.views.MAX_IDS', 1):
+            self.assertEqual(self.client.post('/api/payment/verify/bulk/', {'ids': [1, 2]}, format='json').status_code, 400)
+
+
+STATEMENT = b"""Merchant statement
+Account,01800000000
+
+Date,TrxID,Sender,Amount,Status
+2025-01-01,TRXOK,8801711111111,500.00,Completed
+2025-01-01,TRXAMT,01722222222,300,Completed
+2025-01-01,TRXNONE,01733333333,500,Completed
+2025-01-01,trxok,01711111111,500,Completed
+2025-01-01,TRXFAIL,01744444444,500,Failed
+2025-01-01,,01755555555,500,Completed
+"""
+
+
+class ReconciliationTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.matched = make_participant('ok@example.com')
+        Payment.objects.create(participant=self.matched, phone='01711111111', amount='500', method='bkash', trx_id='trxok')
+        self.mismatched = make_participant('amount@example.com')
+        Payment.objects.create(participant=self.mismatched, phone='01722222222', amount='500', method='bkash', trx_id='TRXAMT')
+
+    def reconcile(self, dry_run):
+        counts, report = reconciliation.reconcile(io.BytesIO(STATEMENT), method='bkash', dry_run=dry_run)
+        return counts, [(entry['trx_id'], entry['status']) for entry in report]
+
+    def test_match_row(self):
+        payment = reconciliation.IndexedPayment(1, reconciliation.parse_amount('500'), '1711111111', 10)
+        self.assertEqual(reconciliation.match_row([payment], payment.amount, '1711111111')[0], reconciliation.MATCHED)
+        self.assertEqual(reconciliation.match_row([payment], payment.amount, '1799999999')[0], reconciliation.PHONE_MISMATCH)
+        self.assertEqual(reconciliation.match_row([], payment.amount, '')[0], reconciliation.NOT_FOUND)
+        other = payment._replace(id=2, owner=11)
+        self.assertEqual(reconciliation.match_row([payment, other], payment.amount, '')[0], reconciliation.AMBIGUOUS)
+
+    def test_dry_run_reports_without_verifying(self):
+        counts, statuses = self.reconcile(dry_run=True)
+
+        self.assertEqual(statuses, [
+            ('TRXOK', reconciliation.MATCHED),
+            ('TRXAMT', reconciliation.AMOUNT_MISMATCH),
+            ('TRXNONE', reconciliation.NOT_FOUND),
+            ('TRXOK', reconciliation.DUPLICATE),
+            ('TRXFAIL', reconciliation.NOT_COMPLETED),
+            ('', reconciliation.INVALID),
+        ])
+        self.assertNotIn(None, counts)
+        self.matched.refresh_from_db()
+        self.assertFalse(self.matched.payment_verified)
+
+    def test_verifies_exact_matches_only(self):
+        counts, statuses = self.reconcile(dry_run=False)
+
+        self.assertEqual(counts[reconciliation.MATCHED], 1)
+        self.assertNotIn(('TRXOK', reconciliation.MATCHED), statuses)
+        self.matched.refresh_from_db()
+        self.mismatched.refresh_from_db()
+        self.assertTrue(self.matched.payment_verified)
+        self.assertFalse(self.mismatched.payment_verified)
+
+        counts, statuses = self.reconcile(dry_run=False)
+        self.assertIn(('TRXOK', reconciliation.ALREADY_VERIFIED), statuses)
+
+    def test_missing_header(self):
+        with self.assertRaises(reconciliation.StatementError):
+            list(reconciliation.read_statement(io.BytesIO(b"a,b\n1,2\n")))
+
+
+class MediaRootTestCase(CacheTestCase):
+    """Runs against an empty temporary MEDIA_ROOT"""
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.qr_code_root = os.path.join(self.media_root, 'qr_codes')
+        os.makedirs(self.qr_code_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, QR_CODE_ROOT=self.qr_code_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        assets._assets.clear()
+        self.addCleanup(assets._assets.clear)
+        tickets._ticket.cache_clear()
+        self.addCleanup(tickets._ticket.cache_clear)
+
+    def write_template(self, color='white'):
+        from PIL import Image
+
+        Image.new('RGB', (40, 20), color).save(assets.template_path(), 'JPEG')
+
+
+class AssetCacheTests(MediaRootTestCase):
+    def write_logo(self, size=8):
+        from PIL import Image
+
+        Image.new('RGB', (size, size), 'red').save(assets.logo_path(), 'PNG')
+        with open(assets.logo_path(), 'rb') as f:
+            return f.read()
+
+    def test_logo_is_read_once(self):
+        data = self.write_logo()
+        with mock.patch('api.assets._load_logo', wraps=assets._load_logo) as load:
+            first = assets.logo_part()
+            second = assets.logo_part()
+            self.assertEqual(assets.logo_bytes(), data)
+        self.assertEqual(load.call_count, 1)
+
+        self.assertEqual(first['Content-ID'], '<logo>')
+        # Each email gets its own part, so headers added by one never leak into the next
+        self.assertIsNot(first, second)
+        self.assertEqual(first.get_payload(), second.get_payload())
+
+    def test_changed_file_is_reloaded(self):
+        for size in (8, 64):
+            data = self.write_logo(size)
+            self.assertEqual(assets.logo_bytes(), data)
+
+    def test_missing_file(self):
+        self.write_logo()
+        assets.logo_part()
+        os.remove(assets.logo_path())
+
+        self.assertIsNone(assets.logo_part())
+        self.assertNotIn('logo', assets._assets)
+        self.assertIsNone(assets.template_digest())
+        self.assertIsNone(assets.ticket_template())
+
+    def test_ticket_template_is_copied(self):
+        self.write_template()
+        template = assets.ticket_template()
+        template.putpixel((0, 0), (0, 0, 0))
+        self.assertEqual(assets.ticket_template().getpixel((0, 0)), (255, 255, 255))
+
+    def test_template_digest_follows_file(self):
+        self.write_template('white')
+        digest = assets.template_digest()
+        self.assertEqual(digest, assets.template_digest())
+        self.write_template('black')
+        self.assertNotEqual(assets.template_digest(), digest)
+
+    def test_preload_does_not_raise(self):
+        with self.assertLogs('api.assets', level='WARNING'):
+            assets.preload()
+
+
+class PrerenderTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.verified = make_participant('verified@example.com', payment_verified=True)
+        make_participant('unverified@example.com')
+        self.team = Team.objects.create(team_name='Verified team', payment_verified=True)
+        Team.objects.create(team_name='Unverified team')
+        self.write_template()
+
+    def test_only_verified_get_tickets(self):
+        self.assertEqual(tickets.all_qr_ids(), [f"p_{self.verified.id}", f"t_{self.team.id}"])
+        self.assertEqual(tickets.all_qr_ids(participants=False), [f"t_{self.team.id}"])
+
+    def test_stored_tickets_are_skipped(self):
+        qr_ids = tickets.all_qr_ids()
+        stats = tickets.prerender(qr_ids, workers=1)
+        self.assertEqual((stats['rendered'], stats['skipped'], stats['failed']), (2, 0, []))
+        for qr_id in qr_ids:
+            self.assertTrue(tickets.is_stored(qr_id, tickets.ticket_address(tickets.qr_payload(qr_id))))
+
+        stats = tickets.prerender(qr_ids, workers=1)
+        self.assertEqual((stats['rendered'], stats['skipped']), (0, 2))
+        stats = tickets.prerender(qr_ids, workers=1, force=True)
+        self.assertEqual((stats['rendered'], stats['skipped']), (2, 0))
+
+    def test_failures_are_reported(self):
+        with mock.patch('api.tickets.render_ticket', side_effect=OSError('disk full')):
+            stats = tickets.prerender(['p_1'], workers=1)
+        self.assertEqual((stats['rendered'], stats['failed']), (0, ['p_1']))
+
+    def test_task_skips_overlapping_runs(self):
+        cache.add(tasks.PRERENDER_LOCK, 1)
+        with mock.patch('api.tickets.prerender') as prerender:
+            self.assertIsNone(tasks.prerender_tickets_task())
+        prerender.assert_not_called()
+
+    def test_task_releases_lock(self):
+        stats = tasks.prerender_tickets_task()
+        self.assertEqual(stats['rendered'], 2)
+        self.assertIsNone(cache.get(tasks.PRERENDER_LOCK))
+
+        with mock.patch('api.tickets.prerender', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                tasks.prerender_tickets_task()
+        self.assertIsNone(cache.get(tasks.PRERENDER_LOCK))
+
+
+class MailSessionTests(TestCase):
+    def setUp(self):
+        mail.close_connection()
+        self.addCleanup(mail.close_connection)
+
+    def message(self, to):
+        return EmailMessage('Subject', 'Body', 'from@example.com', [to])
+
+    def test_connection_is_reused(self):
+        with mock.patch('api.mail.get_connection', wraps=get_connection) as connect:
+            mail.send_message(self.message('a@example.com'))
+            mail.send_messages([self.message('b@example.com'), self.message('c@example.com')])
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(len(django_mail.outbox), 3)
+
+    def test_worn_session_is_replaced(self):
+        with mock.patch('api.mail.MAX_SESSION_MESSAGES', 2), \
+                mock.patch('api.mail.get_connection', wraps=get_connection) as connect:
+            mail.send_messages([self.message(f"{n}@example.com") for n in range(5)])
+        self.assertEqual(connect.call_count, 3)
+
+    def test_partial_failure(self):
+        send_one = mail._send_one
+
+        def flaky(message):
+            if message.to == ['bad@example.com']:
+                raise smtplib.SMTPRecipientsRefused({'bad@example.com': (550, b'rejected')})
+            return send_one(message)
+
+        sent = []
+        messages = [self.message('a@example.com'), self.message('bad@example.com'), self.message('c@example.com')]
+        with mock.patch.object(mail, '_send_one', side_effect=flaky):
+            outcomes = mail.send_messages(messages, on_sent=sent.append)
+
+        self.assertIsNone(outcomes[0])
+        self.assertIsInstance(outcomes[1], smtplib.SMTPRecipientsRefused)
+        self.assertIsNone(outcomes[2])
+        self.assertEqual(sent, [0, 2])
+
+    def test_dropped_connection_is_retried_once(self):
+        session = mail._session()
+        real_send = session.backend.send_messages
+        with mock.patch.object(session.backend, 'send_messages',
+                               side_effect=[smtplib.SMTPServerDisconnected('gone')]):
+            with mock.patch('api.mail._Session') as new_session:
+                new_session.return_value.backend.send_messages = real_send
+                new_session.return_value.healthy.return_value = True
+                self.assertEqual(mail.send_messages([self.message('a@example.com')]), [None])
+        self.assertEqual(new_session.call_count, 1)
+        self.assertEqual(len(django_mail.outbox), 1)
+
+    def test_task_exceptions_stop_the_batch(self):
+        messages = [self.message('a@example.com'), self.message('b@example.com')]
+        with mock.patch.object(mail, '_send_one', side_effect=SoftTimeLimitExceeded()) as send_one:
+            with self.assertRaises(SoftTimeLimitExceeded):
+                mail.send_messages(messages)
+        self.assertEqual(send_one.call_count, 1)
+
+
+class SendPreparedEmailsTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        mail.close_connection()
+        self.addCleanup(mail.close_connection)
+
+    def prepared(self, to, cache_key):
+        return tasks.PreparedEmail(EmailMessage('Subject', 'Body', 'from@example.com', [to]), cache_key, {})
+
+    def test_partial_failure(self):
+        send_one = mail._send_one
+
+        def flaky(message):
+            if message.to == ['bad@example.com']:
+                raise RuntimeError('rejected')
+            return send_one(message)
+
+        batch = [
+            self.prepared('a@example.com', 'key_a'),
+            self.prepared('bad@example.com', 'key_bad'),
+            tasks.PreparedEmail(None, None, {'duplicate': True}),
+            self.prepared('c@example.com', 'key_c'),
+        ]
+        with mock.patch.object(mail, '_send_one', side_effect=flaky):
+            outcomes = tasks.send_prepared_emails(batch)
+
+        self.assertIsNone(outcomes[0])
+        self.assertIsInstance(outcomes[1], RuntimeError)
+        self.assertIsNone(outcomes[2])
+        self.assertIsNone(outcomes[3])
+        self.assertEqual(sorted(m.to[0] for m in django_mail.outbox), ['a@example.com', 'c@example.com'])
+        self.assertEqual([cache.get(k) for k in ('key_a', 'key_bad', 'key_c')], [True, None, True])
+
+    def test_keys_set_as_each_message_goes_out(self):
+        send_one = mail._send_one
+
+        def crash_on_second(message):
+            if message.to == ['b@example.com']:
+                raise SystemExit('worker killed')
+            return send_one(message)
+
+        batch = [self.prepared('a@example.com', 'key_a'), self.prepared('b@example.com', 'key_b')]
+        with mock.patch.object(mail, '_send_one', side_effect=crash_on_second):
+            with self.assertRaises(SystemExit):
+                tasks.send_prepared_emails(batch)
+
+        self.assertTrue(cache.get('key_a'))
+        self.assertIsNone(cache.get('key_b'))
+
+    def test_duplicates_in_a_batch_are_sent_once(self):
+        batch = [self.prepared('a@example.com', 'key_a'), self.prepared('a@example.com', 'key_a')]
+        self.assertEqual(tasks.send_prepared_emails(batch), [None, None])
+        self.assertEqual(len(django_mail.outbox), 1)
+
+
+class TicketStoreTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write_template()
+
+    def test_payload_is_stable_within_a_window(self):
+        window = settings.QR_TOKEN_LIFETIME.total_seconds() / 2
+        start = (time.time() // window) * window
+        with mock.patch('api.tickets.time.time', return_value=start + 1):
+            payload = tickets.qr_payload('p_42')
+        with mock.patch('api.tickets.time.time', return_value=start + window - 1):
+            self.assertEqual(tickets.qr_payload('p_42'), payload)
+        with mock.patch('api.tickets.time.time', return_value=start + window + 1):
+            self.assertNotEqual(tickets.qr_payload('p_42'), payload)
+        self.assertEqual(parse_qr_id(payload), ('participant', 42))
+
+    def test_address_follows_payload_and_template(self):
+        address = tickets.ticket_address('payload')
+        self.assertEqual(tickets.ticket_address('payload'), address)
+        self.assertNotEqual(tickets.ticket_address('other'), address)
+        self.write_template('black')
+        self.assertNotEqual(tickets.ticket_address('payload'), address)
+
+    def test_paths_are_not_guessable(self):
+        address = tickets.ticket_address(tickets.qr_payload('p_42'))
+        self.assertEqual(
+            tickets.qr_path('p_42', address),
+            os.path.join(self.qr_code_root, 'p_42', f"{address}_qr.png")
+        )
+        self.assertEqual(os.path.basename(tickets.ticket_path('p_42', address)), f"{address}_ticket.jpg")
+
+    def test_ticket_is_rendered_once(self):
+        with mock.patch('api.tickets.render_ticket', wraps=tickets.render_ticket) as render:
+            qr_png, ticket_jpg = tickets.get_ticket('p_42')
+            self.assertEqual(tickets.get_ticket('p_42'), (qr_png, ticket_jpg))
+            # A new process reads the store instead of rendering
+            tickets._ticket.cache_clear()
+            self.assertEqual(tickets.get_ticket('p_42'), (qr_png, ticket_jpg))
+        self.assertEqual(render.call_count, 1)
+
+        self.assertTrue(qr_png.startswith(b'\x89PNG'))
+        self.assertTrue(ticket_jpg.startswith(b'\xff\xd8'))
+        address = tickets.ticket_address(tickets.qr_payload('p_42'))
+        self.assertTrue(tickets.is_stored('p_42', address))
+
+    def test_no_template_stores_qr_only(self):
+        os.remove(assets.template_path())
+        qr_png, ticket_jpg = tickets.get_ticket('p_42')
+        self.assertIsNone(ticket_jpg)
+        address = tickets.ticket_address(tickets.qr_payload('p_42'))
+        self.assertTrue(tickets.is_stored('p_42', address))
+        self.assertFalse(os.path.exists(tickets.ticket_path('p_42', address)))
+
+    def test_old_files_are_pruned(self):
+        os.makedirs(tickets.ticket_dir('p_42'))
+        stale = [
+            os.path.join(self.qr_code_root, 'p_42_qr.png'),
+            os.path.join(self.qr_code_root, 'p_42_ticket.jpg'),
+            tickets.qr_path('p_42', 'oldaddress'),
+            tickets.ticket_path('p_42', 'oldaddress'),
+        ]
+        in_progress = tickets.qr_path('p_42', 'other') + '.123.tmp'
+        for path in stale + [in_progress]:
+            with open(path, 'wb') as f:
+                f.write(b'old')
+
+        tickets.get_ticket('p_42')
+        address = tickets.ticket_address(tickets.qr_payload('p_42'))
+        self.assertEqual(
+            sorted(os.listdir(tickets.ticket_dir('p_42'))),
+            sorted([f"{address}_qr.png", f"{address}_ticket.jpg", os.path.basename(in_progress)])
+        )
+        self.assertFalse(any(os.path.exists(path) for path in stale))
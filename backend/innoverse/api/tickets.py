@@ -0,0 +1,242 @@
+"""
+QR codes and ticket images.
+
+Rendering (QR generation, resize, paste and JPEG encode) is CPU work that
+does not belong in the I/O-bound email workers. Each QR and ticket is
+encoded once and stored under a content address: a hash of the signed
+payload, the ticket template and the render settings. A file is only
+written when its address is absent, and repeat calls in a process are
+served from memory, so retries and resends do no image work.
+
+The payload expiry is aligned to half-lifetime windows, so a participant
+gets the same payload (and address) until the window turns over, and the
+code in any stored ticket is valid for at least half QR_TOKEN_LIFETIME.
+prerender() fills the store ahead of time across a process pool.
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from io import BytesIO
+from django.conf import settings
+from . import assets
+from .qr_tokens import sign_qr_id
+
+logger = logging.getLogger(__name__)
+
+
+QR_SIZE = 300  # px, as pasted onto the ticket
+JPEG_QUALITY = 95
+RENDER_VERSION = '1'  # bump when rendering changes so stored files are not reused
+CHUNK_SIZE = 50  # qr_ids per pool job
+PRERENDER_LOCK_TTL = 30 * 60  # as CELERY_TASK_TIME_LIMIT, so a killed run frees the lock
+CACHE_SIZE = 64  # tickets kept in memory per process
+
+
+def qr_payload(qr_id):
+    """Signed payload for qr_id, the same for every call in the current window"""
+    window = settings.QR_TOKEN_LIFETIME.total_seconds() / 2
+    return sign_qr_id(qr_id, expires=(time.time() // window + 2) * window)
+
+
+def ticket_address(payload):
+    """Content address of the QR / ticket for a payload with the current template"""
+    digest = hashlib.sha256()
+    for part in (RENDER_VERSION, payload, assets.template_digest() or '-', QR_SIZE, JPEG_QUALITY):
+        digest.update(f"{part}\0".encode())
+    return digest.hexdigest()[:32]
+
+
+def ticket_dir(qr_id):
+    return os.path.join(settings.QR_CODE_ROOT, qr_id)
+
+
+def qr_path(qr_id, address):
+    return os.path.join(ticket_dir(qr_id), f"{address}_qr.png")
+
+
+def ticket_path(qr_id, address):
+    return os.path.join(ticket_dir(qr_id), f"{address}_ticket.jpg")
+
+
+def render_ticket(payload):
+    """(qr_png, ticket_jpg) bytes; ticket_jpg is None without a ticket template"""
+    import qrcode
+    from PIL import Image
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_H,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    qr_img = qr.make_image(fill_color="black", back_color="white")
+
+    qr_buffer = BytesIO()
+    qr_img.save(qr_buffer, format='PNG')
+
+    template = assets.ticket_template()
+    if template is None:
+        return qr_buffer.getvalue(), None
+
+    # Centred on the template
+    qr_resized = qr_img.resize((QR_SIZE, QR_SIZE), Image.Resampling.LANCZOS)
+    template_width, template_height = template.size
+    template.paste(qr_resized, ((template_width - QR_SIZE) // 2, (template_height - QR_SIZE) // 2))
+
+    ticket_buffer = BytesIO()
+    template.save(ticket_buffer, format='JPEG', quality=JPEG_QUALITY)
+    return qr_buffer.getvalue(), ticket_buffer.getvalue()
+
+
+def _write(path, data):
+    # Readers never see a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _prune(qr_id, address):
+    # Files from earlier windows / templates are never addressed again, and
+    # the old guessable <qr_id>_qr.png / _ticket.jpg paths must not stay public
+    for legacy in (f"{qr_id}_qr.png", f"{qr_id}_ticket.jpg"):
+        try:
+            os.remove(os.path.join(settings.QR_CODE_ROOT, legacy))
+        except FileNotFoundError:
+            pass
+    for entry in os.scandir(ticket_dir(qr_id)):
+        if not entry.name.startswith(address) and not entry.name.endswith('.tmp'):
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def save_ticket(qr_id, address, qr_png, ticket_jpg):
+    os.makedirs(ticket_dir(qr_id), exist_ok=True)
+    if ticket_jpg is not None:
+        _write(ticket_path(qr_id, address), ticket_jpg)
+    # Written last: its presence means the whole entry is stored
+    _write(qr_path(qr_id, address), qr_png)
+    _prune(qr_id, address)
+
+
+def is_stored(qr_id, address):
+    return os.path.exists(qr_path(qr_id, address))
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _ticket(qr_id, address, payload):
+    if is_stored(qr_id, address):
+        logger.info(f"Using stored ticket for {qr_id}")
+        stored_ticket = ticket_path(qr_id, address)
+        return _read(qr_path(qr_id, address)), (_read(stored_ticket) if os.path.exists(stored_ticket) else None)
+
+    logger.info(f"Rendering ticket for {qr_id}")
+    qr_png, ticket_jpg = render_ticket(payload)
+    save_ticket(qr_id, address, qr_png, ticket_jpg)
+    return qr_png, ticket_jpg
+
+
+def get_ticket(qr_id):
+    """(qr_png, ticket_jpg) for an email: from memory, then the store, rendering only if absent"""
+    payload = qr_payload(qr_id)
+    return _ticket(qr_id, ticket_address(payload), payload)
+
+
+def _render_chunk(qr_ids, force):
+    # Runs in a pool process: (rendered, skipped, failed ids)
+    rendered, skipped, failed = 0, 0, []
+    for qr_id in qr_ids:
+        try:
+            payload = qr_payload(qr_id)
+            address = ticket_address(payload)
+            if not force and is_stored(qr_id, address):
+                skipped += 1
+                continue
+            save_ticket(qr_id, address, *render_ticket(payload))
+            rendered += 1
+        except Exception as e:
+            logger.error(f"Failed to render ticket {qr_id}: {str(e)}")
+            failed.append(qr_id)
+    return rendered, skipped, failed
+
+
+def _init_worker():
+    import django
+    django.setup()
+    assets.preload()
+
+
+def default_workers():
+    # Celery prefork children are daemonic and may not start processes of their own
+    if multiprocessing.current_process().daemon:
+        return 1
+    return os.cpu_count() or 1
+
+
+def prerender(qr_ids, workers=None, force=False, chunk_size=CHUNK_SIZE):
+    """
+    Render and save tickets for these qr_ids ("p_<id>" / "t_<id>").
+
+    Tickets already stored are skipped unless force is set. Returns
+    counts, the failed ids and throughput in tickets per second.
+    """
+    qr_ids = list(qr_ids)
+    workers = workers or default_workers()
+    chunks = [qr_ids[i:i + chunk_size] for i in range(0, len(qr_ids), chunk_size)]
+    rendered, skipped, failed = 0, 0, []
+
+    started = time.perf_counter()
+    if workers == 1 or len(chunks) <= 1:
+        assets.preload()
+        for chunk in chunks:
+            r, s, f = _render_chunk(chunk, force)
+            rendered, skipped = rendered + r, skipped + s
+            failed.extend(f)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for future in as_completed([pool.submit(_render_chunk, chunk, force) for chunk in chunks]):
+                r, s, f = future.result()
+                rendered, skipped = rendered + r, skipped + s
+                failed.extend(f)
+    elapsed = time.perf_counter() - started
+
+    stats = {
+        'total': len(qr_ids),
+        'rendered': rendered,
+        'skipped': skipped,
+        'failed': failed,
+        'workers': workers,
+        'seconds': round(elapsed, 2),
+        'tickets_per_sec': round(rendered / elapsed, 1) if elapsed and rendered else 0.0,
+    }
+    logger.info(
+        f"Pre-rendered {rendered} ticket(s) ({skipped} stored, {len(failed)} failed) "
+        f"in {elapsed:.1f}s with {workers} worker(s)"
+    )
+    return stats
+
+
+def all_qr_ids(participants=True, teams=True):
+    """qr_ids of everyone who is sent a ticket - verified participants and teams"""
+    from participant.models import Participant, Team
+
+    qr_ids = []
+    for enabled, prefix, model in ((participants, 'p', Participant), (teams, 't', Team)):
+        if enabled:
+            ids = model.objects.filter(payment_verified=True).order_by('id').values_list('id', flat=True)
+            qr_ids += [f"{prefix}_{pk}" for pk in ids.iterator()]
+    return qr_ids
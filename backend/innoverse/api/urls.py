@@ -28,6 +28,8 @@ urlpatterns = [
 
 
      path('payment/verify/', views.PaymentVerificationViewSet.as_view({'post': 'create'}), name='payment-verify'),
+     path('payment/verify/bulk/', views.PaymentVerificationViewSet.as_view({'post': 'bulk'}), name='payment-verify-bulk'),
+     path('payment/reconcile/', views.PaymentVerificationViewSet.as_view({'post': 'reconcile'}), name='payment-reconcile'),
 
      
 
@@ -52,6 +54,22 @@ urlpatterns = [
          }), 
          name="gifts-operations"),
     
+    path('session/', 
+         views.SessionViewSet.as_view({'get': 'list'}), 
+         name="session"),
+    
+    path('stats/', 
+         views.StatsViewSet.as_view({'get': 'list'}), 
+         name="stats"),
+    
+    path('search/', 
+         views.SearchViewSet.as_view({'get': 'list'}), 
+         name="search"),
+    
+    path('export/<slug:dataset>.<slug:file_type>', 
+         views.ExportViewSet.as_view({'get': 'list'}), 
+         name="export"),
+    
     path('info/<str:id>/', 
          views.ParticipantTeamInfoViewSet.as_view({'get': 'list'}), 
          name="user-info"),
@@ -59,4 +77,16 @@ urlpatterns = [
     path('check/<str:page>/<str:event>/<str:id>/', 
          views.CheckViewSet.as_view({'get': 'list'}), 
          name="check-allowance"),
+    
+    path('scan/sync/', 
+         views.ScanSyncViewSet.as_view({'post': 'create'}), 
+         name="scan-sync"),
+    
+    path('scan/<str:id>/', 
+         views.ScanViewSet.as_view({'get': 'list'}), 
+         name="scan"),
+    
+    path('scan/<str:page>/<str:event>/<str:id>/', 
+         views.ScanViewSet.as_view({'get': 'list'}), 
+         name="scan-allowance"),
 ]
\ No newline at end of file
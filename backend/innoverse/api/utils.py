@@ -1,81 +1,25 @@
-import qrcode
-import os
-from io import BytesIO
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.conf import settings
 from email.mime.image import MIMEImage
 import logging
+from . import assets, tickets
 
 logger = logging.getLogger(__name__)
 
 
 def attach_logo(email):
-    logo_path = os.path.join(settings.MEDIA_ROOT, 'logo.png')
+    logo_image = assets.logo_part()
     
-    if os.path.exists(logo_path):
-        with open(logo_path, 'rb') as f:
-            logo_image = MIMEImage(f.read())
-            logo_image.add_header('Content-ID', '<logo>')
-            logo_image.add_header('Content-Disposition', 'inline', filename='logo.png')
-            email.attach(logo_image)
-            logger.info("Logo attached to email")
+    if logo_image is not None:
+        email.attach(logo_image)
+        logger.info("Logo attached to email")
     else:
-        logger.warning(f"Logo not found at {logo_path}")
+        logger.warning(f"Logo not found at {assets.logo_path()}")
     
     return email
 
 
-def generate_qr_code(data, save_filename=None):
-    """
-    Generate QR code and return as BytesIO buffer
-    
-    Args:
-        data: Data to encode in QR code
-        save_filename: Optional filename to save QR code to disk (e.g., "p_123_qr")
-    
-    Returns:
-        BytesIO: Buffer containing QR code image
-    """
-    try:
-        logger.info(f"Generating QR code for: {data}")
-        
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Save to buffer (always)
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')  # Changed to PNG for better quality
-        buffer.seek(0)
-        
-        # Optionally save to disk
-        if save_filename:
-            qr_dir = settings.QR_CODE_ROOT
-            os.makedirs(qr_dir, exist_ok=True)
-            
-            filepath = os.path.join(qr_dir, f"{save_filename}.png")
-            
-            with open(filepath, 'wb') as f:
-                img.save(f, format='PNG')
-            
-            logger.info(f"QR code saved to {filepath}")
-        
-        logger.info(f"QR code generated successfully, buffer size: {buffer.getbuffer().nbytes} bytes")
-        return buffer
-        
-    except Exception as e:
-        logger.error(f"Failed to generate QR code: {str(e)}", exc_info=True)
-        return None
-
-
 def send_payment_verification_email(participant, team=None):
     """
     SYNCHRONOUS version - for direct calling
@@ -116,13 +60,8 @@ def send_payment_verification_email(participant, team=None):
         
         # Generate QR code
         logger.info(f"Generating QR code for {qr_id}")
-        qr_buffer = generate_qr_code(qr_id, qr_id)
-        
-        if not qr_buffer:
-            logger.error("QR code generation failed!")
-            return False
-        
-        logger.info(f"QR buffer size: {qr_buffer.getbuffer().nbytes} bytes")
+        qr_data, _ticket = tickets.get_ticket(qr_id)
+        logger.info(f"QR code size: {len(qr_data)} bytes")
         
         # Render HTML template
         html_content = render_to_string('email_template.html', context)
@@ -144,9 +83,6 @@ def send_payment_verification_email(participant, team=None):
         email = attach_logo(email)
         
         # Attach QR code as inline image
-        qr_buffer.seek(0)  # CRITICAL: Reset buffer position
-        qr_data = qr_buffer.read()
-        
         qr_image = MIMEImage(qr_data)
         qr_image.add_header('Content-ID', '<qr_code>')
         qr_image.add_header('Content-Disposition', 'inline', filename=f'{qr_id}_qr.png')
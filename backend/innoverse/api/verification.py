@@ -0,0 +1,221 @@
+"""
+Bulk payment verification.
+
+Verifies (never un-verifies) a list of participants in one transaction
+with a fixed number of queries however long the list is, and queues the
+confirmation emails as a few batch tasks instead of one task per email.
+Teams are resolved as in PaymentVerificationViewSet: a participant with
+their own payment also verifies the team they lead, one without pays
+through their team.
+"""
+
+import logging
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Q
+from participant.models import (
+    Participant, Team, TeamParticipant, Payment,
+    Registration, CompetitionRegistration, TeamCompetitionRegistration
+)
+from .outbox import enqueue_email
+from .entitlements import invalidate_entitlements
+from .stats import invalidate_stats
+from .versions import bump_version
+from . import summaries
+from .tasks import send_payment_verification_batch_task
+
+logger = logging.getLogger(__name__)
+
+
+MAX_IDS = 5000
+EMAIL_BATCH_SIZE = 25
+
+
+def _parse_id(value):
+    try:
+        participant_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return participant_id if participant_id > 0 else None
+
+
+def _resolve_teams(participant_ids):
+    # {participant_id: (team_id, is_leader)} for leaders, else the first team joined
+    memberships = defaultdict(list)
+    for participant_id, team_id, is_leader in (
+        TeamParticipant.objects.filter(participant_id__in=participant_ids)
+        .order_by('id').values_list('participant_id', 'team_id', 'is_leader')
+    ):
+        memberships[participant_id].append((team_id, is_leader))
+    return memberships
+
+
+def bulk_verify(ids):
+    """
+    Mark these participants (and their teams) as payment verified.
+
+    Returns (results, emails_queued). results has one entry per id, in
+    request order, with status 'verified', 'already_verified',
+    'no_payment', 'not_found' or 'invalid'.
+    """
+    parsed = [_parse_id(value) for value in ids]
+    wanted = {pid for pid in parsed if pid}
+    results = []
+
+    with transaction.atomic():
+        participants = {
+            p.id: p for p in
+            Participant.objects.select_for_update()
+            .filter(id__in=wanted)
+            .only('id', 'f_name', 'l_name', 'email', 'payment_verified')
+        }
+        memberships = _resolve_teams(participants)
+        member_team_ids = {team_id for teams in memberships.values() for team_id, _ in teams}
+
+        paid_participants, paid_teams = set(), set()
+        for participant_id, team_id in Payment.objects.filter(
+            Q(participant_id__in=participants) | Q(team_id__in=member_team_ids)
+        ).values_list('participant_id', 'team_id'):
+            if participant_id:
+                paid_participants.add(participant_id)
+            if team_id:
+                paid_teams.add(team_id)
+
+        teams = {
+            t.id: t for t in
+            Team.objects.select_for_update()
+            .filter(id__in=member_team_ids)
+            .only('id', 'team_name', 'payment_verified')
+        }
+
+        changed_participants, changed_teams = {}, {}
+        email_participants = {}  # participant_id -> is_team_leader
+        email_teams = set()
+
+        for value, participant_id in zip(ids, parsed):
+            if participant_id is None:
+                results.append({'id': value, 'status': 'invalid'})
+                continue
+
+            participant = participants.get(participant_id)
+            if participant is None:
+                results.append({'id': participant_id, 'status': 'not_found'})
+                continue
+
+            team, is_team_leader = None, False
+            if participant_id in paid_participants:
+                led = [team_id for team_id, leader in memberships[participant_id] if leader]
+                if led:
+                    team, is_team_leader = teams[led[0]], True
+            elif memberships[participant_id]:
+                team_id, is_team_leader = memberships[participant_id][0]
+                team = teams[team_id]
+                if team_id not in paid_teams:
+                    team = None
+
+            if participant_id not in paid_participants and team is None:
+                results.append({'id': participant_id, 'status': 'no_payment'})
+                continue
+
+            result = {'id': participant_id, 'team_id': team.id if team else None}
+            if participant.payment_verified and (team is None or team.payment_verified):
+                results.append({**result, 'status': 'already_verified'})
+                continue
+
+            if not participant.payment_verified:
+                participant.payment_verified = True
+                changed_participants[participant_id] = participant
+                email_participants[participant_id] = is_team_leader
+            if team is not None:
+                if not team.payment_verified:
+                    team.payment_verified = True
+                    changed_teams[team.id] = team
+                email_teams.add(team.id)
+            results.append({**result, 'status': 'verified'})
+
+        # Every row gets the same value, so a plain UPDATE beats bulk_update's CASE per row
+        if changed_participants:
+            Participant.objects.filter(id__in=list(changed_participants)).update(payment_verified=True)
+            summaries.verification_changed('participant', list(changed_participants), True)
+        if changed_teams:
+            Team.objects.filter(id__in=list(changed_teams)).update(payment_verified=True)
+            summaries.verification_changed('team', list(changed_teams), True)
+
+        if changed_participants or changed_teams:
+            # update() does not send model signals
+            invalidate_entitlements(participant_ids=changed_participants, team_ids=changed_teams)
+            invalidate_stats('payments')
+            transaction.on_commit(lambda: bump_version('participants', 'teams'))
+
+        emails_queued = _queue_emails(participants, email_participants, teams, email_teams)
+
+    logger.info(
+        f"Bulk verification: {len(changed_participants)} participants and {len(changed_teams)} teams "
+        f"verified, {emails_queued} email batch(es) queued for {len(ids)} ids"
+    )
+    return results, emails_queued
+
+
+def _queue_emails(participants, email_participants, teams, email_teams):
+    """Outbox rows for the confirmation emails, EMAIL_BATCH_SIZE emails per task"""
+    segments, competitions = defaultdict(list), defaultdict(list)
+    for participant_id, name in (
+        Registration.objects.filter(participant_id__in=email_participants)
+        .order_by('id').values_list('participant_id', 'segment__segment_name')
+    ):
+        segments[participant_id].append(name)
+    for participant_id, name in (
+        CompetitionRegistration.objects.filter(participant_id__in=email_participants)
+        .order_by('id').values_list('participant_id', 'competition__competition')
+    ):
+        competitions[participant_id].append(name)
+
+    jobs = []
+    for participant_id, is_team_leader in email_participants.items():
+        participant = participants[participant_id]
+        # Solo email only for solo registrations, or so a leader gets their personal QR
+        if segments[participant_id] or competitions[participant_id] or is_team_leader:
+            jobs.append(('participant', [{
+                'id': participant_id,
+                'name': f'{participant.f_name} {participant.l_name}',
+                'email': participant.email,
+                'segments': segments[participant_id],
+                'competitions': competitions[participant_id],
+            }, is_team_leader]))
+
+    if email_teams:
+        members, team_competitions = defaultdict(list), defaultdict(list)
+        for m in (
+            TeamParticipant.objects.filter(team_id__in=email_teams)
+            .order_by('id').values('team_id', 'id', 'f_name', 'l_name', 'email', 'is_leader')
+        ):
+            if m['email']:
+                members[m['team_id']].append({
+                    'id': m['id'],
+                    'name': f"{m['f_name']} {m['l_name']}",
+                    'email': m['email'],
+                    'is_leader': m['is_leader'],
+                })
+        for team_id, name in (
+            TeamCompetitionRegistration.objects.filter(team_id__in=email_teams)
+            .order_by('id').values_list('team_id', 'competition__competition')
+        ):
+            team_competitions[team_id].append(name)
+
+        for team_id in sorted(email_teams):
+            jobs.append(('team', [{
+                'id': team_id,
+                'name': teams[team_id].team_name,
+                'competitions': team_competitions[team_id],
+            }, members[team_id]]))
+
+    batches = 0
+    for start in range(0, len(jobs), EMAIL_BATCH_SIZE):
+        batch = jobs[start:start + EMAIL_BATCH_SIZE]
+        enqueue_email(
+            send_payment_verification_batch_task,
+            [args for kind, args in batch if kind == 'participant'],
+            [args for kind, args in batch if kind == 'team'],
+        )
+        batches += 1
+    return batches
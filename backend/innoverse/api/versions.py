@@ -0,0 +1,41 @@
+import time
+from django.core.cache import cache
+
+
+def _key(name):
+    return f"version_{name}"
+
+
+def _seed():
+    # Seeded from the clock so a flushed cache never reuses an old version
+    return int(time.time() * 1000)
+
+
+def get_version(name):
+    """Current version counter for a resource (e.g. 'catalog')"""
+    key = _key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _seed(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(*names):
+    """Version counters for several resources in one cache round trip"""
+    keys = [_key(name) for name in names]
+    found = cache.get_many(keys)
+    return [
+        found[key] if key in found else get_version(name)
+        for key, name in zip(keys, names)
+    ]
+
+
+def bump_version(*names):
+    """Invalidate everything derived from these resources"""
+    for name in names:
+        key = _key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _seed(), timeout=None)
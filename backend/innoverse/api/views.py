@@ -1,10 +1,11 @@
 import logging
 from django.db import transaction
-from django.db.models import Q
+from django.db.models.functions import Lower
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import NotFound
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from event.serializers import CouponSerializer
@@ -22,10 +23,27 @@ from .serializers import (
 )
 from event.models import Coupons, Segment, Competition, TeamCompetition
 from event.serializers import SegmentSerializer, CompetitionSerializer, TeamCompetitionSerializer
-from api.models import Volunteer
 from participant.models import Registration, CompetitionRegistration, TanvinAward, TeamCompetitionRegistration, Payment, TeamParticipant
 from participant.serializers import ParticipantSerializer, TeamSerializer
 from api.serializers import TanvinAwardListSerializer, TanvinAwardDetailSerializer
+from .coupons import CouponSoldOut, reserve_coupon, release_coupon, redeem_coupon
+from .outbox import enqueue_email
+from .idempotency import idempotent
+from .catalog import catalog
+from .entitlements import get_entitlements, invalidate_entitlements, participant_info, team_info
+from .scan_sync import sync_scan_events, MAX_EVENTS
+from .qr_tokens import parse_qr_id
+from .claims import get_volunteer_claims
+from .pagination import IdCursorPagination
+from .conditional import ConditionalGetMixin
+from .versions import bump_version
+from .stats import STATS_TTL, STATS_VERSIONS, get_stats, invalidate_stats
+from .summaries import registrations_added, summary_counts, verification_changed
+from .search import search as search_entities
+from .filters import filter_participants, filter_teams
+from .exports import EXPORTS, FILE_TYPES, ExportUnavailable, export_response
+from .verification import MAX_IDS, bulk_verify
+from .reconciliation import StatementError, reconcile
 from .tasks import (
     send_registration_email_task,
     send_payment_verification_email_task,
@@ -43,11 +61,8 @@ class IsAdminVolunteer(IsAuthenticated):
         if not super().has_permission(request, view):
             return False
         
-        try:
-            volunteer = Volunteer.objects.get(user=request.user)
-            return volunteer.role.role_name.lower() == 'admin'
-        except Volunteer.DoesNotExist:
-            return False
+        claims = get_volunteer_claims(request)
+        return bool(claims and claims['role']) and claims['role'].lower() == 'admin'
 
 
 
@@ -64,47 +79,21 @@ def get_entity_info(participant=None, team=None):
     info = {}
     
     if participant:
-        info['participant'] = {
-            'id': participant.id,
-            'name': f"{participant.f_name} {participant.l_name}",
-            'email': participant.email,
-            'phone': participant.phone,
-            'institution': participant.institution,
-            'guardian_phone': participant.guardian_phone,
-            'grade': participant.grade,
-            'payment_verified': participant.payment_verified
-        }
+        info['participant'] = participant_info(participant)
         
         # Auto-detect team if not provided
         if not team:
-            team = Team.objects.filter(members__email=participant.email).first()
+            team = Team.objects.filter(members__participant=participant).first()
     
     if team:
-        info['team'] = {
-            'id': team.id,
-            'name': team.team_name,
-            'member_count': team.members.count(),
-            'payment_verified': team.payment_verified,
-            'members': [
-                {
-                    'name': f"{member.f_name} {member.l_name}",
-                    'email': member.email,
-                    'is_leader': member.is_leader
-                }
-                for member in team.members.all()
-            ]
-        }
+        info['team'] = team_info(team, list(team.members.all()))
     
     return info
 
 
 def parse_id_parameter(id_param):
-    if id_param.startswith("p_"):
-        return 'participant', id_param.split("_")[1]
-    elif id_param.startswith("t_"):
-        return 'team', id_param.split("_")[1]
-    else:
-        raise ValueError("Invalid ID format. Use 'p_' for participant or 't_' for team")
+    # Verified in memory - forged or malformed codes never reach the DB
+    return parse_qr_id(id_param)
 
 
 def get_entity_by_id(id_param):
@@ -112,7 +101,7 @@ def get_entity_by_id(id_param):
     
     if entity_type == 'participant':
         participant = Participant.objects.get(id=entity_id)
-        team = Team.objects.filter(members__email=participant.email).first()
+        team = Team.objects.filter(members__participant=participant).first()
         return participant, team
     else:
         team = Team.objects.get(id=entity_id)
@@ -133,6 +122,7 @@ class RegisterViewSet(viewsets.ViewSet):
             "endpoint": "/api/register/"
         }, status=status.HTTP_200_OK)
     
+    @idempotent
     def create(self, request):
         serializer = CompleteRegistrationSerializer(data=request.data)
         
@@ -143,11 +133,19 @@ class RegisterViewSet(viewsets.ViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         validated_data = serializer.validated_data
+        coupon = validated_data.get('coupon')
+        
+        # Reject sold-out coupons in Redis before opening a transaction
+        try:
+            coupon_reserved = reserve_coupon(coupon) if coupon else False
+        except CouponSoldOut as e:
+            return Response({
+                "success": False,
+                "errors": {"coupon": [str(e)]}
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
             with transaction.atomic():
-                coupon = validated_data.get('coupon')
-                
                 # Prefetch all required objects in one go
                 segments_dict, competitions_dict, team_competitions_dict = self._prefetch_competition_data(
                     validated_data
@@ -155,6 +153,7 @@ class RegisterViewSet(viewsets.ViewSet):
                 
                 # Create main participant
                 participant = self._create_participant(validated_data['participant'])
+                self._link_team_memberships(participant)
                 
                 # Record payment
                 participant_payment = self._create_payment(
@@ -183,7 +182,14 @@ class RegisterViewSet(viewsets.ViewSet):
                         team_competitions_dict
                     )
 
-                # Update coupon usage count
+                # Drop cached entitlements touched by this registration (bulk_create sends no signals)
+                self._invalidate_entitlements(participant, team, team_members_list)
+                invalidate_stats('registrations', 'people')
+
+                # Shared counter rows are the hottest locks - write them last
+                self._update_summaries(validated_data, segments_dict, competitions_dict, team_competitions_dict)
+                
+                # Update coupon usage count - last write, keeps the row lock short
                 self._update_coupon(coupon)
 
                 # Build response data
@@ -192,7 +198,7 @@ class RegisterViewSet(viewsets.ViewSet):
                     validated_data, coupon
                 )
                 
-                # Queue emails asynchronously (non-blocking)
+                # Write email to the outbox - published after commit
                 self._queue_confirmation_emails(
                     participant, participant_payment, 
                     team, team_members_list, team_competitions_list, team_payment,
@@ -203,8 +209,18 @@ class RegisterViewSet(viewsets.ViewSet):
                 response_data["message"] += " Confirmation email will be sent shortly."
 
                 return Response(response_data, status=status.HTTP_201_CREATED)
+        
+        except CouponSoldOut as e:
+            if coupon_reserved and not e.settled:
+                release_coupon(coupon)
+            return Response({
+                "success": False,
+                "errors": {"coupon": [str(e)]}
+            }, status=status.HTTP_400_BAD_REQUEST)
                 
         except Exception as e:
+            if coupon_reserved:
+                release_coupon(coupon)
             logger.error(f"Registration failed: {str(e)}", exc_info=True)
             return Response({
                 "success": False,
@@ -217,8 +233,8 @@ class RegisterViewSet(viewsets.ViewSet):
     
     def _prefetch_competition_data(self, validated_data):
         """
-        Prefetch all segments, competitions, and team competitions in bulk
-        to avoid multiple database queries
+        Resolve segments, competitions and team competitions from the
+        catalog cache - no database queries in steady state
         """
         segment_codes = validated_data.get('segment', [])
         competition_codes = validated_data.get('competition', [])
@@ -227,22 +243,23 @@ class RegisterViewSet(viewsets.ViewSet):
         if 'team_competition' in validated_data:
             team_competition_codes = validated_data['team_competition'].get('competition', [])
         
-        # Fetch all at once
-        segments_dict = {}
-        competitions_dict = {}
-        team_competitions_dict = {}
+        current = catalog.get()
         
-        if segment_codes:
-            segments_dict = {seg.code: seg for seg in Segment.objects.filter(code__in=segment_codes)}
-        
-        if competition_codes:
-            competitions_dict = {comp.code: comp for comp in Competition.objects.filter(code__in=competition_codes)}
-        
-        if team_competition_codes:
-            team_competitions_dict = {comp.code: comp for comp in TeamCompetition.objects.filter(code__in=team_competition_codes)}
+        segments_dict = {code: current.segments[code] for code in segment_codes}
+        competitions_dict = {code: current.competitions[code] for code in competition_codes}
+        team_competitions_dict = {code: current.team_competitions[code] for code in team_competition_codes}
         
         return segments_dict, competitions_dict, team_competitions_dict
     
+    def _update_summaries(self, validated_data, segments_dict, competitions_dict, team_competitions_dict):
+        """EventSummary deltas for the bulk-created registrations (bulk_create sends no signals)"""
+        registrations_added('segment', [segments_dict[code].id for code in validated_data.get('segment', [])])
+        registrations_added('competition', [competitions_dict[code].id for code in validated_data.get('competition', [])])
+        if 'team_competition' in validated_data:
+            registrations_added('team_competition', [
+                team_competitions_dict[code].id for code in validated_data['team_competition']['competition']
+            ])
+    
     def _create_participant(self, participant_data):
         f_name, l_name = parse_full_name(participant_data['full_name'])
         
@@ -260,6 +277,22 @@ class RegisterViewSet(viewsets.ViewSet):
             payment_verified=False
         )
     
+    def _link_team_memberships(self, participant):
+        """Attach team member rows registered earlier under this email"""
+        members = TeamParticipant.objects.filter(
+            email__iexact=participant.email,
+            participant__isnull=True
+        )
+        team_ids = list(members.values_list('team_id', flat=True))
+        if not team_ids:
+            return
+        
+        members.update(participant=participant)
+        
+        # update() sends no signals - drop the cached team records it changed
+        invalidate_entitlements(participant_ids=[participant.id], team_ids=team_ids)
+        transaction.on_commit(lambda: bump_version('teams'))
+    
     def _create_payment(self, payment_data, participant=None, team=None, coupon=None):
         
         return Payment.objects.create(
@@ -321,10 +354,23 @@ class RegisterViewSet(viewsets.ViewSet):
             address=leader_participant.address,
             t_shirt_size=leader_participant.t_shirt_size,
             team=team,
+            participant=leader_participant,
             is_leader=True
         )
         team_members.append(leader)
         
+        # Link members who are already registered participants (one query)
+        # Case-insensitive, as in the backfill migration (participant 0012)
+        member_emails = {m['email'].lower() for m in team_info['participant'] if m.get('email')}
+        participant_ids = {}
+        if member_emails:
+            for email, pid in Participant.objects.annotate(
+                email_lower=Lower('email')
+            ).filter(
+                email_lower__in=member_emails
+            ).order_by('-id').values_list('email_lower', 'id'):
+                participant_ids[email] = pid  # lowest id wins
+        
         # Add other members
         for member_data in team_info['participant']:
             f_name, l_name = parse_full_name(member_data['full_name'])
@@ -339,6 +385,7 @@ class RegisterViewSet(viewsets.ViewSet):
                 address=member_data.get('address', ''),
                 t_shirt_size=member_data.get('t_shirt_size', ''),
                 team=team,
+                participant_id=participant_ids.get((member_data.get('email') or '').lower()),
                 is_leader=False
             )
             team_members.append(member)
@@ -386,12 +433,23 @@ class RegisterViewSet(viewsets.ViewSet):
         
         return team, team_payment, team_members, team_competitions_list
 
+    def _invalidate_entitlements(self, participant, team, team_members_list):
+        participant_ids = [participant.id]
+        
+        if team:
+            # Existing participants who are members of the new team gain it
+            participant_ids += [m.participant_id for m in team_members_list if m.participant_id]
+        
+        invalidate_entitlements(
+            participant_ids=participant_ids,
+            team_ids=[team.id] if team else []
+        )
+
     def _update_coupon(self, coupon):
-        if coupon and coupon.coupon_number > 0:
-            coupon.coupon_number -= 1
-            coupon.save(update_fields=['coupon_number'])  # Only update specific field
-            return True
-        return False
+        """Conditional F() decrement - raises CouponSoldOut instead of overselling"""
+        if not coupon:
+            return False
+        return redeem_coupon(coupon)
     
     def _build_response_data(self, participant, participant_payment, team, team_payment, validated_data, coupon):
         response_data = {
@@ -438,6 +496,9 @@ class RegisterViewSet(viewsets.ViewSet):
         """
         Queue registration confirmation emails with CC support for team members
         Uses in-memory data to avoid additional queries
+        
+        The task goes to the outbox inside the registration transaction;
+        the outbox dispatcher publishes it once the transaction commits.
         """
         try:
             # Prepare participant data
@@ -483,17 +544,16 @@ class RegisterViewSet(viewsets.ViewSet):
             # This will use CC for team members automatically
             logger.info(f"Queueing registration email for participant {participant.id}")
             
-            send_registration_email_task.apply_async(
-                args=[
+            # Savepoint: an outbox failure must not roll back the registration
+            with transaction.atomic():
+                enqueue_email(
+                    send_registration_email_task,
                     participant_data, 
                     payment_data, 
                     team_data, 
                     team_members_data, 
                     team_competitions_list
-                ],
-                queue='emails',
-                ignore_result=True
-            )
+                )
             
             logger.info(f"✓ Registration email queued for participant {participant.id}")
             
@@ -504,38 +564,14 @@ class RegisterViewSet(viewsets.ViewSet):
             logger.error(f"Email queueing failed: {str(e)}", exc_info=True)
 
 
-class ParticipantViewSet(viewsets.ReadOnlyModelViewSet):
+class ParticipantViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAdminVolunteer]
+    etag_resources = ('participants', 'catalog')
+    pagination_class = IdCursorPagination
     
     def get_queryset(self):
-        queryset = Participant.objects.all().select_related().prefetch_related(
-            'registrations__segment',
-            'competition_registrations__competition',
-            'gift_status__gift',
-            'entry_status'
-        )
-        
-        segment_code = self.request.query_params.get('segment')
-        competition_code = self.request.query_params.get('competition')
-        payment_verified = self.request.query_params.get('payment_verified')
-        search = self.request.query_params.get('search')
-        
-        if segment_code:
-            queryset = queryset.filter(registrations__segment__code=segment_code).distinct()
-        
-        if competition_code:
-            queryset = queryset.filter(competition_registrations__competition__code=competition_code).distinct()
-        
-        if payment_verified is not None:
-            is_verified = payment_verified.lower() == 'true'
-            queryset = queryset.filter(payment_verified=is_verified)
-        
-        if search:
-            queryset = queryset.filter(
-                Q(f_name__icontains=search) |
-                Q(l_name__icontains=search) |
-                Q(email__icontains=search)
-            )
+        queryset = self.get_serializer_class().setup_eager_loading(Participant.objects.all())
+        queryset = filter_participants(queryset, self.request.query_params)
         
         return queryset.order_by('-id')
     
@@ -546,14 +582,15 @@ class ParticipantViewSet(viewsets.ReadOnlyModelViewSet):
     
     def list(self, request, *args, **kwargs):
         try:
-            queryset = self.get_queryset()
-            serializer = self.get_serializer(queryset, many=True)
+            page = self.paginate_queryset(self.get_queryset())
+            serializer = self.get_serializer(page, many=True)
             
+            return self.get_paginated_response(serializer.data)
+        except NotFound as e:
             return Response({
-                'success': True,
-                'count': queryset.count(),
-                'data': serializer.data
-            }, status=status.HTTP_200_OK)
+                'success': False,
+                'error': str(e.detail)
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"Error fetching participants list: {str(e)}")
             return Response({
@@ -583,43 +620,30 @@ class ParticipantViewSet(viewsets.ReadOnlyModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class TeamListViewSet(viewsets.ReadOnlyModelViewSet):
+class TeamListViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     
     permission_classes = [IsAdminVolunteer]
+    etag_resources = ('teams', 'catalog')
     serializer_class = TeamListSerializer
+    pagination_class = IdCursorPagination
     
     def get_queryset(self):
-        queryset = Team.objects.all().prefetch_related(
-            'members',
-            'team_competition_registrations__competition',
-            'gift_status__gift',
-            'entry_status'
-        )
-        
-        competition_code = self.request.query_params.get('competition')
-        payment_verified = self.request.query_params.get('payment_verified')
-        
-        if competition_code:
-            queryset = queryset.filter(
-                team_competition_registrations__competition__code=competition_code
-            ).distinct()
-        
-        if payment_verified is not None:
-            is_verified = payment_verified.lower() == 'true'
-            queryset = queryset.filter(payment_verified=is_verified)
+        queryset = TeamListSerializer.setup_eager_loading(Team.objects.all())
+        queryset = filter_teams(queryset, self.request.query_params)
         
         return queryset.order_by('-id')
     
     def list(self, request, *args, **kwargs):
         try:
-            queryset = self.get_queryset()
-            serializer = self.get_serializer(queryset, many=True)
+            page = self.paginate_queryset(self.get_queryset())
+            serializer = self.get_serializer(page, many=True)
             
+            return self.get_paginated_response(serializer.data)
+        except NotFound as e:
             return Response({
-                'success': True,
-                'count': queryset.count(),
-                'data': serializer.data
-            }, status=status.HTTP_200_OK)
+                'success': False,
+                'error': str(e.detail)
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"Error fetching teams list: {str(e)}")
             return Response({
@@ -628,9 +652,10 @@ class TeamListViewSet(viewsets.ReadOnlyModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class SegmentViewSet(viewsets.ReadOnlyModelViewSet):
+class SegmentViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     
     permission_classes = [IsAdminVolunteer]
+    etag_resources = ('participants', 'catalog')
     serializer_class = SegmentSerializer
     queryset = Segment.objects.all()
     lookup_field = 'code'
@@ -641,17 +666,17 @@ class SegmentViewSet(viewsets.ReadOnlyModelViewSet):
             serializer = self.get_serializer(segment)
             
             # Get all participants registered for this segment
-            participants = Participant.objects.filter(
-                registrations__segment=segment
-            ).distinct()
+            participants = ParticipantListSerializer.setup_eager_loading(
+                Participant.objects.filter(registrations__segment=segment).distinct()
+            )
             
-            from .serializers import ParticipantListSerializer
             participant_serializer = ParticipantListSerializer(participants, many=True)
             
             return Response({
                 'success': True,
                 'segment': serializer.data,
-                'participant_count': participants.count(),
+                'participant_count': len(participant_serializer.data),
+                'summary': summary_counts('segment', segment.id),
                 'participants': participant_serializer.data
             }, status=status.HTTP_200_OK)
         except Segment.DoesNotExist:
@@ -667,9 +692,10 @@ class SegmentViewSet(viewsets.ReadOnlyModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class CompetitionViewSet(viewsets.ReadOnlyModelViewSet):
+class CompetitionViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     
     permission_classes = [IsAdminVolunteer]
+    etag_resources = ('participants', 'catalog')
     serializer_class = CompetitionSerializer
     queryset = Competition.objects.all()
     lookup_field = 'code'
@@ -679,17 +705,17 @@ class CompetitionViewSet(viewsets.ReadOnlyModelViewSet):
             competition = self.get_object()
             serializer = self.get_serializer(competition)
             
-            participants = Participant.objects.filter(
-                competition_registrations__competition=competition
-            ).distinct()
+            participants = ParticipantListSerializer.setup_eager_loading(
+                Participant.objects.filter(competition_registrations__competition=competition).distinct()
+            )
             
-            from .serializers import ParticipantListSerializer
             participant_serializer = ParticipantListSerializer(participants, many=True)
             
             return Response({
                 'success': True,
                 'competition': serializer.data,
-                'participant_count': participants.count(),
+                'participant_count': len(participant_serializer.data),
+                'summary': summary_counts('competition', competition.id),
                 'participants': participant_serializer.data
             }, status=status.HTTP_200_OK)
         except Competition.DoesNotExist:
@@ -705,9 +731,10 @@ class CompetitionViewSet(viewsets.ReadOnlyModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class TeamCompetitionViewSet(viewsets.ReadOnlyModelViewSet):
+class TeamCompetitionViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     
     permission_classes = [IsAdminVolunteer]
+    etag_resources = ('teams', 'catalog')
     serializer_class = TeamCompetitionSerializer
     queryset = TeamCompetition.objects.all()
     lookup_field = 'code'
@@ -717,16 +744,17 @@ class TeamCompetitionViewSet(viewsets.ReadOnlyModelViewSet):
             competition = self.get_object()
             serializer = self.get_serializer(competition)
             
-            teams = Team.objects.filter(
-                team_competition_registrations__competition=competition
-            ).distinct()
+            teams = TeamListSerializer.setup_eager_loading(
+                Team.objects.filter(team_competition_registrations__competition=competition).distinct()
+            )
             
             team_serializer = TeamListSerializer(teams, many=True)
             
             return Response({
                 'success': True,
                 'competition': serializer.data,
-                'team_count': teams.count(),
+                'team_count': len(team_serializer.data),
+                'summary': summary_counts('team_competition', competition.id),
                 'teams': team_serializer.data
             }, status=status.HTTP_200_OK)
         except TeamCompetition.DoesNotExist:
@@ -834,7 +862,7 @@ class PaymentVerificationViewSet(viewsets.ViewSet):
             
             if not payment:
                 team_member = TeamParticipant.objects.select_related('team').filter(
-                    email=participant.email
+                    participant=participant
                 ).first()
                 
                 if team_member:
@@ -844,7 +872,7 @@ class PaymentVerificationViewSet(viewsets.ViewSet):
             else:
                 # Check if participant is also a team leader
                 team_member = TeamParticipant.objects.select_related('team').filter(
-                    email=participant.email,
+                    participant=participant,
                     is_leader=True
                 ).first()
                 
@@ -863,11 +891,15 @@ class PaymentVerificationViewSet(viewsets.ViewSet):
             new_status = not was_verified
             participant.payment_verified = new_status
             participant.save(update_fields=['payment_verified'])
+            verification_changed('participant', [participant.id], new_status)
             
             # Update team verification if exists
             if team:
+                team_changed = team.payment_verified != new_status
                 team.payment_verified = new_status
                 team.save(update_fields=['payment_verified'])
+                if team_changed:
+                    verification_changed('team', [team.id], new_status)
             
             # Prepare response
             response_data = {
@@ -930,6 +962,92 @@ class PaymentVerificationViewSet(viewsets.ViewSet):
                 'details': str(e) if request.user.is_superuser else None
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    def bulk(self, request):
+        """
+        Verify many payments at once (verify only, never toggles)
+        POST /api/payment/verify/bulk/
+        Body: {"ids": [participant_id, ...]}
+        """
+        ids = request.data.get('ids')
+        
+        if not isinstance(ids, list) or not ids:
+            return Response({
+                'success': False,
+                'error': 'ids must be a non-empty list of participant IDs'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(ids) > MAX_IDS:
+            return Response({
+                'success': False,
+                'error': f'At most {MAX_IDS} IDs per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            results, emails_queued = bulk_verify(ids)
+            
+            counts = {}
+            for result in results:
+                counts[result['status']] = counts.get(result['status'], 0) + 1
+            
+            return Response({
+                'success': True,
+                'message': f"{counts.get('verified', 0)} of {len(ids)} payment(s) verified",
+                'data': {
+                    'counts': counts,
+                    'email_batches_queued': emails_queued,
+                    'results': results
+                }
+            }, status=status.HTTP_200_OK)
+            
+        except Exception as e:
+            logger.error(f"Bulk payment verification error: {str(e)}", exc_info=True)
+            return Response({
+                'success': False,
+                'error': 'Internal server error'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def reconcile(self, request):
+        """
+        Verify payments from a bKash / Nagad statement
+        POST /api/payment/reconcile/ (multipart)
+        Fields: file (statement CSV), method (optional), dry_run (optional)
+        """
+        statement = request.FILES.get('file')
+        
+        if not statement:
+            return Response({
+                'success': False,
+                'error': 'Statement file is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        
+        try:
+            counts, report = reconcile(statement, method=request.data.get('method') or None, dry_run=dry_run)
+            
+            return Response({
+                'success': True,
+                'message': f"{counts.get('verified', 0)} payment(s) {'would be ' if dry_run else ''}verified",
+                'data': {
+                    'dry_run': dry_run,
+                    'counts': counts,
+                    'report': report
+                }
+            }, status=status.HTTP_200_OK)
+            
+        except StatementError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+            
+        except Exception as e:
+            logger.error(f"Statement reconciliation error: {str(e)}", exc_info=True)
+            return Response({
+                'success': False,
+                'error': 'Internal server error'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
     def _queue_verification_emails_async(self, participant, team=None, is_team_leader=False):
         """
         Queue email tasks efficiently
@@ -937,15 +1055,13 @@ class PaymentVerificationViewSet(viewsets.ViewSet):
         - Team members (not leader): 1 team email via CC
         - Team leaders: 2 emails (solo + team via CC)
         
+        Tasks are written to the outbox in the verification transaction
+        and published by the outbox dispatcher after commit.
+        
         Returns:
             bool: True if queued successfully
         """
         try:
-            from .tasks import (
-                send_payment_verification_email_task,
-                send_team_payment_verification_emails_task
-            )
-            
             emails_queued = 0
             
             # Prepare participant data for solo email
@@ -974,17 +1090,12 @@ class PaymentVerificationViewSet(viewsets.ViewSet):
             if has_solo_competitions or is_team_leader:
                 logger.info(f"Queueing solo email for participant {participant.id} (team_leader={is_team_leader})")
                 
-                send_payment_verification_email_task.apply_async(
-                    args=[participant_data, is_team_leader],
-                    queue='emails',
-                    retry=True,
-                    retry_policy={
-                        'max_retries': 3,
-                        'interval_start': 60,
-                        'interval_step': 60,
-                        'interval_max': 180,
-                    }
-                )
+                with transaction.atomic():
+                    enqueue_email(
+                        send_payment_verification_email_task,
+                        participant_data,
+                        is_team_leader
+                    )
                 emails_queued += 1
                 logger.info(f"✓ Solo email queued for {participant.id}")
             
@@ -1021,17 +1132,12 @@ class PaymentVerificationViewSet(viewsets.ViewSet):
                 ]
                 
                 # Queue team email (will use CC for all members)
-                send_team_payment_verification_emails_task.apply_async(
-                    args=[team_data, team_members_data],
-                    queue='emails',
-                    retry=True,
-                    retry_policy={
-                        'max_retries': 3,
-                        'interval_start': 60,
-                        'interval_step': 60,
-                        'interval_max': 180,
-                    }
-                )
+                with transaction.atomic():
+                    enqueue_email(
+                        send_team_payment_verification_emails_task,
+                        team_data,
+                        team_members_data
+                    )
                 emails_queued += 1
                 logger.info(f"✓ Team email queued for {team.id} ({len(team_members_data)} members via CC)")
             
@@ -1158,11 +1264,13 @@ class TanvinAwardViewSet(viewsets.ReadOnlyModelViewSet):
         if team_name:
             queryset = queryset.filter(team__team_name__icontains=team_name)
         
-        serializer = self.get_serializer(queryset, many=True)
+        # The list needs no members, only their count
+        awards = list(TanvinAwardListSerializer.setup_eager_loading(queryset.prefetch_related(None)))
+        serializer = self.get_serializer(awards, many=True)
         
         return Response({
             'success': True,
-            'count': queryset.count(),
+            'count': len(awards),
             'data': serializer.data
         }, status=status.HTTP_200_OK)
     
@@ -1231,20 +1339,21 @@ class TanvinAwardViewSet(viewsets.ReadOnlyModelViewSet):
         Get statistics about Tanvin Award submissions
         GET /api/tanvin-award/stats/
         """
-        from django.db.models import Count
+        from django.db.models import Count, Q
         
-        queryset = self.get_queryset()
+        # Unordered: an ORDER BY column would end up in the GROUP BY
+        queryset = TanvinAward.objects.order_by()
         
-        stats = {
-            'total_submissions': queryset.count(),
-            'by_project_type': dict(
-                queryset.values('project_type')
-                .annotate(count=Count('id'))
-                .values_list('project_type', 'count')
-            ),
-            'with_pitch_deck': queryset.exclude(pitch_deck='').count(),
-            'with_video_link': queryset.exclude(video_link='').count(),
-        }
+        stats = queryset.aggregate(
+            total_submissions=Count('id'),
+            with_pitch_deck=Count('id', filter=~Q(pitch_deck='')),
+            with_video_link=Count('id', filter=~Q(video_link='')),
+        )
+        stats['by_project_type'] = dict(
+            queryset.values('project_type')
+            .annotate(count=Count('id'))
+            .values_list('project_type', 'count')
+        )
         
         return Response({
             'success': True,
@@ -1311,6 +1420,7 @@ class RecordEntryViewSet(viewsets.ModelViewSet):
             **entity_info
         }, status=status.HTTP_200_OK)
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         id_param = self.kwargs.get("id")
         data = {}
@@ -1355,10 +1465,8 @@ class RecordEntryViewSet(viewsets.ModelViewSet):
                 "error": "No team with the ID"
             }, status=status.HTTP_404_NOT_FOUND)
 
-        try:
-            volunteer = Volunteer.objects.get(user=self.request.user)
-            data["volunteer"] = volunteer.id
-        except Volunteer.DoesNotExist:
+        claims = get_volunteer_claims(request)
+        if claims is None:
             return Response({
                 "success": False, 
                 "error": "Volunteer not found for this user"
@@ -1366,7 +1474,7 @@ class RecordEntryViewSet(viewsets.ModelViewSet):
 
         serializer = self.get_serializer(data=data)
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(volunteer_id=claims['volunteer_id'])
             entity_info = get_entity_info(participant, team)
             
             return Response({
@@ -1402,17 +1510,16 @@ class GiftsStatusViewSet(viewsets.ViewSet):
             }, status=status.HTTP_404_NOT_FOUND)
         
         try:
-            all_gifts = Gift.objects.all()
-            gift_status_dict = {gift.gift_name.lower(): 0 for gift in all_gifts}
+            gifts_by_id = catalog.get().gifts_by_id
+            gift_status_dict = {gift.gift_name.lower(): 0 for gift in gifts_by_id.values()}
             
             if participant:
                 received_gifts = GiftStatus.objects.filter(participant=participant)
             else:
                 received_gifts = GiftStatus.objects.filter(team=team)
             
-            for gift_status_obj in received_gifts:
-                gift_name = gift_status_obj.gift.gift_name.lower()
-                gift_status_dict[gift_name] = 1
+            for gift_id in received_gifts.values_list('gift_id', flat=True):
+                gift_status_dict[gifts_by_id[gift_id].gift_name.lower()] = 1
             
             entity_info = get_entity_info(participant, team)
             
@@ -1427,6 +1534,7 @@ class GiftsStatusViewSet(viewsets.ViewSet):
                 "error": "Failed to fetch gifts status"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @idempotent
     def create(self, request, id=None):
         try:
             gift_name = request.data.get('gift_name')
@@ -1435,9 +1543,8 @@ class GiftsStatusViewSet(viewsets.ViewSet):
                     "error": "gift_name is required in request body"
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            try:
-                gift = Gift.objects.get(gift_name__iexact=gift_name)
-            except Gift.DoesNotExist:
+            gift = catalog.get().gifts.get(gift_name.lower())
+            if gift is None:
                 return Response({
                     "error": f"Gift '{gift_name}' not found"
                 }, status=status.HTTP_404_NOT_FOUND)
@@ -1478,17 +1585,15 @@ class GiftsStatusViewSet(viewsets.ViewSet):
                         **entity_info
                     }, status=status.HTTP_200_OK)
             
-            try:
-                volunteer = Volunteer.objects.get(user=request.user)
-                data["volunteer"] = volunteer.id
-            except Volunteer.DoesNotExist:
+            claims = get_volunteer_claims(request)
+            if claims is None:
                 return Response({
                     "error": "Volunteer not found for this user"
                 }, status=status.HTTP_404_NOT_FOUND)
             
             serializer = GiftStatusSerializer(data=data)
             if serializer.is_valid():
-                serializer.save()
+                serializer.save(volunteer_id=claims['volunteer_id'])
                 entity_info = get_entity_info(participant, team)
                 
                 return Response({
@@ -1509,14 +1614,31 @@ class GiftsStatusViewSet(viewsets.ViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def check_allowance(page, event, participant_record, team_record):
+    """Whether the scanned entity is registered for `event` on a gate page"""
+    if page == "segment":
+        return bool(participant_record) and event in participant_record['segments']
+    elif page == "solo":
+        return bool(participant_record) and event in participant_record['solo']
+    elif page == "team":
+        return bool(team_record) and event in team_record['team_competitions']
+    else:
+        raise ValueError("Invalid page type. Use 'segment', 'solo', or 'team'")
+
+
 class CheckViewSet(viewsets.ViewSet):
+    """
+    Gate allowance check served from the entitlement index
+    (one cache lookup per scan in steady state)
+    """
     permission_classes = [IsAuthenticated]
 
     def list(self, request, page, event, id):
         try:
-            # Get participant or team
+            # Get participant or team entitlements
             try:
-                participant, team = get_entity_by_id(id)
+                entity_type, entity_id = parse_id_parameter(id)
+                participant_record, team_record = get_entitlements(entity_type, entity_id)
             except ValueError as e:
                 return Response({
                     "error": str(e)
@@ -1530,36 +1652,18 @@ class CheckViewSet(viewsets.ViewSet):
                     "error": "No team with the ID"
                 }, status=status.HTTP_404_NOT_FOUND)
 
-            allowed = False
-
-            # Check registration based on page type
-            if page == "segment":
-                if participant:
-                    allowed = Registration.objects.filter(
-                        participant=participant, 
-                        segment__code=event
-                    ).exists()
-
-            elif page == "solo":
-                if participant:
-                    allowed = CompetitionRegistration.objects.filter(
-                        participant=participant, 
-                        competition__code=event
-                    ).exists()
-
-            elif page == "team":
-                if team:
-                    allowed = TeamCompetitionRegistration.objects.filter(
-                        team=team, 
-                        competition__code=event
-                    ).exists()
-
-            else:
+            try:
+                allowed = check_allowance(page, event, participant_record, team_record)
+            except ValueError as e:
                 return Response({
-                    "error": "Invalid page type. Use 'segment', 'solo', or 'team'"
+                    "error": str(e)
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            entity_info = get_entity_info(participant, team)
+            entity_info = {}
+            if participant_record:
+                entity_info['participant'] = participant_record['info']
+            if team_record:
+                entity_info['team'] = team_record['info']
             
             return Response({
                 "allowed": allowed,
@@ -1575,6 +1679,212 @@ class CheckViewSet(viewsets.ViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class ScanViewSet(viewsets.ViewSet):
+    """
+    Everything the volunteer app shows for one QR scan in a single response:
+    identity, entry status, gift status and (optionally) gate allowance.
+    Served from the entitlement index like CheckViewSet.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request, id, page=None, event=None):
+        try:
+            try:
+                entity_type, entity_id = parse_id_parameter(id)
+                participant_record, team_record = get_entitlements(entity_type, entity_id)
+            except ValueError as e:
+                return Response({
+                    "success": False,
+                    "error": str(e)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            except Participant.DoesNotExist:
+                return Response({
+                    "success": False,
+                    "error": "No participant with the ID"
+                }, status=status.HTTP_404_NOT_FOUND)
+            except Team.DoesNotExist:
+                return Response({
+                    "success": False,
+                    "error": "No team with the ID"
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            # Entry and gifts belong to the scanned entity, as in /recordentry/ and /gifts/
+            scanned = participant_record if entity_type == 'participant' else team_record
+            gifts = {gift.gift_name.lower(): 0 for gift in catalog.get().gifts_by_id.values()}
+            for gift_name in scanned['gifts']:
+                gifts[gift_name] = 1
+
+            response_data = {
+                "success": True,
+                "has_entry": scanned['has_entry'],
+                "gifts": gifts,
+            }
+
+            if page is not None:
+                try:
+                    response_data["allowed"] = check_allowance(page, event, participant_record, team_record)
+                except ValueError as e:
+                    return Response({
+                        "success": False,
+                        "error": str(e)
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                response_data["page"] = page
+                response_data["event"] = event
+
+            if participant_record:
+                response_data["participant"] = participant_record['info']
+            if team_record:
+                response_data["team"] = team_record['info']
+
+            return Response(response_data, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.error(f"Error building scan bundle for {id}: {str(e)}")
+            return Response({
+                "success": False,
+                "error": "Failed to fetch scan details"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ScanSyncViewSet(viewsets.ViewSet):
+    """
+    Bulk upload of entries and gift handouts recorded while the
+    volunteer app was offline. Returns one result per scan.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @idempotent
+    def create(self, request):
+        if not isinstance(request.data, dict):
+            return Response({
+                "success": False,
+                "error": "Expected an object with an events list"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        events = request.data.get('events')
+        if not isinstance(events, list) or not events:
+            return Response({
+                "success": False,
+                "error": "events must be a non-empty list"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(events) > MAX_EVENTS:
+            return Response({
+                "success": False,
+                "error": f"At most {MAX_EVENTS} events per request"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        claims = get_volunteer_claims(request)
+        if claims is None:
+            return Response({
+                "success": False,
+                "error": "Volunteer not found for this user"
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            results = sync_scan_events(events, claims['volunteer_id'], device_id=str(request.data.get('device_id') or ''))
+        except Exception as e:
+            logger.error(f"Error syncing {len(events)} offline scans: {str(e)}")
+            return Response({
+                "success": False,
+                "error": "Failed to sync scans"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        summary = {'recorded': 0, 'duplicate': 0, 'invalid': 0}
+        for result in results:
+            summary[result['status']] += 1
+
+        return Response({
+            "success": True,
+            "summary": summary,
+            "results": results
+        }, status=status.HTTP_200_OK)
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """Ranked fuzzy search over participants, team members and payments"""
+    permission_classes = [IsAdminVolunteer]
+
+    def list(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({
+                "success": False,
+                "error": "q is required"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            return Response({
+                "success": False,
+                "error": "limit must be a number"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            results = search_entities(query, limit)
+            return Response({
+                "success": True,
+                "count": len(results),
+                "data": results
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error searching for '{query}': {str(e)}")
+            return Response({
+                "success": False,
+                "error": "Search failed"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class StatsViewSet(ConditionalGetMixin, viewsets.ViewSet):
+    """Registration, payment, attendee and scan figures for the dashboard"""
+    permission_classes = [IsAdminVolunteer]
+    etag_resources = STATS_VERSIONS
+    etag_max_age = STATS_TTL  # changes that bypass the version bump show up with the recomputed figures
+
+    def list(self, request):
+        try:
+            return Response({
+                "success": True,
+                "data": get_stats()
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error computing stats: {str(e)}")
+            return Response({
+                "success": False,
+                "error": "Failed to compute stats"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    Download participants, teams or payments as CSV or XLSX.
+    Accepts the same filters as the corresponding list endpoint.
+    """
+    permission_classes = [IsAdminVolunteer]
+
+    def list(self, request, dataset=None, file_type=None):
+        if dataset not in EXPORTS or file_type not in FILE_TYPES:
+            return Response({
+                "success": False,
+                "error": f"Unknown export. Use one of {', '.join(EXPORTS)} as {' or '.join(FILE_TYPES)}"
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            return export_response(dataset, file_type, request.query_params)
+        except ExportUnavailable as e:
+            return Response({
+                "success": False,
+                "error": str(e)
+            }, status=status.HTTP_501_NOT_IMPLEMENTED)
+        except Exception as e:
+            logger.error(f"Error exporting {dataset}: {str(e)}")
+            return Response({
+                "success": False,
+                "error": "Export failed"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class ParticipantTeamInfoViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
 
@@ -1615,4 +1925,17 @@ class ParticipantTeamInfoViewSet(viewsets.ViewSet):
             logger.error(f"Error fetching participant/team info for {id}: {str(e)}")
             return Response({
                 "error": "Failed to fetch participant/team info"
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class SessionViewSet(viewsets.ViewSet):
+    """Token check for the volunteer app; touches no participant or QR data"""
+
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        claims = get_volunteer_claims(request)
+        return Response({
+            "username": request.user.username,
+            "volunteer_id": claims['volunteer_id'] if claims else None,
+            "role": claims['role'] if claims else None,
+        }, status=status.HTTP_200_OK)
@@ -2,6 +2,7 @@
 
 import os
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'innoverse.settings')
@@ -16,6 +17,20 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+@worker_process_init.connect
+def preload_email_assets(**kwargs):
+    """Decode the ticket template and logo once in each worker child process"""
+    from api.assets import preload
+    preload()
+
+
+@worker_process_shutdown.connect
+def close_smtp_session(**kwargs):
+    """Say QUIT on the pooled SMTP session instead of dropping it"""
+    from api.mail import close_connection
+    close_connection()
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     """Debug task to test Celery is working"""
@@ -1,10 +1,17 @@
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework import serializers
+from api.claims import add_volunteer_claims
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     role = serializers.SerializerMethodField()
 
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        # Role and volunteer id as claims so permission checks skip the DB
+        return add_volunteer_claims(token, user)
+
     def validate(self, attrs):
         data = super().validate(attrs)
 
@@ -2,6 +2,7 @@ from pathlib import Path
 import os
 from datetime import timedelta
 from decouple import config
+from corsheaders.defaults import default_headers
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -14,6 +15,8 @@ DEBUG = False
 
 # ALLOWED_HOSTS = ['*']
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'if-none-match')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'ETag']
 ALLOWED_HOSTS = ['www.innoversebd.bdix.cloud', '103.169.161.8', 'innoversebd.bdix.cloud', 'localhost', 'localhost:3000', '127.0.0.1:3000', '127.0.0.1', 'innoversebd.net', 'http://www.innoversebd.net', 'https://www.innoversebd.net', 'https://localhost:3000', 'https://innoverse-orcin.vercel.app', 'admin.innoversebd.net']
 
 
@@ -26,6 +29,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'api',
@@ -165,6 +169,13 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 QR_CODE_ROOT = os.path.join(MEDIA_ROOT, 'qr_codes')
 
+# Signed QR payloads (api/qr_tokens.py). Keep accepting plain p_<id> / t_<id>
+# codes while tickets issued before signing are still in circulation; set
+# QR_ACCEPT_UNSIGNED=False once signed tickets have been re-sent.
+QR_SIGNING_KEY = config('QR_SIGNING_KEY', default='')
+QR_TOKEN_LIFETIME = timedelta(days=365)
+QR_ACCEPT_UNSIGNED = config('QR_ACCEPT_UNSIGNED', default=True, cast=bool)
+
 
 
 
@@ -184,6 +195,16 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
 
     ),
+    # orjson when installed, stdlib json otherwise (same output either way)
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 
@@ -271,8 +292,17 @@ CELERY_TASK_ROUTES = {
     'api.tasks.send_payment_verification_email_task': {'queue': 'emails'},
     'api.tasks.send_team_registration_emails_task': {'queue': 'emails'},
     'api.tasks.send_team_payment_verification_emails_task': {'queue': 'emails'},
+    'api.tasks.send_payment_verification_batch_task': {'queue': 'emails'},
+    # CPU-bound; a worker started with --pool=solo is not daemonic, so
+    # prerender() can spread the rendering over a process pool
+    'api.tasks.prerender_tickets_task': {'queue': 'tickets'},
 }
 
+# Micro-batching consumer for the emails queue (manage.py run_email_batcher),
+# run instead of a Celery worker on that queue where SMTP round trips dominate
+EMAIL_BATCH_SIZE = 50  # messages per SMTP session
+EMAIL_BATCH_WINDOW_MS = 500  # max wait after the first message of a batch
+
 # Rate limiting (prevent email provider throttling)
 CELERY_TASK_ANNOTATIONS = {
     'api.tasks.send_*': {'rate_limit': '100/m'},  # 100 emails per minute
@@ -392,3 +422,20 @@ os.makedirs(os.path.join(BASE_DIR, 'logs'), exist_ok=True)
 from celery.schedules import crontab
 
 
+# Email outbox dispatcher (api.outbox) - publishes committed email tasks
+CELERY_BEAT_SCHEDULE = {
+    'dispatch-email-outbox': {
+        'task': 'api.tasks.dispatch_email_outbox_task',
+        'schedule': 5.0,  # seconds
+    },
+    'purge-email-outbox': {
+        'task': 'api.tasks.purge_email_outbox_task',
+        'schedule': 6 * 60 * 60.0,  # dispatched rows are kept for 7 days
+    },
+    'prerender-tickets': {
+        'task': 'api.tasks.prerender_tickets_task',
+        'schedule': 600.0,  # new registrations get their tickets within 10 minutes
+    },
+}
+
+
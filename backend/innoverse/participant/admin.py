@@ -2,11 +2,22 @@ from django.contrib import admin
 from .models import *
 
 
-admin.site.register(Participant)
-admin.site.register(Team)
+class PaymentVerifiedAdmin(admin.ModelAdmin):
+    """Keeps the EventSummary verified counters in step with payment_verified edits"""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'payment_verified' in form.changed_data:
+            from api.summaries import verification_changed
+            owner = 'participant' if isinstance(obj, Participant) else 'team'
+            verification_changed(owner, [obj.pk], obj.payment_verified)
+
+
+admin.site.register(Participant, PaymentVerifiedAdmin)
+admin.site.register(Team, PaymentVerifiedAdmin)
 admin.site.register(TeamParticipant)
 admin.site.register(Payment)
 admin.site.register(Registration)
 admin.site.register(CompetitionRegistration)
 admin.site.register(TeamCompetitionRegistration)
-admin.site.register(TanvinAward)
\ No newline at end of file
+admin.site.register(TanvinAward)
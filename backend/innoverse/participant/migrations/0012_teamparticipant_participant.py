@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+BATCH_SIZE = 1000
+
+
+def link_team_members(apps, schema_editor):
+    """Backfill TeamParticipant.participant from the old email join, in batches"""
+    Participant = apps.get_model('participant', 'Participant')
+    TeamParticipant = apps.get_model('participant', 'TeamParticipant')
+
+    last_id = 0
+    while True:
+        members = list(
+            TeamParticipant.objects.filter(id__gt=last_id, participant__isnull=True)
+            .order_by('id')[:BATCH_SIZE]
+        )
+        if not members:
+            break
+        last_id = members[-1].id
+
+        emails = {m.email.lower() for m in members if m.email}
+        participant_ids = {}
+        for email, pid in (
+            Participant.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=emails)
+            .order_by('-id')
+            .values_list('email_lower', 'id')
+        ):
+            participant_ids[email] = pid  # lowest id wins
+
+        linked = []
+        for member in members:
+            pid = participant_ids.get(member.email.lower()) if member.email else None
+            if pid:
+                member.participant_id = pid
+                linked.append(member)
+
+        TeamParticipant.objects.bulk_update(linked, ['participant'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('participant', '0011_participant_grade_alter_participant_age'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teamparticipant',
+            name='participant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='team_memberships', to='participant.participant'),
+        ),
+        migrations.RunPython(link_team_members, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-17 17:10
+
+from django.db import migrations
+
+
+# (table, column) pairs searched by api.search; the expression matches what
+# Django emits for icontains on PostgreSQL: UPPER("col"::text)
+SEARCH_COLUMNS = [
+    ('participant_participant', 'f_name'),
+    ('participant_participant', 'l_name'),
+    ('participant_participant', 'email'),
+    ('participant_participant', 'phone'),
+    ('participant_teamparticipant', 'f_name'),
+    ('participant_teamparticipant', 'l_name'),
+    ('participant_teamparticipant', 'email'),
+    ('participant_teamparticipant', 'phone'),
+    ('participant_payment', 'trx_id'),
+    ('participant_payment', 'phone'),
+]
+
+
+def _index_name(table, column):
+    return f"{table.replace('participant_', 'p_')}_{column}_trgm"
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, column in SEARCH_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{_index_name(table, column)}" '
+            f'ON "{table}" USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in SEARCH_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{_index_name(table, column)}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('participant', '0012_teamparticipant_participant'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -76,6 +76,7 @@ class TeamParticipant(models.Model):
     t_shirt_size = models.CharField(max_length=3, choices=TSHIRT_SIZES, blank=True, null=True)
     
     team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='members', db_index=True)
+    participant = models.ForeignKey(Participant, on_delete=models.SET_NULL, related_name='team_memberships', null=True, blank=True, db_index=True)
     is_leader = models.BooleanField(default=False, db_index=True)
 
     def __str__(self):